@@ -11,23 +11,52 @@ if str(PROJECT_ROOT) not in sys.path:
 from dotenv import load_dotenv
 load_dotenv(PROJECT_ROOT / ".env")
 
-from fastapi import APIRouter, HTTPException, FastAPI
+from fastapi import APIRouter, HTTPException, FastAPI, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from typing import List, Optional
 from uuid import uuid4
 import asyncio
+import json
 import logging
+import os
 
 # 导入项目内部模块（路径基于你 repo 的结构）
+from backend.llm.registry import model_registry
 from backend.services.orchestrator import multi_model_query
-from backend.services.iteration_controller import run_iterations
-from backend.storage.simple_store import save_structured_session, load_structured_session, append_iteration_round
+from backend.services.jobs import fail_session, job_runner
+from backend.storage.base import get_session_store
 from backend.prompt.registry import get_prompt
+from backend.services.backend_health import health_snapshot
+from backend.services import embeddings
+from backend.services.events import FINALIZED, event_bus
+from backend.services.http_pool import close_pool, get_pool, open_pool
+from backend.services.aggregation_executor import executor_stats, shutdown_executors
+from backend.services.rate_limit import rate_limiter
+from backend.services.retry import retry_snapshot
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Multi-LLM Arbiter API")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # 应用级 HTTP 连接池：所有 adapter / service 共享 keep-alive 连接
+    open_pool()
+    # 启动时预热配置中的模型 adapter，避免首个请求承担构造开销
+    warm = model_registry.warm_up(os.getenv("LLM_MODELS", "mock").split(","))
+    logger.info("Model registry warm-up: %s", warm)
+    # 后台迭代 worker 池；启动时恢复上次中断的任务
+    await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        await close_pool()
+        # 聚合线程 / 进程池（AGGREGATION_EXECUTOR）
+        shutdown_executors(wait=False)
+
+app = FastAPI(title="Multi-LLM Arbiter API", lifespan=lifespan)
 
 # --- CORS: 允许前端开发服务器访问（Vite 默认 http://localhost:5173） ---
 app.add_middleware(
@@ -51,12 +80,21 @@ class QueryRequest(BaseModel):
     prompt_id: Optional[str] = "answerer_v1"
     prompt_version: Optional[str] = "v1"
     max_rounds: Optional[int] = 3
+    # 执行策略：quorum=前 N 个结构化结果到达即取消其余；deadline_s=每轮截止时间（返回部分结果）；
+    # hedge=模型超过其近期 p95 延迟时发送对冲请求
+    quorum: Optional[int] = None
+    deadline_s: Optional[float] = None
+    hedge: bool = False
+    # stream=逐 token 调用模型：部分输出经 SSE 推送（model_chunk），结构化输出一旦无法解析即提前中止
+    stream: bool = False
+    # bypass_cache=跳过模型响应缓存（LLM_RESPONSE_CACHE 启用时），强制重新调用模型
+    bypass_cache: bool = False
 
 @router.post("/query")
 async def post_query(req: QueryRequest):
     """
     接收前端问题，运行初轮多模型并发（structured=True），
-    保存会话初始信息到存储，并异步触发迭代控制器（run_iterations）。
+    保存会话初始信息到存储，并把后续迭代（run_iterations）加入后台任务队列。
     """
     session_id = str(uuid4())
 
@@ -66,6 +104,10 @@ async def post_query(req: QueryRequest):
     except Exception as e:
         logger.warning("Prompt not found or failed to load: %s", e)
 
+    # 队列已满时直接拒绝，避免先调用模型再丢弃结果
+    if not await asyncio.to_thread(job_runner.queue.has_capacity):
+        raise HTTPException(status_code=503, detail="Too many queued sessions, please retry later")
+
     # 调用 orchestrator 获取初轮结果（structured=True）
     # 添加超时保护，避免单个慢速模型阻塞整个请求
     try:
@@ -75,7 +117,14 @@ async def post_query(req: QueryRequest):
                 req.models,
                 structured=True,
                 prompt_id=req.prompt_id,
-                prompt_version=req.prompt_version
+                prompt_version=req.prompt_version,
+                quorum=req.quorum,
+                deadline_s=req.deadline_s,
+                hedge=req.hedge,
+                session_id=session_id,
+                round_idx=1,
+                stream=req.stream,
+                cache=not req.bypass_cache,
             ),
             timeout=100.0  # 100 秒超时
         )
@@ -92,6 +141,8 @@ async def post_query(req: QueryRequest):
     # 最小化持久化会话结构（后续轮次会追加）
     session_obj = {
         "session_id": session_id,
+        "question": req.question,
+        "models": req.models,
         "state": "running",
         "rounds": [{
             "round": 1,
@@ -103,21 +154,35 @@ async def post_query(req: QueryRequest):
         "final_report": None
     }
     try:
-        save_structured_session(session_id, session_obj)
+        await get_session_store().save_session_async(session_id, session_obj)
     except Exception:
         logger.exception("Failed to save structured session")
 
-    # 异步触发迭代（不阻塞请求返回）
+    # 迭代任务写入持久化队列，由 lifespan 中固定大小的 worker 池执行；
+    # 初轮已随会话保存，worker 从最后持久化的轮次继续，不再重复调用所有模型
     try:
-        asyncio.create_task(
-            run_iterations(req.question, req.models, req.max_rounds, req.prompt_id, req.prompt_version, session_id=session_id)
-        )
-    except Exception:
-        logger.exception("Failed to schedule run_iterations task")
+        job_id = await job_runner.submit(session_id, {
+            "question": req.question,
+            "models": req.models,
+            "max_rounds": req.max_rounds,
+            "prompt_id": req.prompt_id,
+            "prompt_version": req.prompt_version,
+            "quorum": req.quorum,
+            "deadline_s": req.deadline_s,
+            "hedge": req.hedge,
+            "stream": req.stream,
+            "cache": not req.bypass_cache,
+        })
+    except Exception as e:
+        # 容量检查之后队列仍可能被并发请求占满；会话标记为失败，不留下永远 running 的会话
+        logger.exception("Failed to enqueue iteration job")
+        await fail_session(session_id, f"enqueue failed: {e}")
+        raise HTTPException(status_code=503, detail="Too many queued sessions, please retry later")
 
     # 返回初步响应（包含 session_id 与初轮 multi 结果）
     return {
         "session_id": session_id,
+        "job_id": job_id,
         "state": "running",
         "rounds": [
             {
@@ -127,26 +192,79 @@ async def post_query(req: QueryRequest):
         ]
     }
 
+@router.get("/sessions")
+async def list_sessions(
+    state: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 100,
+):
+    # 按状态 / 模型 / 时间（Unix 秒）筛选会话；SQLite 存储下为索引查询，文件存储下为目录扫描
+    sessions = await get_session_store().list_sessions_async(state=state, model=model, since=since, limit=limit)
+    return {"sessions": sessions}
+
 @router.get("/session/{session_id}")
-def get_session(session_id: str):
-    sess = load_structured_session(session_id)
+async def get_session(session_id: str, from_round: Optional[int] = None, latest: bool = False):
+    # from_round=N 只返回第 N 轮及之后；latest=true 只返回最新一轮（头信息与 final_report 总是返回）
+    sess = await get_session_store().load_session_async(session_id, from_round=from_round, latest_only=latest)
     if not sess:
         raise HTTPException(status_code=404, detail="session not found")
     return sess
 
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@router.get("/session/{session_id}/events")
+async def stream_session_events(session_id: str, request: Request):
+    """
+    Server-Sent Events：推送 model_response / round_started / round_aggregated / finalized，
+    替代轮询 GET /v1/session/{id}。支持 Last-Event-ID 断线续传。
+    """
+    try:
+        after_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        after_id = 0
+    known = event_bus.history(session_id)
+    sess = None if known else await get_session_store().load_session_async(session_id, latest_only=True)
+    if not known and not sess:
+        raise HTTPException(status_code=404, detail="session not found")
+
+    async def _stream():
+        if sess is not None and sess.get("state") not in (None, "running"):
+            # 会话已结束且事件已不在内存中（例如服务重启）：直接发送最终状态
+            yield _sse({
+                "id": after_id + 1,
+                "type": FINALIZED,
+                "session_id": session_id,
+                "data": {"state": sess.get("state"), "final_report": sess.get("final_report")},
+            })
+            return
+        async for event in event_bus.subscribe(session_id, after_id=after_id, heartbeat_s=15.0):
+            if await request.is_disconnected():
+                return
+            yield ": keep-alive\n\n" if event is None else _sse(event)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 class FollowupRequest(BaseModel):
     session_id: str
     followup_question: str
     models: Optional[List[str]] = None
     prompt_id: Optional[str] = "answerer_v1"
     prompt_version: Optional[str] = "v1"
+    bypass_cache: bool = False
 
 @router.post("/followup")
 async def post_followup(req: FollowupRequest):
     """
     对既有 session 发起单轮 followup（同步调用 orchestrator 并把结果追加到会话）
     """
-    sess = load_structured_session(req.session_id)
+    # 只需上一轮的模型列表，不加载完整历史
+    sess = await get_session_store().load_session_async(req.session_id, latest_only=True)
     if not sess:
         raise HTTPException(status_code=404, detail="session not found")
 
@@ -158,6 +276,7 @@ async def post_followup(req: FollowupRequest):
         prev_model_ids = req.models or ["mock"]
 
     models = req.models or prev_model_ids
+    last_round = int(sess["rounds"][-1].get("round") or 0) if sess.get("rounds") else 0
 
     try:
         result = await multi_model_query(
@@ -165,16 +284,20 @@ async def post_followup(req: FollowupRequest):
             models,
             structured=True,
             prompt_id=req.prompt_id,
-            prompt_version=req.prompt_version
+            prompt_version=req.prompt_version,
+            session_id=req.session_id,
+            round_idx=last_round + 1,
+            cache=not req.bypass_cache,
         )
     except Exception as e:
         logger.exception("multi_model_query in followup failed")
         raise HTTPException(status_code=500, detail=f"multi_model_query failed: {e}")
 
-    # 将新一轮追加到存储
+    # 将新一轮追加到存储；轮次号在会话锁内分配，避免与并发的迭代轮次冲突
+    round_no = last_round + 1
     try:
-        append_iteration_round(req.session_id, {
-            "round": len(sess["rounds"]) + 1,
+        round_no = await get_session_store().append_round_async(req.session_id, {
+            "round": None,
             "multi": result,
             "report": None,
             "contradictions": 0,
@@ -183,17 +306,54 @@ async def post_followup(req: FollowupRequest):
     except Exception:
         logger.exception("Failed to append round to session")
 
-    return {"session_id": req.session_id, "round": len(sess["rounds"]), "multi": result}
+    return {"session_id": req.session_id, "round": round_no, "multi": result}
+
+@router.get("/jobs")
+def get_jobs():
+    # 后台任务队列：worker 数、执行中的任务、各状态任务数
+    return job_runner.stats()
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_runner.queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
 
 @router.get("/models")
 def get_models():
-    # 从配置或文件返回当前可选模型（前端可调用列出）
-    models = [
-        {"id":"mock","name":"Mock Adapter","version":"v1","status":"available"},
-        {"id":"hf","name":"Hugging Face","version":"default","status":"available"},
-        {"id":"ollama","name":"Ollama Local","version":"local","status":"available"}
-    ]
-    return {"models": models}
+    # 返回模型注册表的真实状态：实例、并发中的调用数、排队深度
+    return {"models": model_registry.snapshot()}
+
+@router.get("/health/backends")
+def get_backend_health():
+    # 远程 embedding / NLI 等后端的熔断器状态与计数
+    return {"backends": health_snapshot()}
+
+@router.get("/health/embeddings")
+def get_embedding_cache_stats():
+    # embedding 缓存：内存条目数、内存 / 磁盘命中数、未命中数
+    return {"cache": embeddings.embedding_cache.stats()}
+
+@router.get("/health/http-pool")
+def get_http_pool_stats():
+    # 共享连接池的每主机请求数 / 并发 / 客户端创建次数
+    return get_pool().stats()
+
+@router.get("/health/rate-limits")
+def get_rate_limits():
+    # 每个后端 / 模型的出站限流器：速率、并发上限、在途数、排队深度、平均 / 最大等待时间
+    return {"limiters": rate_limiter.snapshot()}
+
+@router.get("/health/retries")
+def get_retry_budgets():
+    # 每个后端的重试预算：余额、请求数、已重试数、因预算耗尽被拒绝的重试数
+    return {"budgets": retry_snapshot()}
+
+@router.get("/health/aggregation")
+def get_aggregation_stats():
+    # 聚合执行器：类型、工作者数、提交 / 完成 / 失败 / 超时 / 运行中任务数
+    return executor_stats()
 
 # 把 router 注册到 app（必须）
 app.include_router(router)
@@ -5,7 +5,7 @@ import os
 import sys
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 # Ensure project root is importable when running as a script.
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -20,12 +20,12 @@ from backend.llm.adapters.hf_adapter import HuggingFaceAdapter
 from backend.llm.adapters.mock_adapter import MockAdapter
 from backend.llm.adapters.ollama_adapter import OllamaAdapter
 from backend.prompt.registry import get_prompt
+from backend.services.http_pool import close_pool, open_pool
 from backend.services.orchestrator import multi_model_query
 from backend.services.semantic import cluster_points, embed_points, extract_points
 from backend.services.iteration_controller import run_iterations
 from backend.services.aggregator import aggregate_structured_responses
-from backend.storage.simple_store import load_structured_session, save_structured_session
-from backend.storage.vector_store import search_similar
+from backend.storage.base import get_session_store, get_vector_store
 from backend.services.orchestrator import multi_model_query
 
 
@@ -69,6 +69,33 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Parse responses as structured JSON when supported",
     )
+    parser.add_argument(
+        "--quorum",
+        type=int,
+        default=None,
+        help="Return a round once this many structured responses arrived; cancel the rest",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        help="Per-round deadline in seconds; slower models are cancelled",
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Send a duplicate request to models slower than their recent p95 latency",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream tokens as they are generated (partial output goes to stderr in --multi mode)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the LLM response cache (LLM_RESPONSE_CACHE) for this run",
+    )
     parser.add_argument(
         "--cluster-session",
         help="Session id to load structured responses and perform clustering",
@@ -98,9 +125,46 @@ def parse_args() -> argparse.Namespace:
         default=5,
         help="Top K results to return when searching history",
     )
+    parser.add_argument(
+        "--search-mode",
+        choices=["exact", "ivf"],
+        default=os.getenv("VECTOR_SEARCH_MODE", "exact"),
+        help="History search: exact brute force or approximate IVF index",
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=None,
+        help="Number of IVF lists to probe (higher = better recall, slower)",
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        default=[],
+        metavar="FIELD=VALUE[,VALUE...]",
+        help="Restrict history search, e.g. model_id=ollama, session_id=a,b, round_min=2 (repeatable)",
+    )
     return parser.parse_args()
 
 
+def parse_filters(raw_filters: List[str]) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {}
+    for raw in raw_filters:
+        field, _, value = raw.partition("=")
+        field = field.strip()
+        if field in ("round", "round_min", "round_max"):
+            values = [int(v) for v in value.split(",") if v.strip()]
+        else:
+            values = [v.strip() for v in value.split(",") if v.strip()]
+        filters[field] = values[0] if len(values) == 1 else values
+    return filters
+
+
+def print_chunk(event_type: str, data: Dict[str, Any]) -> None:
+    if event_type == "model_chunk":
+        print(f"[{data['model_id']}] {data['delta']}", file=sys.stderr, flush=True)
+
+
 def build_client(backend_name: str, model_id: Optional[str]) -> MockAdapter | HuggingFaceAdapter:
     if backend_name == "mock":
         return MockAdapter()
@@ -121,12 +185,23 @@ async def run() -> None:
             max_rounds=args.max_rounds,
             prompt_id=args.prompt_id,
             prompt_version=args.prompt_version,
+            quorum=args.quorum,
+            deadline_s=args.deadline,
+            hedge=args.hedge,
+            stream=args.stream,
+            cache=not args.no_cache,
         )
         print(json.dumps(result, ensure_ascii=False, indent=2))
         return
 
     if args.search_history:
-        hits = search_similar(args.search_history, top_k=args.top_k)
+        hits = get_vector_store().search_similar(
+            args.search_history,
+            top_k=args.top_k,
+            mode=args.search_mode,
+            nprobe=args.nprobe,
+            filters=parse_filters(args.filter),
+        )
         printable = [
             {
                 "score": round(score, 4),
@@ -140,7 +215,7 @@ async def run() -> None:
         return
 
     if args.aggregate_session:
-        session = load_structured_session(args.aggregate_session)
+        session = get_session_store().load_session(args.aggregate_session)
         if not session:
             print(json.dumps({"error": f"session {args.aggregate_session} not found"}, ensure_ascii=False))
             return
@@ -154,7 +229,7 @@ async def run() -> None:
         return
 
     if args.cluster_session:
-        session = load_structured_session(args.cluster_session)
+        session = get_session_store().load_session(args.cluster_session)
         if not session:
             print(json.dumps({"error": f"session {args.cluster_session} not found"}, ensure_ascii=False))
             return
@@ -178,15 +253,26 @@ async def run() -> None:
             structured=args.structured,
             prompt_id=args.prompt_id,
             prompt_version=args.prompt_version,
+            quorum=args.quorum,
+            deadline_s=args.deadline,
+            hedge=args.hedge,
+            stream=args.stream,
+            on_event=print_chunk if args.stream else None,
+            cache=not args.no_cache,
         )
         if args.structured:
             session_id = str(uuid.uuid4())
             result["session_id"] = session_id
-            save_structured_session(session_id, result)
+            get_session_store().save_session(session_id, result)
         print(json.dumps(result, ensure_ascii=False, indent=2))
         return
 
     client = build_client(args.backend, args.model_id)
+    if args.stream:
+        async for chunk in client.generate_stream(args.question):
+            print(chunk, end="", flush=True)
+        print()
+        return
     try:
         output = await client.generate(args.question)
     except Exception as exc:  # pragma: no cover - CLI convenience
@@ -196,8 +282,16 @@ async def run() -> None:
     print(output)
 
 
+async def run_with_pool() -> None:
+    open_pool()
+    try:
+        await run()
+    finally:
+        await close_pool()
+
+
 def main() -> None:
-    asyncio.run(run())
+    asyncio.run(run_with_pool())
 
 
 if __name__ == "__main__":
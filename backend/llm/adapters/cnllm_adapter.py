@@ -1,5 +1,6 @@
 import os
-import requests
+
+from backend.services.http_pool import get_pool
 
 class CNLLMAdapter:
     """简单封装国内免费 LLM API"""
@@ -18,6 +19,6 @@ class CNLLMAdapter:
             "max_tokens": max_tokens,
             "temperature": temperature
         }
-        r = requests.post(self.endpoint, json=payload, headers=headers, timeout=60)
+        r = get_pool().sync_client(self.endpoint).post(self.endpoint, json=payload, headers=headers, timeout=60)
         r.raise_for_status()
         return r.json()
@@ -1,7 +1,9 @@
 
+import asyncio
 import json
 import os
-from typing import Any
+import threading
+from typing import Any, AsyncIterator
 from huggingface_hub import InferenceClient
 from backend.llm.client import LLMClient
 
@@ -51,3 +53,42 @@ class HuggingFaceAdapter(LLMClient):
             return str(res)
         except BaseException as exc:
             return _error_response(f"HF adapter error: {str(exc)[:200]}")
+
+    async def generate_stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        # text_generation(stream=True) is a blocking iterator; drain it in a
+        # worker thread and hand tokens to the loop through a queue.
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def _pump() -> None:
+            try:
+                for token in self.inf.text_generation(prompt, stream=True):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, token)
+            except BaseException as exc:
+                loop.call_soon_threadsafe(queue.put_nowait, exc)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        worker = loop.run_in_executor(None, _pump)
+        emitted = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    if emitted:
+                        raise RuntimeError(f"HF stream interrupted: {str(item)[:200]}")
+                    yield _error_response(f"HF adapter stream error: {str(item)[:200]}")
+                    break
+                if item:
+                    emitted = True
+                    yield str(item)
+        finally:
+            # An aborted consumer stops the worker at the next token.
+            stop.set()
+            worker.cancel()
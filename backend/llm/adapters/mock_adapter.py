@@ -1,10 +1,13 @@
+import asyncio
 import json
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 from backend.llm.client import LLMClient
 
 
 class MockAdapter(LLMClient):
+    chunk_size = 16
+
     async def generate(self, prompt: str, **kwargs: Any) -> str:
         # Deterministic structured payload to satisfy schema.
         summary_points: List[Dict[str, str]] = [
@@ -19,3 +22,9 @@ class MockAdapter(LLMClient):
             "reproducible_example": "print('mock')",
         }
         return json.dumps(structured)
+
+    async def generate_stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        text = await self.generate(prompt, **kwargs)
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+            await asyncio.sleep(0)
@@ -1,8 +1,9 @@
 import json
 import os
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
 from backend.llm.client import LLMClient
+from backend.services.http_pool import get_pool
 from backend.services.http_retry import post_json
 
 
@@ -40,7 +41,7 @@ class OllamaAdapter(LLMClient):
             payload.update(params)
 
         try:
-            resp = await post_json(self.endpoint, payload)
+            resp = await post_json(self.endpoint, payload, backend="ollama", model=self.model_id)
             data = resp.json()
             if isinstance(data, dict) and data.get("response"):
                 return str(data.get("response"))
@@ -48,3 +49,32 @@ class OllamaAdapter(LLMClient):
         except Exception as exc:  # pragma: no cover - network dependent
             error_msg = str(exc)[:200]  # Limit error message length
             return _error_response(f"Ollama adapter error after retries: {error_msg}")
+
+    async def generate_stream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        # Ollama streams NDJSON: one {"response": "<token>", "done": false} object per line.
+        payload: Dict[str, Any] = {"model": self.model_id, "prompt": prompt, "stream": True}
+        params = kwargs.get("parameters")
+        if params:
+            payload.update(params)
+
+        emitted = False
+        try:
+            client = get_pool().async_client(self.endpoint)
+            async with client.stream("POST", self.endpoint, json=payload, timeout=120.0) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(str(data["error"]))
+                    chunk = data.get("response")
+                    if chunk:
+                        emitted = True
+                        yield str(chunk)
+                    if data.get("done"):
+                        break
+        except Exception as exc:  # pragma: no cover - network dependent
+            if emitted:
+                raise
+            yield _error_response(f"Ollama adapter stream error: {str(exc)[:200]}")
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 
 
 class LLMClient(ABC):
@@ -6,3 +7,10 @@ class LLMClient(ABC):
     async def generate(self, prompt: str, **kwargs) -> str:
         """Return model output for the given prompt."""
         raise NotImplementedError
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Yield the model output in chunks as it is produced.
+
+        Adapters without native streaming yield the full ``generate`` result once.
+        """
+        yield await self.generate(prompt, **kwargs)
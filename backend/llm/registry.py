@@ -0,0 +1,127 @@
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from backend.llm.adapters.hf_adapter import HuggingFaceAdapter
+from backend.llm.adapters.mock_adapter import MockAdapter
+from backend.llm.adapters.ollama_adapter import OllamaAdapter
+from backend.llm.client import LLMClient
+from backend.services.rate_limit import RateLimiter, rate_limiter
+
+BACKENDS = {
+    "mock": {"name": "Mock Adapter", "version": "v1"},
+    "hf": {"name": "Hugging Face", "version": "default"},
+    "ollama": {"name": "Ollama Local", "version": "local"},
+}
+
+
+def resolve_model(model_id: str) -> Tuple[str, str]:
+    """Map a request model id to (backend, concrete model name)."""
+    mid = model_id.strip().lower()
+    if mid.startswith("mock"):
+        return "mock", "mock"
+    if mid == "hf":
+        # Allow overriding HF model id via env; default bigscience/bloom-560m for cloud inference.
+        return "hf", os.getenv("HF_MODEL_ID", "bigscience/bloom-560m")
+    if mid == "ollama":
+        return "ollama", os.getenv("OLLAMA_MODEL", "llama3.2")
+    raise ValueError(f"Unsupported model id: {model_id}")
+
+
+def _construct(backend: str, model_name: str) -> LLMClient:
+    if backend == "mock":
+        return MockAdapter()
+    if backend == "hf":
+        return HuggingFaceAdapter(model_id=model_name)
+    if backend == "ollama":
+        return OllamaAdapter(model_id=model_name)
+    raise ValueError(f"Unsupported backend: {backend}")
+
+
+class _BackendState:
+    def __init__(self) -> None:
+        self.last_error: Optional[str] = None
+
+
+class ModelRegistry:
+    """Builds each adapter once per (backend, model name) and routes every
+    call through the shared rate limiter, which bounds calls per backend
+    (MODEL_CONCURRENCY_<BACKEND> / RATE_LIMIT_<BACKEND>_*) and per model."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None) -> None:
+        self._lock = threading.Lock()
+        self._instances: Dict[Tuple[str, str], LLMClient] = {}
+        self._backends: Dict[str, _BackendState] = {}
+        self.limiter = limiter or RateLimiter()
+
+    def _state(self, backend: str) -> _BackendState:
+        state = self._backends.get(backend)
+        if state is None:
+            state = self._backends[backend] = _BackendState()
+        return state
+
+    def get(self, model_id: str) -> LLMClient:
+        backend, model_name = resolve_model(model_id)
+        with self._lock:
+            client = self._instances.get((backend, model_name))
+            if client is not None:
+                return client
+            try:
+                client = _construct(backend, model_name)
+            except Exception as exc:
+                self._state(backend).last_error = str(exc)[:200]
+                raise
+            self._instances[(backend, model_name)] = client
+            self._state(backend).last_error = None
+            return client
+
+    @asynccontextmanager
+    async def slot(self, model_id: str) -> AsyncIterator[None]:
+        backend, model_name = resolve_model(model_id)
+        async with self.limiter.limit(backend, model_name):
+            yield
+
+    def warm_up(self, model_ids: Sequence[str]) -> Dict[str, str]:
+        """Build adapters ahead of the first request; returns status per model id."""
+        status: Dict[str, str] = {}
+        for model_id in model_ids:
+            if not model_id.strip():
+                continue
+            try:
+                self.get(model_id)
+                status[model_id] = "ready"
+            except Exception as exc:
+                status[model_id] = f"error: {str(exc)[:200]}"
+        return status
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            models = []
+            for backend, info in BACKENDS.items():
+                state = self._state(backend)
+                limits = self.limiter.get(backend).snapshot()  # type: ignore[union-attr]
+                instances = [name for (b, name) in self._instances if b == backend]
+                if instances:
+                    status = "available"
+                elif state.last_error:
+                    status = "unavailable"
+                else:
+                    status = "not_loaded"
+                models.append({
+                    "id": backend,
+                    **info,
+                    "status": status,
+                    "instances": instances,
+                    "in_flight": limits["in_flight"],
+                    "queue_depth": limits["queue_depth"],
+                    "max_concurrency": limits["max_in_flight"],
+                    "rate_per_s": limits["rate_per_s"],
+                    "avg_wait_s": limits["avg_wait_s"],
+                    "calls": limits["calls"],
+                    "last_error": state.last_error,
+                })
+            return models
+
+
+model_registry = ModelRegistry(rate_limiter)
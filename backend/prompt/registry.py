@@ -1,15 +1,88 @@
-import yaml
+import hashlib
+import os
+import re
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+
+import yaml
 
 REGISTRY_PATH = Path(__file__).resolve().parents[1] / "prompts" / "prompt_registry.yaml"
 
+_PLACEHOLDER = re.compile(r"<([A-Z][A-Z0-9_]*)>")
+
+
+class CompiledPrompt:
+    """A template split at its placeholders (<USER_QUESTION>, ...) so that
+    rendering is one join, with the template hash computed once."""
+
+    def __init__(self, prompt_id: str, version: str, template: str) -> None:
+        self.id = prompt_id
+        self.version = version
+        self.template = template
+        self.sha256 = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        # Literal chunks interleaved with placeholder names:
+        # literals[0] names[0] literals[1] ... names[-1] literals[-1]
+        self.literals: List[str] = []
+        self.placeholders: List[str] = []
+        pos = 0
+        for match in _PLACEHOLDER.finditer(template):
+            self.literals.append(template[pos:match.start()])
+            self.placeholders.append(match.group(1))
+            pos = match.end()
+        self.literals.append(template[pos:])
+
+    def render(self, **values: str) -> str:
+        """Substitute placeholders in one pass; ones without a value are kept
+        verbatim, and substituted text is never scanned again."""
+        parts = [self.literals[0]]
+        for name, literal in zip(self.placeholders, self.literals[1:]):
+            value = values.get(name)
+            parts.append(f"<{name}>" if value is None else value)
+            parts.append(literal)
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """prompt_registry.yaml parsed once into a dict keyed by (id, version);
+    reloaded when the file's mtime changes."""
+
+    def __init__(self, path: Path = REGISTRY_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], CompiledPrompt] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self.loads = 0
+
+    def _refresh(self) -> None:
+        try:
+            st = os.stat(self.path)
+            stamp: Optional[Tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            entries: Dict[Tuple[str, str], CompiledPrompt] = {}
+            if stamp is not None:
+                for item in yaml.safe_load(self.path.read_text(encoding="utf-8")) or []:
+                    if item.get("id") and item.get("template") is not None:
+                        key = (str(item["id"]), str(item.get("version", "v1")))
+                        entries[key] = CompiledPrompt(key[0], key[1], item["template"])
+                self.loads += 1
+            self._entries = entries
+            self._stamp = stamp
+
+    def get(self, prompt_id: str, version: str = "v1") -> Optional[CompiledPrompt]:
+        self._refresh()
+        return self._entries.get((prompt_id, version))
+
+
+prompt_registry = PromptRegistry()
+
 
 def get_prompt(prompt_id: str, version: str = "v1") -> Optional[str]:
-    if not REGISTRY_PATH.exists():
-        return None
-    entries = yaml.safe_load(REGISTRY_PATH.read_text(encoding="utf-8")) or []
-    for item in entries:
-        if item.get("id") == prompt_id and item.get("version") == version:
-            return item.get("template")
-    return None
+    compiled = prompt_registry.get(prompt_id, version)
+    return compiled.template if compiled else None
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+
+class AggregationTimeout(TimeoutError):
+    """An aggregation job exceeded its time budget (AGGREGATION_TIMEOUT_S)."""
+
+
+def executor_kind() -> str:
+    """AGGREGATION_EXECUTOR: thread (default) | process | inline.
+
+    inline runs jobs on the event loop and blocks it, so it is meant for tests
+    and debugging only.
+    """
+    kind = os.getenv("AGGREGATION_EXECUTOR", "thread").strip().lower()
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unsupported AGGREGATION_EXECUTOR: {kind}")
+    return kind
+
+
+def aggregation_timeout() -> float:
+    return float(os.getenv("AGGREGATION_TIMEOUT_S", "120"))
+
+
+def _workers() -> int:
+    return max(1, int(os.getenv("AGGREGATION_WORKERS", "0")) or min(4, os.cpu_count() or 1))
+
+
+_lock = threading.Lock()
+_executors: Dict[Tuple[str, int], Executor] = {}
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "running": 0}
+
+
+def get_executor() -> Optional[Executor]:
+    """Shared pool for the configured kind and size; None for inline.
+
+    Process workers are spawned rather than forked so they never inherit the
+    event loop, open connections or held locks of the API process.
+    """
+    kind = executor_kind()
+    if kind == "inline":
+        return None
+    key = (kind, _workers())
+    with _lock:
+        executor = _executors.get(key)
+        if executor is None:
+            if kind == "process":
+                executor = ProcessPoolExecutor(max_workers=key[1], mp_context=multiprocessing.get_context("spawn"))
+            else:
+                executor = ThreadPoolExecutor(max_workers=key[1], thread_name_prefix="aggregation")
+            _executors[key] = executor
+        return executor
+
+
+def _count(field: str, delta: int = 1) -> None:
+    with _lock:
+        _stats[field] += delta
+
+
+async def run_job(fn: Callable[..., Any], *args: Any, timeout_s: Optional[float] = None) -> Any:
+    """Run ``fn(*args)`` on the aggregation pool without blocking the loop.
+
+    In process mode ``fn`` must be a module-level function and its arguments
+    and result are pickled, so callers pass plain lists/dicts. A job that runs
+    past ``timeout_s`` raises AggregationTimeout; its worker finishes in the
+    background and the result is discarded. Inline jobs cannot be
+    interrupted: one that ran past ``timeout_s`` raises AggregationTimeout
+    once it returns, so callers see the same outcome in every mode.
+    """
+    timeout_s = aggregation_timeout() if timeout_s is None else timeout_s
+    executor = get_executor()
+    _count("submitted")
+    _count("running")
+    try:
+        if executor is None:
+            t0 = time.monotonic()
+            result = fn(*args)
+            if time.monotonic() - t0 > timeout_s:
+                raise asyncio.TimeoutError()
+        else:
+            future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            result = await asyncio.wait_for(future, max(0.0, timeout_s))
+    except asyncio.TimeoutError as exc:
+        _count("timed_out")
+        raise AggregationTimeout(f"Aggregation job {fn.__name__} exceeded {timeout_s:g}s") from exc
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); drop the pool so the next job gets a new one.
+        with _lock:
+            for key, pooled in list(_executors.items()):
+                if pooled is executor:
+                    del _executors[key]
+        _count("failed")
+        raise
+    except Exception:
+        _count("failed")
+        raise
+    finally:
+        _count("running", -1)
+    _count("completed")
+    return result
+
+
+def executor_stats() -> Dict[str, Any]:
+    with _lock:
+        return {"kind": executor_kind(), "workers": _workers(), **_stats}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,7 +1,9 @@
-from typing import Any, Dict, List
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 
+from backend.services.aggregation_executor import aggregation_timeout, run_job
 from backend.services.cross_eval import cross_evaluate
-from backend.services.nli import simple_nli
+from backend.services.nli import nli_batch, remember_judgements, simple_nli
 from backend.services.semantic import cluster_points, embed_points, extract_points
 
 
@@ -74,11 +76,66 @@ def _summarize(clusters: List[List[str]], nli_results: List[Dict[str, Any]], cro
     }
 
 
-def aggregate_structured_responses(structured: List[Dict[str, Any]]):
-    points = extract_points(structured)
+def _cluster_pairs(clusters: List[List[str]], point_lookup: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
+    # Every in-cluster pair; cross_evaluate judges a subset of these.
+    pairs: List[Tuple[str, str]] = []
+    for cluster in clusters:
+        for i in range(len(cluster)):
+            for j in range(i + 1, len(cluster)):
+                a = point_lookup.get(cluster[i])
+                b = point_lookup.get(cluster[j])
+                if a and b:
+                    pairs.append((a.get("text", ""), b.get("text", "")))
+    return pairs
+
+
+def _cluster(points: List[Dict[str, Any]]) -> List[List[str]]:
     embeddings = embed_points(points)
-    clusters = cluster_points(points, embeddings, threshold=0.5)
-    lookup = _build_point_lookup(points)
+    return cluster_points(points, embeddings, threshold=0.5)
+
+
+def _prepare(structured: List[Dict[str, Any]]) -> Tuple[List[List[str]], Dict[str, Dict[str, Any]]]:
+    points = extract_points(structured)
+    return _cluster(points), _build_point_lookup(points)
+
+
+def _judge_and_summarize(clusters: List[List[str]], lookup: Dict[str, Dict[str, Any]]):
     nli_results = _nli_matrix(clusters, lookup)
     cross_results = cross_evaluate(clusters, lookup)
     return _summarize(clusters, nli_results, cross_results, lookup)
+
+
+def _judge_with_labels(
+    clusters: List[List[str]],
+    lookup: Dict[str, Dict[str, Any]],
+    pairs: List[Tuple[str, str]],
+    labels: List[str],
+):
+    # A process worker has its own (empty) judgement cache: seed it with the
+    # labels prefetched on the event loop so no pair is judged twice.
+    remember_judgements(pairs, labels)
+    return _judge_and_summarize(clusters, lookup)
+
+
+def aggregate_structured_responses(structured: List[Dict[str, Any]]):
+    clusters, lookup = _prepare(structured)
+    return _judge_and_summarize(clusters, lookup)
+
+
+async def aggregate_structured_responses_async(structured: List[Dict[str, Any]], timeout_s: Optional[float] = None):
+    """Same report, computed off the event loop.
+
+    Embedding + clustering and the judge/summary pass run on the aggregation
+    pool (AGGREGATION_EXECUTOR); in between, all pairs of the round are judged
+    through the batched async NLI backend on the loop. Only points, clusters
+    and labels cross the pool boundary. Both pool jobs share one budget of
+    ``timeout_s`` (AGGREGATION_TIMEOUT_S) and raise AggregationTimeout past it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (aggregation_timeout() if timeout_s is None else timeout_s)
+    points = extract_points(structured)
+    clusters = await run_job(_cluster, points, timeout_s=deadline - loop.time())
+    lookup = _build_point_lookup(points)
+    pairs = _cluster_pairs(clusters, lookup)
+    labels = await nli_batch(pairs)
+    return await run_job(_judge_with_labels, clusters, lookup, pairs, labels, timeout_s=deadline - loop.time())
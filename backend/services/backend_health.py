@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-backend breaker: after ``failure_threshold`` consecutive failures the
+    circuit opens and calls fail fast for ``cooldown_s``; then one probe call is
+    let through (half-open) and its outcome closes or re-opens the circuit."""
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_s: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.metrics: Dict[str, Any] = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "opened": 0,
+            "last_error": None,
+        }
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+            self._state = HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Reserve a call; False means fail fast without touching the backend."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.metrics["short_circuited"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.metrics["calls"] += 1
+            self.metrics["successes"] += 1
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._state = CLOSED
+
+    def record_failure(self, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.metrics["calls"] += 1
+            self.metrics["failures"] += 1
+            if exc is not None:
+                self.metrics["last_error"] = str(exc)[:200]
+            self._consecutive_failures += 1
+            was_probe = self._probe_in_flight
+            self._probe_in_flight = False
+            if was_probe or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.metrics["opened"] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Give back a reservation whose call ended without an outcome (e.g.
+        it was cancelled), so the next caller can probe instead."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self.record_failure(exc)
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as exc:
+            self.record_failure(exc)
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_s": self.cooldown_s,
+                **self.metrics,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Shared breaker for a backend; thresholds come from CB_FAILURE_THRESHOLD /
+    CB_COOLDOWN_S, overridable per backend as CB_<NAME>_FAILURE_THRESHOLD etc."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            prefix = f"CB_{name.upper()}_"
+            threshold = os.getenv(prefix + "FAILURE_THRESHOLD", os.getenv("CB_FAILURE_THRESHOLD", "3"))
+            cooldown = os.getenv(prefix + "COOLDOWN_S", os.getenv("CB_COOLDOWN_S", "30"))
+            breaker = CircuitBreaker(name, failure_threshold=int(threshold), cooldown_s=float(cooldown))
+            _breakers[name] = breaker
+        return breaker
+
+
+def health_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def reset_breakers() -> None:
+    with _registry_lock:
+        _breakers.clear()
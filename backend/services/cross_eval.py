@@ -1,6 +1,6 @@
 from typing import Any, Dict, List
 
-from backend.prompt.registry import get_prompt
+from backend.prompt.registry import prompt_registry
 from backend.services.nli import simple_nli
 
 
@@ -21,6 +21,7 @@ def _judge_pair(a_text: str, b_text: str) -> Dict[str, Any]:
 
 def cross_evaluate(clusters: List[List[str]], point_lookup: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
+    prompt_used = prompt_registry.get("peerreviewer_v1") is not None
     for cluster in clusters:
         # Only consider pairs from different models
         for i in range(len(cluster)):
@@ -40,7 +41,7 @@ def cross_evaluate(clusters: List[List[str]], point_lookup: Dict[str, Dict[str,
                         "a": {"id": a_id, "model_id": a.get("model_id")},
                         "b": {"id": b_id, "model_id": b.get("model_id")},
                         **eval_result,
-                        "prompt_used": bool(get_prompt("peerreviewer_v1")),
+                        "prompt_used": prompt_used,
                     }
                 )
     return results
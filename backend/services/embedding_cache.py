@@ -0,0 +1,104 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+Vector = List[float]
+
+
+def text_key(model: str, text: str) -> str:
+    """Content address of an embedding: (model name, sha256 of the text)."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """LRU of embeddings with an optional SQLite tier storing float32 BLOBs."""
+
+    def __init__(self, max_entries: int = 8192, path: Optional[Path] = None) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self._mem: "OrderedDict[str, Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        return self._db
+
+    def _remember(self, key: str, vec: Vector) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vec = self._mem.get(key)
+                if vec is not None:
+                    self._mem.move_to_end(key)
+                    found[key] = vec
+                    self.hits += 1
+                else:
+                    missing.append(key)
+            from_disk = 0
+            db = self._conn()
+            for start in range(0, len(missing) if db is not None else 0, 500):
+                chunk = missing[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, blob in db.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", chunk):
+                    vec = array("f", blob).tolist()
+                    self._remember(key, vec)
+                    found[key] = vec
+                    from_disk += 1
+            self.disk_hits += from_disk
+            self.misses += len(missing) - from_disk
+        return found
+
+    def put_many(self, entries: Dict[str, Vector]) -> None:
+        with self._lock:
+            for key, vec in entries.items():
+                self._remember(key, vec)
+            db = self._conn()
+            if db is not None and entries:
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                    [(key, array("f", vec).tobytes()) for key, vec in entries.items()],
+                )
+                db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+_cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "8192")),
+    path=Path(_cache_path) if _cache_path else None,
+)
@@ -1,7 +1,10 @@
 import os
-from typing import Iterable, List
+from typing import Dict, Iterable, List
 
-import httpx
+from backend.services.backend_health import get_breaker
+from backend.services.embedding_cache import embedding_cache, text_key
+from backend.services.http_pool import get_pool
+from backend.services.rate_limit import rate_limiter
 
 Vector = List[float]
 
@@ -52,21 +55,40 @@ def _hf_embed(texts: Iterable[str], dim: int = 384) -> List[Vector]:
     payload_list = list(texts)
     payload_to_send = payload_list if len(payload_list) > 1 else (payload_list[0] if payload_list else "")
 
-    with httpx.Client(timeout=30.0) as client:
-        resp = client.post(endpoint, headers=headers, json=payload_to_send)
-        resp.raise_for_status()
-        data = resp.json()
-        if isinstance(data, list) and data and isinstance(data[0], list):
-            return [list(map(float, v)) for v in data]
-        if isinstance(data, list) and all(isinstance(x, (int, float)) for x in data):
-            return [list(map(float, data))]
-        raise RuntimeError(f"Unexpected embedding response: {data}")
+    client = get_pool().sync_client(endpoint)
+    with rate_limiter.limit_sync("hf", model):
+        resp = client.post(endpoint, headers=headers, json=payload_to_send, timeout=30.0)
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, list) and data and isinstance(data[0], list):
+        return [list(map(float, v)) for v in data]
+    if isinstance(data, list) and all(isinstance(x, (int, float)) for x in data):
+        return [list(map(float, data))]
+    raise RuntimeError(f"Unexpected embedding response: {data}")
 
 
 def embed_texts(texts: List[str]) -> List[Vector]:
+    # Remote embeddings are content-addressed by (model, text hash); only
+    # cache misses are sent to the backend.
+    model = os.getenv("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    keys = [text_key(model, t) for t in texts]
+    found = embedding_cache.get_many(list(dict.fromkeys(keys)))
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
     try:
         # Try remote embeddings first.
-        return _hf_embed(texts)
+        if missing:
+            fetched = get_breaker("hf_embed").call(_hf_embed, list(missing.values()))
+            if len(fetched) != len(missing):
+                raise RuntimeError("Embedding count does not match request")
+            new_entries = dict(zip(missing.keys(), fetched))
+            embedding_cache.put_many(new_entries)
+            found.update(new_entries)
+        return [list(found[key]) for key in keys]
     except Exception:
         # Fallback to deterministic stub embeddings to keep pipeline running.
+        # Not cached: the stub hashes with the per-process salted hash(), and
+        # mixing it with cached remote vectors would mix embedding widths.
         return [_vectorize_stub(t) for t in texts]
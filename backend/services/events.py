@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+Event = Dict[str, Any]
+
+# Event types published for a session.
+MODEL_RESPONSE = "model_response"
+MODEL_CHUNK = "model_chunk"
+ROUND_STARTED = "round_started"
+ROUND_AGGREGATED = "round_aggregated"
+FINALIZED = "finalized"
+
+
+class EventBus:
+    """In-process pub/sub of session progress.
+
+    Each session keeps a bounded history so late subscribers (or SSE
+    reconnects with Last-Event-ID) replay what they missed; live events are
+    pushed to subscriber queues on the subscriber's own event loop. Event ids
+    come from one bus-wide sequence, so they keep increasing for a session
+    even after its history is evicted.
+    """
+
+    def __init__(self, history_size: int = 256, max_sessions: int = 512) -> None:
+        self.history_size = history_size
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._history: "OrderedDict[str, Deque[Event]]" = OrderedDict()
+        self._last_id = 0
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(
+        self,
+        session_id: Optional[str],
+        event_type: str,
+        data: Dict[str, Any],
+        persist: bool = True,
+    ) -> None:
+        """Deliver an event to live subscribers; ``persist=False`` skips the
+        replay history (used for high-volume token chunks)."""
+        if not session_id:
+            return
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "session_id": session_id, "ts": time.time(), "data": data}
+            if persist:
+                history = self._history.get(session_id)
+                if history is None:
+                    history = self._history[session_id] = deque(maxlen=self.history_size)
+                    while len(self._history) > self.max_sessions:
+                        self._history.popitem(last=False)
+                self._history.move_to_end(session_id)
+                history.append(event)
+            subscribers = list(self._subscribers.get(session_id, ()))
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def history(self, session_id: str, after_id: int = 0) -> List[Event]:
+        with self._lock:
+            return [e for e in self._history.get(session_id, ()) if e["id"] > after_id]
+
+    async def subscribe(
+        self,
+        session_id: str,
+        after_id: int = 0,
+        heartbeat_s: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Event]]:
+        """Yield replayed then live events until FINALIZED; yields None as a
+        heartbeat when ``heartbeat_s`` passes without an event."""
+        queue: asyncio.Queue = asyncio.Queue()
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append(entry)
+            replay = [e for e in self._history.get(session_id, ()) if e["id"] > after_id]
+        last_id = after_id
+        try:
+            for event in replay:
+                last_id = event["id"]
+                yield event
+                if event["type"] == FINALIZED:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["id"] <= last_id:
+                    continue  # already delivered by the replay
+                last_id = event["id"]
+                yield event
+                if event["type"] == FINALIZED:
+                    return
+        finally:
+            with self._lock:
+                subs = self._subscribers.get(session_id, [])
+                if entry in subs:
+                    subs.remove(entry)
+                if not subs:
+                    self._subscribers.pop(session_id, None)
+
+
+event_bus = EventBus()
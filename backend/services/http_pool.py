@@ -0,0 +1,202 @@
+import asyncio
+import importlib.util
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else url
+
+
+class _HostStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.errors = 0
+        self.clients_created = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class _CountingAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport, stats: _HostStats, lock: threading.Lock) -> None:
+        self._inner = inner
+        self._stats = stats
+        self._lock = lock
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self._stats.requests += 1
+            self._stats.in_flight += 1
+            self._stats.peak_in_flight = max(self._stats.peak_in_flight, self._stats.in_flight)
+        try:
+            return await self._inner.handle_async_request(request)
+        except Exception:
+            with self._lock:
+                self._stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats.in_flight -= 1
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _CountingSyncTransport(httpx.BaseTransport):
+    def __init__(self, inner: httpx.BaseTransport, stats: _HostStats, lock: threading.Lock) -> None:
+        self._inner = inner
+        self._stats = stats
+        self._lock = lock
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self._stats.requests += 1
+            self._stats.in_flight += 1
+            self._stats.peak_in_flight = max(self._stats.peak_in_flight, self._stats.in_flight)
+        try:
+            return self._inner.handle_request(request)
+        except Exception:
+            with self._lock:
+                self._stats.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats.in_flight -= 1
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class HttpPool:
+    """Application-scoped keep-alive clients, one per host (and per event loop
+    for async clients, since an AsyncClient cannot be shared across loops).
+
+    Per-host limits come from HTTP_POOL_MAX_CONNECTIONS /
+    HTTP_POOL_MAX_KEEPALIVE / HTTP_POOL_KEEPALIVE_EXPIRY_S; HTTP/2 is used
+    when the optional ``h2`` package is installed (HTTP_POOL_HTTP2=0 disables).
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=max_keepalive or int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=keepalive_expiry or float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_S", "30")),
+        )
+        if http2 is None:
+            http2 = os.getenv("HTTP_POOL_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+        self.http2 = http2
+        self._lock = threading.Lock()
+        self._async: Dict[Tuple[str, asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+        self._sync: Dict[str, httpx.Client] = {}
+        self._stats: Dict[str, _HostStats] = {}
+
+    def _host_stats(self, host: str) -> _HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = _HostStats()
+        return stats
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        host = _host_key(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async.get((host, loop))
+            if client is not None and not client.is_closed:
+                return client
+            # Clients of loops that have since closed cannot be awaited; drop them.
+            for key in [key for key in self._async if key[1].is_closed()]:
+                del self._async[key]
+            stats = self._host_stats(host)
+            stats.clients_created += 1
+            transport = _CountingAsyncTransport(
+                httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2), stats, self._lock
+            )
+            client = httpx.AsyncClient(transport=transport, timeout=120.0)
+            self._async[(host, loop)] = client
+            return client
+
+    def sync_client(self, url: str) -> httpx.Client:
+        host = _host_key(url)
+        with self._lock:
+            client = self._sync.get(host)
+            if client is not None and not client.is_closed:
+                return client
+            stats = self._host_stats(host)
+            stats.clients_created += 1
+            transport = _CountingSyncTransport(
+                httpx.HTTPTransport(limits=self.limits, http2=self.http2), stats, self._lock
+            )
+            client = httpx.Client(transport=transport, timeout=120.0)
+            self._sync[host] = client
+            return client
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Clients of other live loops stay registered for their own aclose().
+            async_clients = [client for key, client in self._async.items() if key[1] is loop]
+            self._async = {
+                key: client
+                for key, client in self._async.items()
+                if key[1] is not loop and not key[1].is_closed()
+            }
+            sync_clients = list(self._sync.values())
+            self._sync.clear()
+        for client in async_clients:
+            await client.aclose()
+        for client in sync_clients:
+            client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "limits": {
+                    "max_connections": self.limits.max_connections,
+                    "max_keepalive_connections": self.limits.max_keepalive_connections,
+                    "keepalive_expiry": self.limits.keepalive_expiry,
+                },
+                "hosts": {host: stats.as_dict() for host, stats in self._stats.items()},
+            }
+
+
+_pool: Optional[HttpPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> HttpPool:
+    """The shared pool; created lazily for callers outside the API/CLI lifecycle."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HttpPool()
+        return _pool
+
+
+def open_pool() -> HttpPool:
+    global _pool
+    with _pool_lock:
+        _pool = HttpPool()
+        return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
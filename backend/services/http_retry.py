@@ -1,31 +1,85 @@
 import asyncio
+import os
+import random
 from typing import Dict, Optional
 
 import httpx
 
-# Simple async POST with retry/backoff for transient errors.
+from backend.services.http_pool import _host_key, get_pool
+from backend.services.rate_limit import rate_limiter
+from backend.services.retry import decorrelated_jitter, get_retry_budget, parse_retry_after, remaining_time
+
+
+def _retryable(exc: Exception, status_forcelist: tuple[int, ...]) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in status_forcelist
+    return isinstance(exc, httpx.RequestError)
+
+
+# Async POST with retry for transient errors.
 async def post_json(
     url: str,
     payload: Dict,
     headers: Optional[Dict[str, str]] = None,
-    timeout: float = 120.0,  # 增加到 120 秒，因为 LLM API 调用可能需要较长时间
+    timeout: float = 120.0,  # 单次尝试上限；调用方设置了截止时间时取二者较小值
     retries: int = 2,
     backoff: float = 0.5,
     status_forcelist: tuple[int, ...] = (429, 500, 502, 503, 504),
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
+    max_backoff: float = 10.0,
 ) -> httpx.Response:
+    """POST JSON, retrying connection errors and ``status_forcelist`` responses.
+
+    - A Retry-After header sets the wait; otherwise waits use decorrelated
+      jitter between ``backoff`` and ``max_backoff``.
+    - Retries spend the retry budget of ``backend`` (or the host), so they
+      stay a fraction of its traffic; with the budget empty the error is raised.
+    - Each attempt's timeout is capped by the time left before the caller's
+      deadline (retry.deadline_after), and no retry is started that could not
+      finish before it.
+    """
+    budget = get_retry_budget(backend or _host_key(url))
+    budget.deposit()
+    retry_after_max = float(os.getenv("RETRY_AFTER_MAX_S", "60"))
     last_exc: Exception | None = None
+    sleep_s = backoff
     for attempt in range(retries + 1):
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            break
+        retry_after: Optional[float] = None
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                resp = await client.post(url, headers=headers, json=payload)
-                if resp.status_code in status_forcelist:
-                    raise httpx.HTTPStatusError("retryable status", request=resp.request, response=resp)
-                resp.raise_for_status()
-                return resp
+            if attempt and backend:
+                # Retries are extra requests: they pay the backend's rate limit too.
+                await rate_limiter.throttle(backend, model)
+            # Keep-alive client from the shared pool: retries reuse the connection.
+            client = get_pool().async_client(url)
+            attempt_timeout = timeout if remaining is None else min(timeout, remaining)
+            resp = await client.post(url, headers=headers, json=payload, timeout=attempt_timeout)
+            if resp.status_code in status_forcelist:
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                raise httpx.HTTPStatusError(f"retryable status {resp.status_code}", request=resp.request, response=resp)
+            resp.raise_for_status()
+            return resp
         except (httpx.HTTPStatusError, httpx.RequestError) as exc:
             last_exc = exc
-            if attempt == retries:
+            if attempt == retries or not _retryable(exc, status_forcelist):
+                break
+            sleep_s = decorrelated_jitter(sleep_s, backoff, max_backoff)
+            if retry_after is not None:
+                if retry_after > retry_after_max:
+                    break
+                # Spread clients told the same Retry-After over a short window.
+                wait = retry_after + random.uniform(0, backoff)
+            else:
+                wait = sleep_s
+            remaining = remaining_time()
+            if remaining is not None and wait >= remaining:
+                break
+            if not budget.try_spend():
                 break
-            await asyncio.sleep(backoff * (2**attempt))
-    assert last_exc is not None
+            await asyncio.sleep(wait)
+    if last_exc is None:
+        raise httpx.TimeoutException(f"Deadline exceeded before POST {url}")
     raise last_exc
@@ -2,14 +2,11 @@ import json
 import uuid
 from typing import Any, Dict, List, Optional
 
-from backend.services.aggregator import aggregate_structured_responses
+from backend.services.aggregation_executor import AggregationTimeout
+from backend.services.aggregator import aggregate_structured_responses_async
+from backend.services.events import FINALIZED, ROUND_AGGREGATED, ROUND_STARTED, event_bus
 from backend.services.orchestrator import multi_model_query
-from backend.storage.vector_store import add_documents
-from backend.storage.simple_store import (
-    append_iteration_round,
-    finalize_iteration_session,
-    save_iteration_session,
-)
+from backend.storage.base import get_session_store, get_vector_store
 
 
 async def run_iterations(
@@ -19,59 +16,123 @@ async def run_iterations(
     prompt_id: str = "answerer_v1",
     prompt_version: str = "v1",
     session_id: Optional[str] = None,
+    quorum: Optional[int] = None,
+    deadline_s: Optional[float] = None,
+    hedge: bool = False,
+    seed_round: Optional[Dict[str, Any]] = None,
+    stream: bool = False,
+    cache: bool = True,
 ) -> Dict[str, Any]:
-    from backend.storage.simple_store import load_iteration_session
-    
+    """Run up to max_rounds of query + aggregation until agreement converges.
+
+    seed_round is an already collected multi_model_query result used as the
+    first round (POST /v1/query passes its round 1 so models are not asked
+    twice). For an existing session, rounds that already have a report are
+    kept and iteration resumes after them.
+    """
+    store = get_session_store()
+    existing: Dict[str, Any] = {}
     if session_id is None:
         session_id = str(uuid.uuid4())
         session_meta = {"session_id": session_id, "question": question, "models": models, "rounds": []}
-        save_iteration_session(session_id, session_meta)
+        await store.save_session_async(session_id, session_meta)
     else:
         # 如果 session 已存在，读取它（可能已有第一轮数据）
-        existing = load_iteration_session(session_id)
-        if existing:
-            # 使用已存在的 session，但确保 question 和 models 一致
-            pass
-        else:
+        existing = await store.load_session_async(session_id) or {}
+        if not existing:
             # Session 不存在，创建新的
             session_meta = {"session_id": session_id, "question": question, "models": models, "rounds": []}
-            save_iteration_session(session_id, session_meta)
+            await store.save_session_async(session_id, session_meta)
 
     state = "running"
     prev_contradictions = None
     final_report: Dict[str, Any] = {}
-
-    for round_idx in range(1, max_rounds + 1):
-        multi = await multi_model_query(
-            question,
-            models,
-            structured=True,
-            prompt_id=prompt_id,
-            prompt_version=prompt_version,
-        )
+    report: Dict[str, Any] = {}
+
+    # Resume after the last aggregated round instead of starting over.
+    start_round = 1
+    persisted = existing.get("rounds", []) or []
+    aggregated = [r for r in persisted if r.get("report") is not None]
+    if aggregated:
+        last = aggregated[-1]
+        start_round = int(last.get("round", len(aggregated))) + 1
+        prev_contradictions = last.get("contradictions")
+        report = last["report"]
+    if seed_round is None:
+        # A persisted but not yet aggregated round (e.g. saved by POST /v1/query)
+        # is used as-is rather than asking every model again.
+        pending = [
+            r for r in persisted
+            if r.get("report") is None and r.get("round") == start_round and r.get("multi")
+        ]
+        if pending:
+            seed_round = pending[-1]["multi"]
+
+    for round_idx in range(start_round, max_rounds + 1):
+        seeded = round_idx == start_round and seed_round is not None
+        event_bus.publish(session_id, ROUND_STARTED, {"round": round_idx, "seeded": seeded})
+        if seeded:
+            multi = seed_round
+            # The seed is the pending entry saved for this round by POST
+            # /v1/query (or an earlier run), so replacing it loses nothing.
+            round_no = round_idx
+        else:
+            multi = await multi_model_query(
+                question,
+                models,
+                structured=True,
+                prompt_id=prompt_id,
+                prompt_version=prompt_version,
+                quorum=quorum,
+                deadline_s=deadline_s,
+                hedge=hedge,
+                session_id=session_id,
+                round_idx=round_idx,
+                stream=stream,
+                cache=cache,
+            )
+            # Let the store number the round: a follow-up appended meanwhile
+            # keeps its number instead of being overwritten by this one.
+            # Saving the responses first also lets a restart resume here.
+            round_no = await store.append_round_async(session_id, {"round": None, "multi": multi, "report": None})
         structured_items = [
             {"model_id": r.get("model_id"), "parsed": r.get("parsed")}
             for r in multi.get("responses", [])
             if r.get("parsed")
         ]
-        report = aggregate_structured_responses(structured_items)
+        try:
+            report = await aggregate_structured_responses_async(structured_items)
+        except AggregationTimeout:
+            # Keep the round's responses; the session ends with the last report.
+            if seeded:
+                await store.append_round_async(session_id, {"round": round_no, "multi": multi, "report": None})
+            state = "aggregation_timeout"
+            final_report = report
+            break
 
         contradictions = len(report.get("contradictions", []))
         cluster_total = len(report.get("contradictions", [])) + len(report.get("confirmed", []))
         agreement_score = 1.0 if cluster_total == 0 else len(report.get("confirmed", [])) / cluster_total
 
         round_entry = {
-            "round": round_idx,
+            "round": round_no,
             "multi": multi,
             "report": report,
             "contradictions": contradictions,
             "agreement_score": agreement_score,
         }
-        append_iteration_round(session_id, round_entry)
+        # Replaces this round's own pending (report-less) entry.
+        await store.append_round_async(session_id, round_entry)
+        event_bus.publish(session_id, ROUND_AGGREGATED, {
+            "round": round_no,
+            "report": report,
+            "contradictions": contradictions,
+            "agreement_score": agreement_score,
+        })
 
         # Persist to vector store for later semantic retrieval.
         docs_to_add: List[Dict[str, Any]] = [
-            {"text": question, "meta": {"role": "question", "round": round_idx}},
+            {"text": question, "meta": {"role": "question", "round": round_no}},
         ]
         for r in structured_items:
             model_id = r.get("model_id")
@@ -79,10 +140,15 @@ async def run_iterations(
                 docs_to_add.append(
                     {
                         "text": sp.get("text", ""),
-                        "meta": {"model_id": model_id, "round": round_idx, "point_id": sp.get("id", "")},
+                        "meta": {
+                            "role": "summary_point",
+                            "model_id": model_id,
+                            "round": round_no,
+                            "point_id": sp.get("id", ""),
+                        },
                     }
                 )
-        add_documents(session_id, docs_to_add)
+        await get_vector_store().add_documents_async(session_id, docs_to_add)
 
         converged = False
         if prev_contradictions is not None and prev_contradictions > 0 and contradictions <= prev_contradictions * 0.5:
@@ -103,18 +169,20 @@ async def run_iterations(
 
     if not final_report:
         final_report = report  # last report
+        if start_round > max_rounds:
+            state = "max_rounds_reached"
 
-    finalize_iteration_session(session_id, state, final_report)
+    await store.finalize_session_async(session_id, state, final_report)
+    event_bus.publish(session_id, FINALIZED, {"state": state, "final_report": final_report})
+    data = await store.load_session_async(session_id) or {}
     return {
         "session_id": session_id,
         "state": state,
-        "rounds": load_rounds(session_id),
+        "rounds": data.get("rounds", []),
         "final_report": final_report,
     }
 
 
 def load_rounds(session_id: str) -> List[Dict[str, Any]]:
-    from backend.storage.simple_store import load_iteration_session
-
-    data = load_iteration_session(session_id) or {}
+    data = get_session_store().load_session(session_id) or {}
     return data.get("rounds", [])
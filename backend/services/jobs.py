@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from backend.services.events import FINALIZED, event_bus
+from backend.services.iteration_controller import run_iterations
+from backend.storage.base import get_session_store
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+Job = Dict[str, Any]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    state      TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    owner      TEXT,
+    error      TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id);
+"""
+
+
+# Marks the jobs this process runs: "<host>:<pid>".
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that claimed a job may still be running it."""
+    host, _, pid = (owner or "").rpartition(":")
+    if not pid.isdigit():
+        return False  # claimed before owners were recorded
+    if host != socket.gethostname():
+        return True  # another host cannot be checked; leave its jobs alone
+    if int(pid) == os.getpid():
+        return False  # left over from before this process's workers started
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class QueueFull(RuntimeError):
+    """More than JOB_QUEUE_MAX jobs are waiting."""
+
+
+def job_queue_path() -> str:
+    from backend.storage import simple_store
+
+    return os.getenv("JOB_QUEUE_PATH") or str(simple_store.STORE_DIR / "jobs.db")
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+class JobQueue:
+    """FIFO of background session jobs in a SQLite (WAL) file, so queued and
+    interrupted work survives a restart.
+
+    State transitions: queued -> running -> done | failed; a running job goes
+    back to queued when the process stops (release) or crashed (recover).
+
+    Several processes on one host may share the file: a job is claimed by a
+    conditional UPDATE, so only one of them gets it, and it records its
+    owner so recover() leaves jobs of other live processes alone. Sharing
+    the file across hosts is not supported.
+    """
+
+    def __init__(self, path: str, max_queued: Optional[int] = None) -> None:
+        self.path = path
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv("JOB_QUEUE_MAX", "100"))
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        if "owner" not in {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._lock = threading.Lock()
+
+    def has_capacity(self) -> bool:
+        return self.counts().get(QUEUED, 0) < self.max_queued
+
+    def enqueue(self, session_id: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            (queued,) = self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs already queued (JOB_QUEUE_MAX={self.max_queued})")
+            self._db.execute(
+                "INSERT INTO jobs (job_id, session_id, payload, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, session_id, json.dumps(payload), QUEUED, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Job]:
+        """Oldest queued job, marked running by this process; None if the queue is empty."""
+        with self._lock:
+            while True:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY created_at, rowid LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                with self._db:
+                    # Only one process wins a job another one is claiming too.
+                    claimed = self._db.execute(
+                        "UPDATE jobs SET state = ?, owner = ?, attempts = attempts + 1, updated_at = ?"
+                        " WHERE job_id = ? AND state = ?",
+                        (RUNNING, _OWNER, time.time(), row["job_id"], QUEUED),
+                    ).rowcount
+                if claimed:
+                    break
+        job = _row_to_job(row)
+        job["state"] = RUNNING
+        job["owner"] = _OWNER
+        job["attempts"] += 1
+        return job
+
+    def finish(self, job_id: str, state: str, error: Optional[str] = None) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (state, error, time.time(), job_id),
+            )
+
+    def release(self, job_id: str) -> None:
+        """Put a running job back without counting the attempt (clean shutdown)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, attempts = MAX(attempts - 1, 0), updated_at = ? WHERE job_id = ? AND state = ?",
+                (QUEUED, time.time(), job_id, RUNNING),
+            )
+
+    def recover(self, max_attempts: int) -> List[Job]:
+        """Requeue jobs left running by a process that is gone. Jobs that
+        already used ``max_attempts`` are failed instead and returned."""
+        now = time.time()
+        exhausted: List[Job] = []
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT * FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            for row in rows:
+                if _owner_alive(row["owner"]):
+                    continue
+                if row["attempts"] >= max_attempts:
+                    self._db.execute(
+                        "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE job_id = ? AND state = ?",
+                        (FAILED, "interrupted too many times", now, row["job_id"], RUNNING),
+                    )
+                    exhausted.append(_row_to_job(row))
+                else:
+                    self._db.execute(
+                        "UPDATE jobs SET state = ?, updated_at = ? WHERE job_id = ? AND state = ?",
+                        (QUEUED, now, row["job_id"], RUNNING),
+                    )
+        return exhausted
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: n for state, n in rows}
+
+
+async def run_session_job(job: Job) -> None:
+    # Resumes after the session's last aggregated round (see run_iterations).
+    await run_iterations(session_id=job["session_id"], **job["payload"])
+
+
+async def fail_session(session_id: str, error: str) -> None:
+    """Finalize a session as failed and tell its subscribers."""
+    report = {"error": error}
+    try:
+        await get_session_store().finalize_session_async(session_id, FAILED, report)
+    except Exception:
+        logger.exception("Failed to mark session %s as failed", session_id)
+    event_bus.publish(session_id, FINALIZED, {"state": FAILED, "final_report": report})
+
+
+class JobRunner:
+    """A fixed pool of JOB_WORKERS asyncio workers draining the job queue.
+
+    Worker tasks are kept in ``_tasks`` so they are never garbage-collected;
+    start() requeues jobs interrupted by a previous process before the
+    workers begin, and stop() hands running jobs back to the queue.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[None]] = run_session_job) -> None:
+        self.handler = handler
+        self._queue: Optional[JobQueue] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._active: Dict[str, str] = {}
+
+    @property
+    def queue(self) -> JobQueue:
+        path = job_queue_path()
+        if self._queue is None or self._queue.path != path:
+            self._queue = JobQueue(path)
+        return self._queue
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, workers: Optional[int] = None) -> None:
+        if self._tasks:
+            return
+        queue = self.queue
+        max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        for job in await asyncio.to_thread(queue.recover, max_attempts):
+            await fail_session(job["session_id"], "interrupted too many times")
+        self._wakeup = asyncio.Event()
+        count = workers if workers is not None else int(os.getenv("JOB_WORKERS", "2"))
+        for idx in range(max(1, count)):
+            self._tasks.add(asyncio.create_task(self._worker(queue), name=f"job-worker-{idx}"))
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def submit(self, session_id: str, payload: Dict[str, Any]) -> str:
+        job_id = await asyncio.to_thread(self.queue.enqueue, session_id, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _worker(self, queue: JobQueue) -> None:
+        assert self._wakeup is not None
+        poll_s = float(os.getenv("JOB_POLL_S", "1.0"))
+        while True:
+            self._wakeup.clear()
+            job = await asyncio.to_thread(queue.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id = job["job_id"]
+            self._active[job_id] = job["session_id"]
+            try:
+                await self.handler(job)
+            except asyncio.CancelledError:
+                # Off the loop, and shielded so a second cancel cannot skip it.
+                try:
+                    await asyncio.shield(asyncio.to_thread(queue.release, job_id))
+                except Exception:
+                    logger.exception("Failed to requeue job %s", job_id)
+                raise
+            except Exception as exc:
+                logger.exception("Job %s failed", job_id)
+                error = str(exc)[:500]
+                await asyncio.to_thread(queue.finish, job_id, FAILED, error)
+                await fail_session(job["session_id"], error)
+            else:
+                await asyncio.to_thread(queue.finish, job_id, DONE)
+            finally:
+                self._active.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "active": dict(self._active),
+            "counts": self.queue.counts(),
+            "max_queued": self.queue.max_queued,
+        }
+
+
+job_runner = JobRunner()
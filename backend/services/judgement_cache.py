@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def pair_key(premise: str, hypothesis: str, model: str = "") -> str:
+    """Order-sensitive hash of a normalised (premise, hypothesis) pair."""
+    raw = "\x1f".join((model, _normalize(premise), _normalize(hypothesis)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JudgementCache:
+    """LRU cache of pairwise NLI labels with an optional SQLite tier.
+
+    Only judgements marked ``persist`` (remote model output) go to disk; the
+    cheap heuristic fallback is kept in memory for ``ttl_s`` only, so it never
+    masks a real model judgement once the backend is back. The disk tier has
+    its own lock, so memory hits never wait on SQLite I/O.
+    """
+
+    def __init__(self, max_entries: int = 4096, path: Optional[Path] = None) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self._mem: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS judgements (key TEXT PRIMARY KEY, label TEXT NOT NULL)")
+        return self._db
+
+    def _remember(self, key: str, label: str, ttl_s: Optional[float] = None) -> None:
+        current = self._mem.get(key)
+        if ttl_s is not None and current is not None and current == (label, None):
+            return  # a short-lived copy never replaces the model's own judgement
+        self._mem[key] = (label, None if ttl_s is None else time.monotonic() + ttl_s)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _mem_get(self, key: str) -> Optional[str]:
+        entry = self._mem.get(key)
+        if entry is None:
+            return None
+        label, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._mem[key]
+            return None
+        self._mem.move_to_end(key)
+        self.hits += 1
+        return label
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        """Labels for the cached keys among ``keys``; may read the disk tier,
+        so async callers run it in a thread."""
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                label = self._mem_get(key)
+                if label is not None:
+                    found[key] = label
+                else:
+                    missing.append(key)
+        if missing and self.path is not None:
+            with self._db_lock:
+                db = self._conn()
+                assert db is not None
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = db.execute(
+                        f"SELECT key, label FROM judgements WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    found.update(rows)
+        with self._lock:
+            for key in missing:
+                if key in found:
+                    self._remember(key, found[key])
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put(self, key: str, label: str, persist: bool = True, ttl_s: Optional[float] = None) -> None:
+        self.put_many([(key, label)], persist=persist, ttl_s=ttl_s)
+
+    def put_many(
+        self, items: Sequence[Tuple[str, str]], persist: bool = True, ttl_s: Optional[float] = None
+    ) -> None:
+        """Store labels; ``ttl_s`` bounds how long they stay in memory. Only
+        ``persist`` items touch the disk tier."""
+        with self._lock:
+            for key, label in items:
+                self._remember(key, label, ttl_s)
+        if persist and items and self.path is not None:
+            with self._db_lock:
+                db = self._conn()
+                assert db is not None
+                db.executemany("INSERT OR REPLACE INTO judgements (key, label) VALUES (?, ?)", list(items))
+                db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+_cache_path = os.getenv("NLI_CACHE_PATH")
+judgement_cache = JudgementCache(
+    max_entries=int(os.getenv("NLI_CACHE_SIZE", "4096")),
+    path=Path(_cache_path) if _cache_path else None,
+)
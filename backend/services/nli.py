@@ -1,8 +1,14 @@
+import asyncio
 import os
-from typing import Literal
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
 
 import httpx
 
+from backend.services.backend_health import get_breaker
+from backend.services.http_pool import get_pool
+from backend.services.judgement_cache import judgement_cache, pair_key
+from backend.services.rate_limit import rate_limiter
+
 Label = Literal["entailment", "neutral", "contradiction"]
 
 _NEG_WORDS = {"not", "no", "never", "none", "nobody", "nothing", "n't"}
@@ -24,28 +30,22 @@ def _normalize(text: str) -> set[str]:
     return tokens
 
 
-def _hf_nli(a: str, b: str) -> Label:
+def _nli_model() -> str:
+    return os.getenv("HF_NLI_MODEL", "facebook/bart-large-mnli")
+
+
+def _hf_config() -> Tuple[str, Dict[str, str]]:
     api_key = os.getenv("HUGGINGFACE_API_KEY")
-    model = os.getenv("HF_NLI_MODEL", "facebook/bart-large-mnli")
+    model = _nli_model()
     if not api_key:
         raise RuntimeError("HUGGINGFACE_API_KEY not set for NLI")
-
     endpoint = os.getenv("HF_NLI_ENDPOINT", f"https://api-inference.huggingface.co/models/{model}")
-    headers = {"Authorization": f"Bearer {api_key}"}
-    payload = {"inputs": {"premise": a, "hypothesis": b}}
-    with httpx.Client(timeout=30.0) as client:
-        resp = client.post(endpoint, headers=headers, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-    # Response often is list of list of dicts with labels and scores
-    candidates = None
-    if isinstance(data, list) and data and isinstance(data[0], list):
-        candidates = data[0]
-    elif isinstance(data, list):
-        candidates = data
-    else:
-        raise RuntimeError(f"Unexpected NLI response: {data}")
+    return endpoint, {"Authorization": f"Bearer {api_key}"}
 
+
+def _label_from_candidates(candidates: Any) -> Label:
+    if not isinstance(candidates, list) or not candidates:
+        raise RuntimeError(f"Unexpected NLI response: {candidates}")
     best = max(candidates, key=lambda x: x.get("score", 0.0))
     label = best.get("label", "neutral").lower()
     score = float(best.get("score", 0.0))
@@ -59,20 +59,123 @@ def _hf_nli(a: str, b: str) -> Label:
     return "neutral"
 
 
+def _hf_nli(a: str, b: str) -> Label:
+    endpoint, headers = _hf_config()
+    payload = {"inputs": {"premise": a, "hypothesis": b}}
+    with rate_limiter.limit_sync("hf", _nli_model()):
+        resp = get_pool().sync_client(endpoint).post(endpoint, headers=headers, json=payload, timeout=30.0)
+    resp.raise_for_status()
+    data = resp.json()
+    # Response often is list of list of dicts with labels and scores
+    if isinstance(data, list) and data and isinstance(data[0], list):
+        return _label_from_candidates(data[0])
+    if isinstance(data, list):
+        return _label_from_candidates(data)
+    raise RuntimeError(f"Unexpected NLI response: {data}")
+
+
+async def _hf_nli_batch(client: httpx.AsyncClient, pairs: Sequence[Tuple[str, str]]) -> List[Label]:
+    endpoint, headers = _hf_config()
+    payload = {"inputs": [{"premise": a, "hypothesis": b} for a, b in pairs]}
+    async with rate_limiter.limit("hf", _nli_model()):
+        resp = await client.post(endpoint, headers=headers, json=payload, timeout=30.0)
+    resp.raise_for_status()
+    data = resp.json()
+    # One candidate list per input pair.
+    if not isinstance(data, list) or len(data) != len(pairs):
+        raise RuntimeError(f"Unexpected batched NLI response: {str(data)[:200]}")
+    return [_label_from_candidates(item) for item in data]
+
+
+def _heuristic_nli(a: str, b: str) -> Label:
+    ta = _normalize(a)
+    tb = _normalize(b)
+    if _NEG_WORDS & ta and not _NEG_WORDS & tb:
+        return "contradiction"
+    if _NEG_WORDS & tb and not _NEG_WORDS & ta:
+        return "contradiction"
+    for x, y in _ANTONYM_PAIRS:
+        if (x in ta and y in tb) or (y in ta and x in tb):
+            return "contradiction"
+    overlap = ta & tb
+    if overlap:
+        return "entailment"
+    return "neutral"
+
+
+def _cache_key(a: str, b: str) -> str:
+    return pair_key(a, b, _nli_model())
+
+
+def _fallback_ttl() -> float:
+    # Heuristic labels are only reused briefly, so a recovered backend is
+    # asked again instead of the fallback standing in for it.
+    return float(os.getenv("NLI_FALLBACK_TTL_S", "60"))
+
+
 def simple_nli(a: str, b: str) -> Label:
+    # The aggregator's NLI matrix and cross-evaluation judge the same pairs;
+    # the shared cache makes each pair cost one judgement.
+    key = _cache_key(a, b)
+    cached = judgement_cache.get(key)
+    if cached is not None:
+        return cached  # type: ignore[return-value]
     try:
-        return _hf_nli(a, b)
+        # The breaker turns an outage into one timeout instead of one per pair.
+        label = get_breaker("hf_nli").call(_hf_nli, a, b)
+        judgement_cache.put(key, label, persist=True)
     except Exception:
-        ta = _normalize(a)
-        tb = _normalize(b)
-        if _NEG_WORDS & ta and not _NEG_WORDS & tb:
-            return "contradiction"
-        if _NEG_WORDS & tb and not _NEG_WORDS & ta:
-            return "contradiction"
-        for x, y in _ANTONYM_PAIRS:
-            if (x in ta and y in tb) or (y in ta and x in tb):
-                return "contradiction"
-        overlap = ta & tb
-        if overlap:
-            return "entailment"
-        return "neutral"
+        label = _heuristic_nli(a, b)
+        judgement_cache.put(key, label, persist=False, ttl_s=_fallback_ttl())
+    return label
+
+
+def remember_judgements(pairs: Sequence[Tuple[str, str]], labels: Sequence[str]) -> None:
+    """Put labels judged elsewhere (e.g. by the parent of a worker process)
+    into this process's in-memory judgement cache. They may be heuristic
+    fallbacks, so they expire like them."""
+    items = [(_cache_key(a, b), label) for (a, b), label in zip(pairs, labels)]
+    judgement_cache.put_many(items, persist=False, ttl_s=_fallback_ttl())
+
+
+async def nli_batch(pairs: Sequence[Tuple[str, str]]) -> List[Label]:
+    """Judge many pairs with batched requests over the shared connection pool.
+
+    Cached and duplicate pairs are not sent. Misses go out in batches of
+    NLI_BATCH_SIZE with at most NLI_CONCURRENCY requests in flight; pairs of
+    a failed batch fall back to the heuristic. Results land in the shared
+    judgement cache, so a later simple_nli on the same pair is a hit.
+    """
+    keys = [_cache_key(a, b) for a, b in pairs]
+    # The lookup may hit the SQLite tier: keep it off the event loop.
+    labels: Dict[str, Label] = await asyncio.to_thread(judgement_cache.get_many, keys)  # type: ignore[assignment]
+    pending: Dict[str, Tuple[str, str]] = {}
+    for key, pair in zip(keys, pairs):
+        if key not in labels:
+            pending[key] = pair
+
+    if pending:
+        batch_size = max(1, int(os.getenv("NLI_BATCH_SIZE", "16")))
+        concurrency = max(1, int(os.getenv("NLI_CONCURRENCY", "4")))
+        semaphore = asyncio.Semaphore(concurrency)
+        items = list(pending.items())
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+        async def _run(client: Optional[httpx.AsyncClient], batch: List[Tuple[str, Tuple[str, str]]]) -> None:
+            try:
+                if client is None:
+                    raise RuntimeError("remote NLI unavailable")
+                async with semaphore:
+                    judged = await get_breaker("hf_nli").acall(_hf_nli_batch, client, [pair for _, pair in batch])
+                judged_items = [(key, label) for (key, _), label in zip(batch, judged)]
+                labels.update(judged_items)
+                await asyncio.to_thread(judgement_cache.put_many, judged_items, True)
+            except Exception:
+                fallback = [(key, _heuristic_nli(a, b)) for key, (a, b) in batch]
+                labels.update(fallback)
+                judgement_cache.put_many(fallback, persist=False, ttl_s=_fallback_ttl())
+
+        client = get_pool().async_client(_hf_config()[0]) if os.getenv("HUGGINGFACE_API_KEY") else None
+        await asyncio.gather(*(_run(client, batch) for batch in batches))
+
+    return [labels[key] for key in keys]
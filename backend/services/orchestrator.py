@@ -3,18 +3,29 @@ import hashlib
 import json
 import os
 import time
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
 
 import jsonschema
 
-from backend.llm.adapters.hf_adapter import HuggingFaceAdapter
-from backend.llm.adapters.mock_adapter import MockAdapter
-from backend.llm.adapters.ollama_adapter import OllamaAdapter
-from backend.prompt.registry import get_prompt
+from backend.llm.registry import model_registry
+from backend.prompt.registry import prompt_registry
+from backend.services.events import MODEL_CHUNK, MODEL_RESPONSE, event_bus
+from backend.services.response_cache import response_cache, response_cache_enabled, response_key
+from backend.services.retry import deadline_after
+from backend.services.stream_json import IncrementalJSONChecker
 
 ResponseItem = Dict[str, Any]
+# Receives (event type, data) for MODEL_CHUNK / MODEL_RESPONSE, like EventBus.publish.
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+MODEL_CALL_TIMEOUT_S = float(os.getenv("MODEL_CALL_TIMEOUT_S", "180"))
+_LATENCY_WINDOW = 50
+_HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "5"))
+# Recent successful latencies per model id, used to time hedged requests.
+_LATENCIES: Dict[str, Deque[float]] = {}
 
 
 _SCHEMA_PATH = Path(__file__).resolve().parents[1] / "schema" / "structured_response.json"
@@ -25,38 +36,113 @@ except Exception:
 
 
 def _build_client(model_id: str):
-    mid = model_id.lower()
-    if mid.startswith("mock"):
-        return MockAdapter()
-    if mid == "hf":
-        # Allow overriding HF model id via env; default bigscience/bloom-560m for cloud inference.
-        model_name = os.getenv("HF_MODEL_ID", "bigscience/bloom-560m")
-        return HuggingFaceAdapter(model_id=model_name)
-    if mid == "ollama":
-        model_name = os.getenv("OLLAMA_MODEL", "llama3.2")
-        return OllamaAdapter(model_id=model_name)
-    raise ValueError(f"Unsupported model id: {model_id}")
+    # Adapters are built once per configuration and reused across requests.
+    return model_registry.get(model_id)
 
 
 def _render_prompt(prompt_id: str, prompt_version: str, question: str) -> tuple[str, Optional[str]]:
-    template = get_prompt(prompt_id, prompt_version)
-    if not template:
+    compiled = prompt_registry.get(prompt_id, prompt_version)
+    if compiled is None or not compiled.template:
         return question, None
-    rendered = template.replace("<USER_QUESTION>", question)
-    rendered = rendered.replace("<CONTEXT_HISTORY>", "")
-    prompt_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
-    return rendered, prompt_hash
+    return compiled.render(USER_QUESTION=question, CONTEXT_HISTORY=""), compiled.sha256
+
+
+async def _generate_streamed(
+    client: Any,
+    model_id: str,
+    prompt: str,
+    structured: bool,
+    on_chunk: Optional[Callable[[str], None]],
+) -> tuple[str, Optional[str], Optional[float]]:
+    """Collect a streamed generation; returns (text, early parse error, time to first chunk).
+
+    For structured calls the output is syntax-checked as it arrives and the
+    stream is closed at the first character that cannot be valid JSON.
+    """
+    checker = IncrementalJSONChecker() if structured else None
+    parts: List[str] = []
+    first_chunk_s: Optional[float] = None
+    t0 = time.perf_counter()
+    stream = client.generate_stream(prompt)
+    try:
+        async for chunk in stream:
+            if first_chunk_s is None:
+                first_chunk_s = time.perf_counter() - t0
+            parts.append(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+            if checker is not None and not checker.feed(chunk):
+                return "".join(parts), checker.error, first_chunk_s
+    finally:
+        await stream.aclose()
+    return "".join(parts), None, first_chunk_s
+
+
+def _cacheable(generated: Dict[str, Any], structured: bool) -> bool:
+    """Aborted streams, adapter error payloads and (when structured) output
+    that is not a JSON object are never cached, so a retry reaches the model."""
+    if generated.get("stream_error"):
+        return False
+    try:
+        parsed = json.loads(generated["raw"])
+    except Exception:
+        return not structured
+    if not isinstance(parsed, dict):
+        return not structured
+    points = parsed.get("summary_points")
+    return not (isinstance(points, list) and any(isinstance(p, dict) and p.get("id") == "error" for p in points))
 
 
-async def _call_model(model_id: str, question: str, structured: bool, prompt_id: str, prompt_version: str) -> ResponseItem:
+async def _call_model(
+    model_id: str,
+    question: str,
+    structured: bool,
+    prompt_id: str,
+    prompt_version: str,
+    stream: bool = False,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    cache: bool = True,
+) -> ResponseItem:
     try:
         client = _build_client(model_id)
+        model_name = getattr(client, "model_id", model_id)
         prompt_used, prompt_hash = _render_prompt(prompt_id, prompt_version, question)
         request_id = hashlib.sha256(f"{model_id}:{prompt_id}:{prompt_version}:{time.time_ns()}".encode()).hexdigest()[:16]
-        t0 = time.perf_counter()
-        raw = await client.generate(prompt_used)
-        latency = time.perf_counter() - t0
-        model_name = getattr(client, "model_id", model_id)
+
+        async def _generate() -> Dict[str, Any]:
+            stream_error: Optional[str] = None
+            first_chunk_s: Optional[float] = None
+            async with model_registry.slot(model_id):
+                t0 = time.perf_counter()
+                if stream:
+                    raw, stream_error, first_chunk_s = await _generate_streamed(
+                        client, model_id, prompt_used, structured, on_chunk
+                    )
+                else:
+                    raw = await client.generate(prompt_used)
+                latency = time.perf_counter() - t0
+            return {"raw": raw, "stream_error": stream_error, "first_chunk_s": first_chunk_s, "latency_s": latency}
+
+        cache_source: Optional[str] = None
+        if cache and response_cache_enabled():
+            t0 = time.perf_counter()
+            key = response_key(str(model_name), prompt_hash, prompt_used, {"structured": structured})
+            generated, cache_source = await response_cache.get_or_call(
+                key, _generate, lambda value: _cacheable(value, structured)
+            )
+            if cache_source != "miss":
+                # Served without calling the model here: report the wait, and
+                # give streaming consumers the whole output as one chunk.
+                waited = time.perf_counter() - t0
+                generated = {**generated, "latency_s": waited, "first_chunk_s": waited}
+                if stream and on_chunk is not None and generated["raw"]:
+                    on_chunk(generated["raw"])
+        else:
+            generated = await _generate()
+        raw = generated["raw"]
+        stream_error = generated["stream_error"]
+        first_chunk_s = generated["first_chunk_s"]
+        latency = generated["latency_s"]
         meta = {
             "model_id": model_id,
             "backend": model_id.lower(),
@@ -70,6 +156,16 @@ async def _call_model(model_id: str, question: str, structured: bool, prompt_id:
         meta["prompt_used"] = prompt_used
         meta["request_id"] = request_id
         meta["latency_s"] = round(latency, 4)
+        if cache_source is not None:
+            meta["cache"] = cache_source
+        if stream:
+            meta["streamed"] = True
+            if first_chunk_s is not None:
+                meta["first_chunk_s"] = round(first_chunk_s, 4)
+        if stream_error:
+            meta["stream_aborted"] = True
+            meta["usage_tokens_estimate"] = len(str(raw).split())
+            return {"model_id": model_id, "raw": raw, "parse_error": f"Aborted stream: {stream_error}", "meta": meta}
         if not structured:
             meta["usage_tokens_estimate"] = len(str(raw).split())
             return {"model_id": model_id, "raw": raw, "meta": meta}
@@ -89,24 +185,101 @@ async def _call_model(model_id: str, question: str, structured: bool, prompt_id:
         return {"model_id": model_id, "error": str(exc)}
 
 
+def _record_latency(model_id: str, latency_s: float) -> None:
+    _LATENCIES.setdefault(model_id, deque(maxlen=_LATENCY_WINDOW)).append(latency_s)
+
+
+def _hedge_delay(model_id: str) -> Optional[float]:
+    """p95 of the model's recent latencies, or None until enough samples exist."""
+    samples = sorted(_LATENCIES.get(model_id, ()))
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+def _is_usable(item: ResponseItem, structured: bool) -> bool:
+    if item.get("error"):
+        return False
+    return bool(item.get("parsed")) if structured else True
+
+
+def _cancelled_item(model_id: str, reason: str) -> ResponseItem:
+    return {
+        "model_id": model_id,
+        "error": f"Model call cancelled: {reason}",
+        "meta": {
+            "model_id": model_id,
+            "cancelled": True,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+    }
+
+
 async def multi_model_query(
     question: str,
     model_ids: List[str],
     structured: bool = False,
     prompt_id: str = "answerer_v1",
     prompt_version: str = "v1",
+    quorum: Optional[int] = None,
+    deadline_s: Optional[float] = None,
+    hedge: bool = False,
+    session_id: Optional[str] = None,
+    round_idx: Optional[int] = None,
+    stream: bool = False,
+    on_event: Optional[EventCallback] = None,
+    cache: bool = True,
 ) -> Dict[str, Any]:
-    # 为每个模型调用添加超时保护（90秒），避免慢速模型阻塞整个请求
-    async def _call_with_timeout(model_id: str) -> ResponseItem:
+    """Fan the question out to every model.
+
+    Execution policies (combinable):
+    - quorum: return once this many usable (parsed, when structured)
+      responses arrived and cancel the remaining calls;
+    - deadline_s: return whatever finished within the round deadline;
+    - hedge: if a model is slower than its recent p95 latency, send a
+      duplicate request and keep whichever answers first.
+    Cancelled models appear in ``responses`` with ``meta.cancelled``.
+
+    With stream=True models are called through ``generate_stream``: partial
+    output is reported as MODEL_CHUNK events and structured calls are aborted
+    as soon as the output can no longer parse as JSON.
+    With a session_id, each response (and chunk) is published on the event bus
+    as it arrives; ``on_event`` receives the same events.
+    With LLM_RESPONSE_CACHE enabled, identical (model, prompt) calls are served
+    from the response cache unless cache=False; ``meta.cache`` tells which.
+    """
+    def _emit(event_type: str, data: Dict[str, Any]) -> None:
+        event_bus.publish(session_id, event_type, data, persist=event_type != MODEL_CHUNK)
+        if on_event is not None:
+            on_event(event_type, data)
+
+    def _chunk_sink(model_id: str) -> Optional[Callable[[str], None]]:
+        if not stream or (session_id is None and on_event is None):
+            return None
+        return lambda delta: _emit(MODEL_CHUNK, {"round": round_idx, "model_id": model_id, "delta": delta})
+
+    # 为每个模型调用添加超时保护，避免慢速模型阻塞整个请求
+    async def _call_with_timeout(model_id: str, use_cache: bool = cache) -> ResponseItem:
         try:
-            return await asyncio.wait_for(
-                _call_model(model_id.strip(), question, structured, prompt_id, prompt_version),
-                timeout=180.0
-            )
+            # The deadline bounds the adapter's HTTP retries to the time left.
+            with deadline_after(MODEL_CALL_TIMEOUT_S):
+                item = await asyncio.wait_for(
+                    _call_model(
+                        model_id, question, structured, prompt_id, prompt_version,
+                        stream=stream, on_chunk=_chunk_sink(model_id), cache=use_cache,
+                    ),
+                    timeout=MODEL_CALL_TIMEOUT_S,
+                )
+            meta = item.get("meta") or {}
+            latency = meta.get("latency_s")
+            # Cache hits and coalesced waits say nothing about the model's speed.
+            if latency is not None and not item.get("error") and meta.get("cache", "miss") == "miss":
+                _record_latency(model_id, float(latency))
+            return item
         except asyncio.TimeoutError:
             return {
                 "model_id": model_id,
-                "error": f"Model call timed out after 90 seconds",
+                "error": f"Model call timed out after {MODEL_CALL_TIMEOUT_S:g} seconds",
                 "meta": {
                     "model_id": model_id,
                     "timeout": True,
@@ -122,29 +295,127 @@ async def multi_model_query(
                     "timestamp": datetime.now(timezone.utc).isoformat(),
                 }
             }
-    
-    tasks = [
-        _call_with_timeout(mid)
-        for mid in model_ids
-        if mid.strip()
-    ]
-    # 使用 return_exceptions=True，这样即使某个模型失败，其他模型的结果也能返回
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # 将异常转换为错误响应
-    processed_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            model_id = model_ids[i] if i < len(model_ids) else "unknown"
-            processed_results.append({
-                "model_id": model_id,
-                "error": f"Unexpected error: {str(result)}",
-                "meta": {
-                    "model_id": model_id,
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                }
-            })
-        else:
-            processed_results.append(result)
-    
-    return {"question": question, "responses": processed_results, "prompt_id": prompt_id, "prompt_version": prompt_version}
+
+    async def _call_hedged(model_id: str) -> ResponseItem:
+        primary = asyncio.ensure_future(_call_with_timeout(model_id))
+        pending = {primary}
+        result: Optional[ResponseItem] = None
+        try:
+            delay = _hedge_delay(model_id)
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            # The backup must reach the model, not join the primary's in-flight call.
+            backup = asyncio.ensure_future(_call_with_timeout(model_id, use_cache=False))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    candidate = task.result()
+                    # Prefer a successful answer; fall back to the last error.
+                    if result is None or (result.get("error") and not candidate.get("error")):
+                        result = candidate
+                if result is not None and not result.get("error"):
+                    break
+        finally:
+            # Also reached when the caller is cancelled: no call outlives it.
+            for task in pending:
+                task.cancel()
+        assert result is not None
+        result.setdefault("meta", {})["hedged"] = True
+        return result
+
+    runner = _call_hedged if hedge else _call_with_timeout
+    ids = [mid.strip() for mid in model_ids if mid.strip()]
+    # Calls started here inherit the round deadline (see retry.deadline_after).
+    with deadline_after(deadline_s):
+        tasks = {asyncio.ensure_future(runner(mid)): idx for idx, mid in enumerate(ids)}
+    results: List[Optional[ResponseItem]] = [None] * len(ids)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_s if deadline_s else None
+    pending = set(tasks)
+    usable = 0
+    stop_reason = None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                stop_reason = f"round deadline of {deadline_s:g}s exceeded"
+                break
+            for task in done:
+                idx = tasks[task]
+                try:
+                    results[idx] = task.result()
+                except Exception as exc:
+                    # 将异常转换为错误响应，其他模型的结果照常返回
+                    results[idx] = {
+                        "model_id": ids[idx],
+                        "error": f"Unexpected error: {str(exc)}",
+                        "meta": {
+                            "model_id": ids[idx],
+                            "timestamp": datetime.now(timezone.utc).isoformat(),
+                        }
+                    }
+                _emit(MODEL_RESPONSE, {"round": round_idx, "response": results[idx]})
+                if _is_usable(results[idx], structured):
+                    usable += 1
+            if quorum and usable >= quorum and pending:
+                stop_reason = f"quorum of {quorum} reached"
+                break
+    finally:
+        # Cancel whatever is still running, including when the caller itself
+        # is cancelled (request timeout, closed stream), so no call is orphaned.
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    for task in pending:
+        results[tasks[task]] = _cancelled_item(ids[tasks[task]], stop_reason or "stopped")
+
+    return {
+        "question": question,
+        "responses": results,
+        "prompt_id": prompt_id,
+        "prompt_version": prompt_version,
+        "execution": {
+            "quorum": quorum,
+            "deadline_s": deadline_s,
+            "hedge": hedge,
+            "stream": stream,
+            "cache": cache and response_cache_enabled(),
+            "cancelled": len(pending),
+            "stop_reason": stop_reason,
+        },
+    }
+
+
+async def iter_multi_model_query(question: str, model_ids: List[str], **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming form of multi_model_query.
+
+    Yields ``{"type": "model_chunk", ...}`` partial outputs and
+    ``{"type": "model_response", ...}`` per model as they arrive, then
+    ``{"type": "result", "result": <multi_model_query result>}``.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(multi_model_query(
+        question,
+        model_ids,
+        stream=True,
+        on_event=lambda event_type, data: queue.put_nowait({"type": event_type, **data}),
+        **kwargs,
+    ))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        yield {"type": "result", "result": task.result()}
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+# In-flight caps when neither RATE_LIMIT_<KEY>_MAX_IN_FLIGHT nor the older
+# MODEL_CONCURRENCY_<KEY> is set; 0 means unbounded.
+_DEFAULT_MAX_IN_FLIGHT = {"mock": 64, "hf": 4, "ollama": 2}
+
+
+def _env_key(key: str) -> str:
+    return re.sub(r"[^A-Z0-9]+", "_", key.upper()).strip("_")
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``burst``. reserve() books the next
+    token and returns how long the caller has to wait for it; the balance may
+    go negative so later callers queue up behind earlier ones."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self) -> None:
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Limiter:
+    """Token bucket plus a max-in-flight cap for one backend or model.
+
+    Coroutines and worker threads share the same counters: async waiters park
+    on a future of their own loop, sync waiters on a condition, and every
+    release wakes one of each to race for the freed slot.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: float = 1.0, max_in_flight: int = 0) -> None:
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def _try_enter(self) -> bool:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return False
+        self.in_flight += 1
+        return True
+
+    def _wake_one(self) -> None:
+        while self._waiters:
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+                break
+            except RuntimeError:  # loop already closed
+                continue
+        self._cond.notify()
+
+    def _admitted(self, waited: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_wait_s += waited
+            self.max_wait_s = max(self.max_wait_s, waited)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_one()
+
+    async def acquire(self) -> None:
+        t0 = time.monotonic()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    if self._try_enter():
+                        break
+                    future: "asyncio.Future[None]" = loop.create_future()
+                    self._waiters.append((loop, future))
+                try:
+                    await future
+                except asyncio.CancelledError:
+                    with self._lock:
+                        try:
+                            self._waiters.remove((loop, future))
+                        except ValueError:
+                            # Already woken: hand the wake-up to the next waiter.
+                            self._wake_one()
+                    raise
+            delay = self.bucket.reserve() if self.bucket else 0.0
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self.bucket.refund()  # type: ignore[union-attr]
+                    self.release()
+                    raise
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        self._admitted(time.monotonic() - t0)
+
+    def acquire_sync(self) -> None:
+        t0 = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while not self._try_enter():
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+        delay = self.bucket.reserve() if self.bucket else 0.0
+        if delay > 0:
+            time.sleep(delay)
+        self._admitted(time.monotonic() - t0)
+
+    async def throttle(self) -> None:
+        """Wait for a token only, for extra requests (retries) made while the
+        caller already holds an in-flight slot."""
+        delay = self.bucket.reserve() if self.bucket else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate_per_s": self.bucket.rate if self.bucket else None,
+                "burst": self.bucket.burst if self.bucket else None,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "calls": self.calls,
+                "avg_wait_s": round(self.total_wait_s / self.calls, 4) if self.calls else 0.0,
+                "max_wait_s": round(self.max_wait_s, 4),
+            }
+
+
+class RateLimiter:
+    """Limiters per backend ("hf") and per backend model ("hf:<model name>").
+
+    Each key reads RATE_LIMIT_<KEY>_RPS, _BURST and _MAX_IN_FLIGHT, with the
+    key upper-cased and non-alphanumerics turned into "_" (for example
+    RATE_LIMIT_HF_FACEBOOK_BART_LARGE_MNLI_RPS). Backend limiters always
+    exist so their queue depth and wait times are visible; a model gets one
+    only when something is configured for it. Limits are per process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, Optional[Limiter]] = {}
+
+    def _build(self, key: str) -> Optional[Limiter]:
+        env = _env_key(key)
+        rate = float(os.getenv(f"RATE_LIMIT_{env}_RPS", "0"))
+        burst = float(os.getenv(f"RATE_LIMIT_{env}_BURST", "0")) or max(1.0, rate)
+        cap = os.getenv(f"RATE_LIMIT_{env}_MAX_IN_FLIGHT") or os.getenv(f"MODEL_CONCURRENCY_{env}")
+        max_in_flight = int(cap) if cap else _DEFAULT_MAX_IN_FLIGHT.get(key, 0)
+        if ":" in key and rate <= 0 and max_in_flight <= 0:
+            return None
+        return Limiter(key, rate, burst, max(0, max_in_flight))
+
+    def get(self, key: str) -> Optional[Limiter]:
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = self._build(key)
+            return self._limiters[key]
+
+    def _chain(self, backend: str, model: Optional[str]) -> List[Limiter]:
+        # Narrowest first: a call waiting for its model never holds a backend slot.
+        keys = ([f"{backend}:{model}"] if model else []) + [backend]
+        return [limiter for limiter in (self.get(key) for key in keys) if limiter is not None]
+
+    @asynccontextmanager
+    async def limit(self, backend: str, model: Optional[str] = None) -> AsyncIterator[None]:
+        acquired: List[Limiter] = []
+        try:
+            for limiter in self._chain(backend, model):
+                await limiter.acquire()
+                acquired.append(limiter)
+            yield
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    @contextmanager
+    def limit_sync(self, backend: str, model: Optional[str] = None) -> Iterator[None]:
+        acquired: List[Limiter] = []
+        try:
+            for limiter in self._chain(backend, model):
+                limiter.acquire_sync()
+                acquired.append(limiter)
+            yield
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    async def throttle(self, backend: str, model: Optional[str] = None) -> None:
+        for limiter in self._chain(backend, model):
+            await limiter.throttle()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = [limiter for limiter in self._limiters.values() if limiter is not None]
+        return {limiter.name: limiter.snapshot() for limiter in limiters}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+
+rate_limiter = RateLimiter()
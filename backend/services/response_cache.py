@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+CachedValue = Dict[str, Any]
+
+
+def response_cache_enabled() -> bool:
+    """The response cache is opt-in (LLM_RESPONSE_CACHE=1)."""
+    return os.getenv("LLM_RESPONSE_CACHE", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def response_key(model_name: str, prompt_hash: Optional[str], prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Hash of (concrete model name, template hash, rendered prompt, generation parameters)."""
+    raw = "\x1f".join((
+        model_name,
+        prompt_hash or "",
+        hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        json.dumps(params or {}, sort_keys=True),
+    ))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Task[CachedValue]") -> None:
+        self.task = task
+        self.loop = task.get_loop()
+        self.waiters = 0
+
+
+class ResponseCache:
+    """TTL + LRU cache of model outputs with an optional SQLite tier.
+
+    Concurrent misses on the same key share one backend call: the first
+    caller starts it and later callers await the same task. The call is
+    cancelled only once every caller waiting on it has gone away.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 600.0, path: Optional[Path] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.path = path
+        self._mem: "OrderedDict[str, Tuple[float, CachedValue]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The disk tier has its own lock, so memory hits never wait on SQLite.
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._inflight: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def _remember(self, key: str, expires_at: float, value: CachedValue) -> None:
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _mem_lookup(self, key: str) -> Optional[CachedValue]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is None:
+                return None
+            if entry[0] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._mem[key]
+            return None
+
+    def _disk_lookup(self, key: str) -> Optional[CachedValue]:
+        if self.path is None:
+            return None
+        now = time.time()
+        with self._db_lock:
+            db = self._conn()
+            assert db is not None
+            row = db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] <= now:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                row = None
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, row[1], value)
+            self.disk_hits += 1
+        return value
+
+    def _disk_put(self, key: str, value: CachedValue, expires_at: float) -> None:
+        if self.path is None:
+            return
+        with self._db_lock:
+            db = self._conn()
+            assert db is not None
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            db.commit()
+
+    def get(self, key: str) -> Optional[CachedValue]:
+        value = self._mem_lookup(key)
+        return value if value is not None else self._disk_lookup(key)
+
+    def put(self, key: str, value: CachedValue) -> None:
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._remember(key, expires_at, value)
+        self._disk_put(key, value, expires_at)
+
+    async def _fill(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[CachedValue]],
+        cacheable: Callable[[CachedValue], bool],
+    ) -> CachedValue:
+        value = await call()
+        if cacheable(value):
+            expires_at = time.time() + self.ttl_s
+            with self._lock:
+                self._remember(key, expires_at, value)
+            if self.path is not None:
+                await asyncio.to_thread(self._disk_put, key, value, expires_at)
+        return value
+
+    async def get_or_call(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[CachedValue]],
+        cacheable: Callable[[CachedValue], bool] = lambda value: True,
+    ) -> Tuple[CachedValue, str]:
+        """Return (value, source) where source is hit | disk | coalesced | miss.
+        Only values accepted by ``cacheable`` are stored."""
+        value = self._mem_lookup(key)
+        if value is not None:
+            return value, "hit"
+        if self.path is not None:
+            # The SQLite tier is read in a thread, never on the event loop.
+            value = await asyncio.to_thread(self._disk_lookup, key)
+            if value is not None:
+                return value, "disk"
+        loop = asyncio.get_running_loop()
+        flight = self._inflight.get(key)
+        if flight is None or flight.loop is not loop or flight.task.done():
+            flight = _Flight(loop.create_task(self._fill(key, call, cacheable)))
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._land(k, f))
+            self._inflight[key] = flight
+            source = "miss"
+            self.misses += 1
+        else:
+            source = "coalesced"
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), source
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._land(key, flight)
+                flight.task.cancel()
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        with self._db_lock:
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "in_flight": len(self._inflight),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+            }
+
+
+_cache_path = os.getenv("LLM_RESPONSE_CACHE_PATH")
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "512")),
+    ttl_s=float(os.getenv("LLM_RESPONSE_CACHE_TTL_S", "600")),
+    path=Path(_cache_path) if _cache_path else None,
+)
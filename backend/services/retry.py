@@ -0,0 +1,125 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional
+
+# Absolute time.monotonic() by which the current request must be done; set by
+# the caller (e.g. the orchestrator's per-model timeout) and read by retries.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_after(seconds: Optional[float]) -> Iterator[None]:
+    """Give code run in this context (and tasks created from it) ``seconds``
+    to finish; an enclosing, earlier deadline still wins."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or an HTTP date); None if absent or invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """Next backoff: uniform in [base, 3 * previous], capped, so concurrent
+    clients that failed together do not retry together."""
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+class RetryBudget:
+    """Token budget that keeps retries to a fraction of a backend's traffic.
+
+    Every request deposits ``ratio`` tokens and every retry spends one, so in
+    steady state retries stay under ``ratio`` of requests (RETRY_BUDGET_RATIO,
+    default 10%). The balance starts at, and is capped by, a small reserve so
+    a quiet backend can still retry a few times but a storm cannot bank up.
+    """
+
+    def __init__(self, ratio: float = 0.1, reserve: float = 5.0, cap: float = 20.0) -> None:
+        self.ratio = ratio
+        self.cap = max(reserve, cap)
+        self.balance = reserve
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.balance = min(self.cap, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.balance < 1.0:
+                self.denied += 1
+                return False
+            self.balance -= 1.0
+            self.retries += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ratio": self.ratio,
+                "balance": round(self.balance, 3),
+                "requests": self.requests,
+                "retries": self.retries,
+                "denied": self.denied,
+            }
+
+
+_budgets_lock = threading.Lock()
+_budgets: Dict[str, RetryBudget] = {}
+
+
+def get_retry_budget(backend: str) -> RetryBudget:
+    with _budgets_lock:
+        budget = _budgets.get(backend)
+        if budget is None:
+            budget = _budgets[backend] = RetryBudget(
+                ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.1")),
+                reserve=float(os.getenv("RETRY_BUDGET_RESERVE", "5")),
+                cap=float(os.getenv("RETRY_BUDGET_CAP", "20")),
+            )
+        return budget
+
+
+def retry_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _budgets_lock:
+        budgets = dict(_budgets)
+    return {name: budget.snapshot() for name, budget in budgets.items()}
+
+
+def reset_retry_budgets() -> None:
+    with _budgets_lock:
+        _budgets.clear()
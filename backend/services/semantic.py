@@ -1,11 +1,15 @@
-import math
-from typing import Any, Dict, List, Sequence
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
 
 from backend.services.embeddings import embed_texts
 
 Point = Dict[str, Any]
 Vector = List[float]
 
+CLUSTER_METHOD = os.getenv("CLUSTER_METHOD", "average")
+
 
 def extract_points(structured_responses: Sequence[Dict[str, Any]]) -> List[Point]:
     points: List[Point] = []
@@ -70,27 +74,81 @@ def embed_points(points: Sequence[Point], dim: int = 16) -> List[Vector]:
         return [_vectorize(text, dim=dim) for text in texts]
 
 
-def _cosine(a: Vector, b: Vector) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
-    if na == 0 or nb == 0:
-        return 0.0
-    return dot / (na * nb)
-
-
-def cluster_points(points: Sequence[Point], embeddings: Sequence[Vector], threshold: float = 0.82) -> List[List[str]]:
-    id_to_vec = {p["id"]: v for p, v in zip(points, embeddings)}
-    clusters: List[List[str]] = []
-    for p in points:
-        assigned = False
-        for cluster in clusters:
-            rep_id = cluster[0]
-            sim = _cosine(id_to_vec[p["id"]], id_to_vec[rep_id])
-            if sim >= threshold:
-                cluster.append(p["id"])
-                assigned = True
-                break
-        if not assigned:
-            clusters.append([p["id"]])
-    return clusters
+def _similarity_matrix(embeddings: Sequence[Vector]) -> np.ndarray:
+    # Normalise once, then a single matmul gives every pairwise cosine.
+    dim = max((len(v) for v in embeddings), default=0)
+    mat = np.zeros((len(embeddings), dim), dtype=np.float64)
+    for i, vec in enumerate(embeddings):
+        mat[i, : len(vec)] = vec
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    mat /= norms
+    return mat @ mat.T
+
+
+def _connected_components(sim: np.ndarray, threshold: float) -> np.ndarray:
+    """Label each point with the smallest index reachable over edges with sim >= threshold."""
+    n = sim.shape[0]
+    adjacency = sim >= threshold
+    np.fill_diagonal(adjacency, True)
+    labels = np.arange(n)
+    while True:
+        updated = np.where(adjacency, labels[None, :], n).min(axis=1)
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _average_linkage(sim: np.ndarray, threshold: float) -> np.ndarray:
+    """Agglomerative clustering: merge the most similar pair of clusters (mean
+    pairwise cosine) until no pair reaches the threshold."""
+    n = sim.shape[0]
+    linkage = sim.astype(np.float64, copy=True)
+    np.fill_diagonal(linkage, -np.inf)
+    sizes = np.ones(n)
+    labels = np.arange(n)
+    for _ in range(n - 1):
+        flat = int(np.argmax(linkage))
+        i, j = divmod(flat, n)
+        if linkage[i, j] < threshold:
+            break
+        i, j = min(i, j), max(i, j)
+        # Lance-Williams update for average linkage; j is folded into i.
+        merged = (sizes[i] * linkage[i] + sizes[j] * linkage[j]) / (sizes[i] + sizes[j])
+        linkage[i, :] = merged
+        linkage[:, i] = merged
+        linkage[i, i] = -np.inf
+        linkage[j, :] = -np.inf
+        linkage[:, j] = -np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+    return labels
+
+
+def cluster_points(
+    points: Sequence[Point],
+    embeddings: Sequence[Vector],
+    threshold: float = 0.82,
+    method: Optional[str] = None,
+) -> List[List[str]]:
+    """Group point ids whose embeddings are similar.
+
+    method "average" (default, CLUSTER_METHOD env) is average-linkage
+    agglomerative clustering; "components" joins every pair above the
+    threshold transitively. Clusters are ordered by their first point and
+    are independent of which point happens to come first.
+    """
+    if not points:
+        return []
+    method = (method or CLUSTER_METHOD).lower()
+    sim = _similarity_matrix(embeddings)
+    if method == "average":
+        labels = _average_linkage(sim, threshold)
+    elif method == "components":
+        labels = _connected_components(sim, threshold)
+    else:
+        raise ValueError(f"Unsupported clustering method: {method}")
+    clusters: Dict[int, List[str]] = {}
+    for idx, label in enumerate(labels):
+        clusters.setdefault(int(label), []).append(points[idx]["id"])
+    return list(clusters.values())
@@ -0,0 +1,150 @@
+from typing import List, Optional
+
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789+-.eE"
+_LITERALS = {"t": "true", "f": "false", "n": "null"}
+_ESCAPES = '"\\/bfnrtu'
+
+
+class IncrementalJSONChecker:
+    """Syntax check of a JSON document fed in chunks.
+
+    It builds nothing; it only tracks the container stack so that output which
+    can no longer become valid JSON (prose before the object, a markdown fence,
+    a broken token) is reported at the first offending character instead of
+    after the whole generation. A clean run still needs ``json.loads`` plus
+    schema validation on the full text.
+    """
+
+    def __init__(self, require_object: bool = True) -> None:
+        self.require_object = require_object
+        self.error: Optional[str] = None
+        self.position = 0
+        self._stack: List[str] = []
+        self._expect = "value"
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._unicode_left = 0
+        self._literal = ""
+        self._in_number = False
+        self._started = False
+
+    @property
+    def complete(self) -> bool:
+        """True once a full top-level value has been read."""
+        return self.error is None and self._expect == "end" and not self._in_number
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; returns False once the text is known to be invalid."""
+        if self.error is not None:
+            return False
+        for ch in chunk:
+            if not self._step(ch):
+                return False
+            self.position += 1
+        return True
+
+    def _fail(self, message: str) -> bool:
+        self.error = f"{message} at offset {self.position}"
+        return False
+
+    def _after_value(self) -> None:
+        self._expect = "comma_or_close" if self._stack else "end"
+
+    def _step(self, ch: str) -> bool:
+        if self._in_string:
+            return self._string_char(ch)
+        if self._literal:
+            if ch != self._literal[0]:
+                return self._fail(f"invalid literal character {ch!r}")
+            self._literal = self._literal[1:]
+            if not self._literal:
+                self._after_value()
+            return True
+        if self._in_number:
+            if ch in _NUMBER_CHARS:
+                return True
+            self._in_number = False
+            self._after_value()
+        if ch in _WHITESPACE:
+            return True
+
+        expect = self._expect
+        if expect == "end":
+            return self._fail(f"unexpected {ch!r} after the top-level value")
+        if expect in ("value", "value_or_close"):
+            if ch == "]" and expect == "value_or_close":
+                self._stack.pop()
+                self._after_value()
+                return True
+            if not self._started:
+                self._started = True
+                if self.require_object and ch != "{":
+                    return self._fail(f"expected '{{' but got {ch!r}")
+            if ch == "{":
+                self._stack.append("{")
+                self._expect = "key_or_close"
+            elif ch == "[":
+                self._stack.append("[")
+                self._expect = "value_or_close"
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = False
+            elif ch == "-" or ch.isdigit():
+                self._in_number = True
+            elif ch in _LITERALS:
+                self._literal = _LITERALS[ch][1:]
+            else:
+                return self._fail(f"unexpected {ch!r} where a value was expected")
+            return True
+        if expect in ("key", "key_or_close"):
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = True
+                return True
+            if ch == "}" and expect == "key_or_close":
+                self._stack.pop()
+                self._after_value()
+                return True
+            return self._fail(f"unexpected {ch!r} where an object key was expected")
+        if expect == "colon":
+            if ch != ":":
+                return self._fail(f"expected ':' but got {ch!r}")
+            self._expect = "value"
+            return True
+        # comma_or_close
+        top = self._stack[-1]
+        if ch == ",":
+            self._expect = "key" if top == "{" else "value"
+            return True
+        if (ch == "}" and top == "{") or (ch == "]" and top == "["):
+            self._stack.pop()
+            self._after_value()
+            return True
+        return self._fail(f"unexpected {ch!r} after a value")
+
+    def _string_char(self, ch: str) -> bool:
+        if self._unicode_left:
+            if ch not in "0123456789abcdefABCDEF":
+                return self._fail("invalid \\u escape")
+            self._unicode_left -= 1
+            return True
+        if self._escape:
+            if ch not in _ESCAPES:
+                return self._fail(f"invalid escape \\{ch}")
+            self._escape = False
+            if ch == "u":
+                self._unicode_left = 4
+            return True
+        if ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._expect = "colon"
+            else:
+                self._after_value()
+        elif ord(ch) < 0x20:
+            return self._fail("control character in string")
+        return True
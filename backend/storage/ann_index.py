@@ -0,0 +1,273 @@
+"""Candidate-selection backends for vector_store.search_similar.
+
+A backend narrows each segment to the rows worth scoring; vector_store then
+scores those rows exactly. ``exact`` keeps every row, ``ivf`` is an inverted
+file index over spherical k-means centroids with an ``nprobe`` knob.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Segment = Tuple[str, Dict, np.ndarray]
+
+_ASSIGN_CHUNK_ROWS = 65536
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    def candidates(self, segments: Sequence[Segment], qvec: np.ndarray, nprobe: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """Return per-segment row indices to score (None means every row)."""
+        raise NotImplementedError
+
+    def on_publish(self, name: str, matrix: np.ndarray) -> None:
+        """Called after add_documents publishes a segment."""
+
+    def on_compact(self, merged_name: str, sources: Sequence[str]) -> None:
+        """Called after compaction replaces ``sources`` with ``merged_name``."""
+
+    def maybe_train(self, segments: Sequence[Segment], background: bool = True) -> None:
+        """Called with the live segments after compaction."""
+
+
+class ExactSearch(SearchBackend):
+    def candidates(self, segments: Sequence[Segment], qvec: np.ndarray, nprobe: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        return [None] * len(segments)
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], _ASSIGN_CHUNK_ROWS):
+        block = np.asarray(matrix[start:start + _ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iters: int = 15, seed: int = 0) -> np.ndarray:
+    """k-means on L2-normalised rows using cosine similarity; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, data.shape[0]))
+    centroids = data[rng.choice(data.shape[0], size=k, replace=False)].astype(np.float32)
+    for _ in range(iters):
+        assign = _assign(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists from random rows so every list stays usable.
+            sums[empty] = data[rng.choice(data.shape[0], size=int(empty.sum()))]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+class IVFIndex(SearchBackend):
+    """Inverted file index persisted next to the segments.
+
+    Centroids are trained per embedding width once enough rows exist and are
+    stored with a version id; each segment's row -> list assignments are
+    stored under that version, computed on publish (incremental insertion)
+    or lazily for segments that predate training.
+
+    Training never runs on the query path: a search that finds the centroids
+    missing or stale starts one background training per width (single
+    flight) and keeps using the current centroids, or exact search for a
+    width that has none yet. Compaction trains synchronously, since it
+    already runs in the background.
+    """
+
+    def __init__(self, index_dir: Path, nlist: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+        self.index_dir = index_dir
+        self.nlist = nlist if nlist is not None else int(os.getenv("IVF_NLIST", "0"))
+        self.nprobe = nprobe if nprobe is not None else int(os.getenv("IVF_NPROBE", "8"))
+        self.min_train_rows = int(os.getenv("IVF_MIN_TRAIN_ROWS", "256"))
+        self.retrain_factor = float(os.getenv("IVF_RETRAIN_FACTOR", "4"))
+        self.train_sample = int(os.getenv("IVF_TRAIN_SAMPLE", "20000"))
+        self._centroids: Dict[int, Tuple[int, Dict, np.ndarray]] = {}
+        self._assignments: Dict[Tuple[str, str], np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._training: Dict[int, threading.Thread] = {}
+
+    # -- persistence -------------------------------------------------------
+
+    def _info_path(self, dim: int) -> Path:
+        return self.index_dir / f"centroids-{dim}.json"
+
+    def _load_centroids(self, dim: int) -> Optional[Tuple[Dict, np.ndarray]]:
+        info_path = self._info_path(dim)
+        if not info_path.exists():
+            return None
+        mtime = info_path.stat().st_mtime_ns
+        cached = self._centroids.get(dim)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+        info = json.loads(info_path.read_text(encoding="utf-8"))
+        centroids = np.load(self.index_dir / info["file"])
+        self._centroids[dim] = (mtime, info, centroids)
+        return info, centroids
+
+    def _assignment_path(self, version: str, name: str) -> Path:
+        return self.index_dir / "assign" / version / f"{name}.npy"
+
+    def _save_array(self, path: Path, arr: np.ndarray) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}.{uuid.uuid4().hex[:8]}.tmp.npy")
+        np.save(tmp, arr)
+        os.replace(tmp, path)
+
+    def _segment_assignment(self, version: str, centroids: np.ndarray, name: str, matrix: np.ndarray) -> np.ndarray:
+        key = (version, name)
+        cached = self._assignments.get(key)
+        if cached is not None:
+            return cached
+        path = self._assignment_path(version, name)
+        if path.exists():
+            assign = np.load(path)
+        else:
+            assign = _assign(matrix, centroids)
+            self._save_array(path, assign)
+        self._assignments[key] = assign
+        return assign
+
+    # -- training ----------------------------------------------------------
+
+    def train(self, dim: int, segments: Sequence[Segment]) -> Optional[Tuple[Dict, np.ndarray]]:
+        group = [seg for seg in segments if seg[2].shape[1] == dim and seg[2].shape[0] > 0]
+        total = sum(seg[2].shape[0] for seg in group)
+        if total < self.min_train_rows:
+            return None
+        rng = np.random.default_rng(0)
+        data = np.concatenate([np.asarray(seg[2], dtype=np.float32) for seg in group])
+        if data.shape[0] > self.train_sample:
+            data = data[rng.choice(data.shape[0], size=self.train_sample, replace=False)]
+        nlist = self.nlist or max(1, int(np.sqrt(total)))
+        centroids = spherical_kmeans(data, nlist)
+        previous = self._load_centroids(dim)
+        version = uuid.uuid4().hex[:12]
+        file_name = f"centroids-{dim}-{version}.npy"
+        self._save_array(self.index_dir / file_name, centroids)
+        info = {"version": version, "dim": dim, "nlist": int(centroids.shape[0]), "trained_rows": total, "file": file_name}
+        info_path = self._info_path(dim)
+        tmp = info_path.with_suffix(f".{version}.tmp")
+        tmp.write_text(json.dumps(info), encoding="utf-8")
+        os.replace(tmp, info_path)
+        if previous is not None:
+            (self.index_dir / previous[0]["file"]).unlink(missing_ok=True)
+            shutil.rmtree(self.index_dir / "assign" / previous[0]["version"], ignore_errors=True)
+        return self._load_centroids(dim)
+
+    def _needs_training(self, dim: int, segments: Sequence[Segment]) -> bool:
+        total = sum(seg[2].shape[0] for seg in segments if seg[2].shape[1] == dim)
+        if total < self.min_train_rows:
+            return False
+        loaded = self._load_centroids(dim)
+        return loaded is None or total >= self.retrain_factor * int(loaded[0].get("trained_rows", 0))
+
+    def _train_once(self, dim: int, segments: Sequence[Segment]) -> None:
+        try:
+            self.train(dim, segments)
+        finally:
+            with self._lock:
+                self._training.pop(dim, None)
+
+    def maybe_train(self, segments: Sequence[Segment], background: bool = True) -> None:
+        """(Re)train every width whose centroids are missing or stale, unless
+        a training for it is already running."""
+        for dim in {seg[2].shape[1] for seg in segments}:
+            if not self._needs_training(dim, segments):
+                continue
+            with self._lock:
+                if dim in self._training:
+                    continue
+                thread = threading.Thread(
+                    target=self._train_once, args=(dim, list(segments)), name=f"ivf-train-{dim}", daemon=True
+                )
+                self._training[dim] = thread
+                if background:
+                    thread.start()
+            if not background:
+                thread.run()
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            threads = list(self._training.values())
+        for thread in threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+    # -- SearchBackend -----------------------------------------------------
+
+    def candidates(self, segments: Sequence[Segment], qvec: np.ndarray, nprobe: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        nprobe = nprobe or self.nprobe
+        self.maybe_train(segments)
+        out: List[Optional[np.ndarray]] = [None] * len(segments)
+        probes: Dict[int, Optional[Tuple[str, np.ndarray, np.ndarray]]] = {}
+        for i, (name, _, matrix) in enumerate(segments):
+            dim = matrix.shape[1]
+            if dim not in probes:
+                loaded = self._load_centroids(dim)
+                if loaded is None:
+                    probes[dim] = None
+                else:
+                    info, centroids = loaded
+                    q = np.zeros(dim, dtype=np.float32)
+                    q[: min(dim, qvec.shape[0])] = qvec[:dim]
+                    sims = centroids @ q
+                    n = min(nprobe, centroids.shape[0])
+                    probes[dim] = (info["version"], centroids, np.argpartition(-sims, n - 1)[:n])
+            probe = probes[dim]
+            if probe is None:
+                continue  # not trained (yet): fall back to exact for this width
+            version, centroids, lists = probe
+            assign = self._segment_assignment(version, centroids, name, matrix)
+            out[i] = np.flatnonzero(np.isin(assign, lists))
+        return out
+
+    def on_publish(self, name: str, matrix: np.ndarray) -> None:
+        loaded = self._load_centroids(matrix.shape[1]) if matrix.shape[0] else None
+        if loaded is not None:
+            info, centroids = loaded
+            self._segment_assignment(info["version"], centroids, name, matrix)
+
+    def on_compact(self, merged_name: str, sources: Sequence[str]) -> None:
+        assign_root = self.index_dir / "assign"
+        if not assign_root.exists():
+            return
+        for version_dir in assign_root.iterdir():
+            parts = [version_dir / f"{name}.npy" for name in sources]
+            if all(p.exists() for p in parts):
+                merged = np.concatenate([np.load(p) for p in parts])
+                self._save_array(version_dir / f"{merged_name}.npy", merged)
+            for p in parts:
+                p.unlink(missing_ok=True)
+                self._assignments.pop((version_dir.name, p.stem), None)
+
+
+_BACKENDS: Dict[Tuple[str, str], SearchBackend] = {}
+
+
+def get_backend(mode: str, index_dir: Path) -> SearchBackend:
+    mode = (mode or "exact").lower()
+    key = (mode, str(index_dir))
+    backend = _BACKENDS.get(key)
+    if backend is None:
+        if mode == "exact":
+            backend = ExactSearch()
+        elif mode == "ivf":
+            backend = IVFIndex(index_dir)
+        else:
+            raise ValueError(f"Unsupported vector search mode: {mode}")
+        _BACKENDS[key] = backend
+    return backend
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+SessionSummary = Dict[str, Any]
+
+
+class SessionStore(ABC):
+    """Sessions: a header (question, models, state, final_report, ...) plus
+    numbered rounds. Writing a round number again replaces that round."""
+
+    @abstractmethod
+    def save_session(self, session_id: str, payload: Dict[str, Any]) -> None:
+        """Replace the whole session; ``payload["rounds"]`` (if any) become its rounds."""
+
+    @abstractmethod
+    def load_session(
+        self,
+        session_id: str,
+        from_round: Optional[int] = None,
+        latest_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """The session with its rounds (all, from ``from_round``, or only the latest)."""
+
+    @abstractmethod
+    def append_round(self, session_id: str, round_entry: Dict[str, Any]) -> int:
+        """Write a round; without a round number the next free one is used. Returns it."""
+
+    @abstractmethod
+    def finalize_session(self, session_id: str, state: str, final_report: Dict[str, Any]) -> None:
+        """Record the final state and report."""
+
+    @abstractmethod
+    def list_sessions(
+        self,
+        state: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[SessionSummary]:
+        """Most recently updated sessions first. ``since`` is a Unix timestamp;
+        combined with ``model`` it means "that model answered since then"."""
+
+    # Async variants run the blocking implementation in the default thread pool.
+
+    async def save_session_async(self, session_id: str, payload: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.save_session, session_id, payload)
+
+    async def load_session_async(
+        self,
+        session_id: str,
+        from_round: Optional[int] = None,
+        latest_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.load_session, session_id, from_round, latest_only)
+
+    async def append_round_async(self, session_id: str, round_entry: Dict[str, Any]) -> int:
+        return await asyncio.to_thread(self.append_round, session_id, round_entry)
+
+    async def finalize_session_async(self, session_id: str, state: str, final_report: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.finalize_session, session_id, state, final_report)
+
+    async def list_sessions_async(
+        self,
+        state: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[SessionSummary]:
+        return await asyncio.to_thread(self.list_sessions, state, model, since, limit)
+
+
+class VectorStore(ABC):
+    """Embedded documents ({session_id, text, meta}) with cosine search."""
+
+    @abstractmethod
+    def add_documents(self, session_id: str, docs: List[Dict[str, Any]]) -> None:
+        """docs: list of {text: str, meta: {...}}"""
+
+    @abstractmethod
+    def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k (score, item) pairs; filters as in vector_store.search_similar."""
+
+    async def add_documents_async(self, session_id: str, docs: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.add_documents, session_id, docs)
+
+
+_stores: Dict[Tuple[str, str, str], Any] = {}
+_stores_lock = threading.Lock()
+
+
+def _backend() -> str:
+    backend = os.getenv("STORAGE_BACKEND", "file").strip().lower()
+    if backend not in ("file", "sqlite"):
+        raise ValueError(f"Unsupported STORAGE_BACKEND: {backend}")
+    return backend
+
+
+def sqlite_path() -> str:
+    from backend.storage import simple_store
+
+    return os.getenv("STORAGE_SQLITE_PATH") or str(simple_store.STORE_DIR / "store.db")
+
+
+def _get(kind: str) -> Any:
+    backend = _backend()
+    location = sqlite_path() if backend == "sqlite" else ""
+    key = (kind, backend, location)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if backend == "sqlite":
+                from backend.storage import sqlite_store
+
+                cls = sqlite_store.SQLiteSessionStore if kind == "session" else sqlite_store.SQLiteVectorStore
+                store = cls(location)
+            elif kind == "session":
+                from backend.storage.simple_store import FileSessionStore
+
+                store = FileSessionStore()
+            else:
+                from backend.storage.vector_store import FileVectorStore
+
+                store = FileVectorStore()
+            _stores[key] = store
+        return store
+
+
+def get_session_store() -> SessionStore:
+    """Session store selected by STORAGE_BACKEND ("file" default, or "sqlite"
+    at STORAGE_SQLITE_PATH, default <data dir>/store.db)."""
+    return _get("session")
+
+
+def get_vector_store() -> VectorStore:
+    return _get("vector")
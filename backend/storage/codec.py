@@ -0,0 +1,171 @@
+import importlib
+import importlib.util
+import json
+import os
+import struct
+from typing import Any, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Session payloads. Plain JSON stays plain UTF-8 text, so existing files and
+# rows decode unchanged; binary encodings carry a 4-byte tag naming the codec.
+_TAG_PREFIX = b"WSP"
+_TAGS = {
+    "msgpack": b"m",
+    "cbor": b"c",
+    "json+zstd": b"J",
+    "msgpack+zstd": b"M",
+    "cbor+zstd": b"C",
+}
+_CODECS = {tag: name for name, tag in _TAGS.items()}
+_OPTIONAL_MODULES = {"msgpack": "msgpack", "cbor": "cbor2", "zstd": "zstandard"}
+
+# Embeddings: float32 (raw, zero-copy), float16, or int8 with a float32
+# scale per row (symmetric quantisation of the unit-normalised vectors).
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def _available(part: str) -> bool:
+    module = _OPTIONAL_MODULES.get(part)
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def payload_codec() -> str:
+    """Codec for new session data from SESSION_CODEC (json | msgpack | cbor)
+    and SESSION_COMPRESSION (none | zstd). Parts whose optional package is not
+    installed fall back to json / no compression."""
+    fmt = os.getenv("SESSION_CODEC", "json").strip().lower()
+    if fmt not in ("json", "msgpack", "cbor"):
+        raise ValueError(f"Unsupported SESSION_CODEC: {fmt}")
+    if not _available(fmt):
+        fmt = "json"
+    compression = os.getenv("SESSION_COMPRESSION", "none").strip().lower()
+    if compression not in ("none", "zstd"):
+        raise ValueError(f"Unsupported SESSION_COMPRESSION: {compression}")
+    if compression == "zstd" and _available("zstd"):
+        return f"{fmt}+zstd"
+    return fmt
+
+
+def _zstd() -> Any:
+    return importlib.import_module("zstandard")
+
+
+def encode_payload(obj: Any, codec: Optional[str] = None) -> bytes:
+    codec = codec or payload_codec()
+    fmt, _, compression = codec.partition("+")
+    if fmt == "msgpack":
+        body = importlib.import_module("msgpack").packb(obj, use_bin_type=True)
+    elif fmt == "cbor":
+        body = importlib.import_module("cbor2").dumps(obj)
+    else:
+        body = json.dumps(obj).encode("utf-8")
+    if compression == "zstd":
+        level = int(os.getenv("SESSION_ZSTD_LEVEL", "3"))
+        body = _zstd().ZstdCompressor(level=level).compress(body)
+    elif fmt == "json":
+        return body
+    return _TAG_PREFIX + _TAGS[codec] + body
+
+
+def decode_payload(data: Union[Buffer, str]) -> Any:
+    """Decode any payload written by encode_payload, or plain JSON text."""
+    if isinstance(data, str):
+        return json.loads(data)
+    view = memoryview(data)
+    if bytes(view[:3]) != _TAG_PREFIX:
+        return json.loads(bytes(view))
+    codec = _CODECS.get(bytes(view[3:4]))
+    if codec is None:
+        raise ValueError("Unknown payload codec tag")
+    fmt, _, compression = codec.partition("+")
+    body: Buffer = view[4:]
+    if compression == "zstd":
+        # Frames written by ZstdCompressor.compress carry their content size.
+        body = _zstd().ZstdDecompressor().decompress(bytes(body))
+    if fmt == "msgpack":
+        return importlib.import_module("msgpack").unpackb(body, raw=False, strict_map_key=False)
+    if fmt == "cbor":
+        return importlib.import_module("cbor2").loads(bytes(body))
+    return json.loads(bytes(body))
+
+
+# Length-prefixed record log: <int32 round><uint32 length><payload>.
+_RECORD_HEADER = struct.Struct("<iI")
+
+
+def frame_record(round_no: int, payload: bytes) -> bytes:
+    return _RECORD_HEADER.pack(round_no, len(payload)) + payload
+
+
+def iter_records(data: Buffer) -> Iterator[Tuple[int, memoryview]]:
+    """(round, payload view) per record; a torn trailing record is ignored.
+    Payloads are views into ``data`` and are only decoded on demand."""
+    view = memoryview(data)
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(view):
+        round_no, length = _RECORD_HEADER.unpack_from(view, offset)
+        start = offset + _RECORD_HEADER.size
+        if start + length > len(view):
+            break
+        yield round_no, view[start:start + length]
+        offset = start + length
+
+
+def vector_dtype() -> str:
+    dtype = os.getenv("VECTOR_DTYPE", "float32").strip().lower()
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unsupported VECTOR_DTYPE: {dtype}")
+    return dtype
+
+
+def encode_matrix(mat: np.ndarray, dtype: str = "float32") -> bytes:
+    """Row-major bytes of ``mat``; int8 is prefixed by one float32 scale per row."""
+    mat = np.asarray(mat, dtype=np.float32)
+    if dtype == "float32":
+        return np.ascontiguousarray(mat).tobytes()
+    if dtype == "float16":
+        return np.ascontiguousarray(mat, dtype=np.float16).tobytes()
+    if dtype == "int8":
+        scales = np.abs(mat).max(axis=1) / 127.0 if mat.size else np.zeros(mat.shape[0], dtype=np.float32)
+        scales = scales.astype(np.float32)
+        safe = np.where(scales == 0, 1.0, scales)[:, None]
+        quantised = np.clip(np.rint(mat / safe), -127, 127).astype(np.int8)
+        return scales.tobytes() + quantised.tobytes()
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def decode_matrix(buf: Union[Buffer, np.ndarray], count: int, dim: int, dtype: str = "float32") -> np.ndarray:
+    """(count, dim) matrix over ``buf`` without copying for float32/float16
+    (a memmap stays a memmap); int8 is dequantised into a new float32 array."""
+    if dtype == "float32":
+        return np.frombuffer(buf, dtype=np.float32, count=count * dim).reshape(count, dim)
+    if dtype == "float16":
+        return np.frombuffer(buf, dtype=np.float16, count=count * dim).reshape(count, dim)
+    if dtype == "int8":
+        scales = np.frombuffer(buf, dtype=np.float32, count=count)
+        quantised = np.frombuffer(buf, dtype=np.int8, count=count * dim, offset=count * 4).reshape(count, dim)
+        return quantised.astype(np.float32) * scales[:, None]
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+_VECTOR_MARKERS = {"float16": b"h", "int8": b"q"}
+
+
+def encode_vector(vec: np.ndarray, dtype: str = "float32") -> bytes:
+    """One self-describing vector BLOB: raw float32 (the historical format)
+    or a one-byte dtype marker followed by encode_matrix bytes."""
+    body = encode_matrix(np.asarray(vec, dtype=np.float32)[None, :], dtype)
+    return body if dtype == "float32" else _VECTOR_MARKERS[dtype] + body
+
+
+def decode_vector(blob: Buffer, dim: int) -> np.ndarray:
+    view = memoryview(blob)
+    if len(view) == dim * 4:
+        return decode_matrix(view, 1, dim, "float32")[0]
+    for dtype, marker in _VECTOR_MARKERS.items():
+        if bytes(view[:1]) == marker:
+            return decode_matrix(view[1:], 1, dim, dtype)[0]
+    raise ValueError(f"Vector blob of {len(view)} bytes does not match dim {dim}")
@@ -0,0 +1,55 @@
+"""Import the file-based data directory into the SQLite store.
+
+    python -m backend.storage.migrate [--db PATH]
+
+Sessions (legacy single-file or header + round log) and every live vector
+segment are copied; the files are left untouched. Re-running replaces the
+imported sessions but would duplicate documents, so documents are only
+imported into an empty documents table unless --force-documents is given.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.storage import simple_store, vector_store  # noqa: E402
+from backend.storage.base import sqlite_path  # noqa: E402
+from backend.storage.simple_store import FileSessionStore  # noqa: E402
+from backend.storage.sqlite_store import SQLiteSessionStore, SQLiteVectorStore  # noqa: E402
+
+
+def migrate_data_dir(db_path: Optional[str] = None, force_documents: bool = False) -> Dict[str, int]:
+    db_path = db_path or sqlite_path()
+    sessions = SQLiteSessionStore(db_path)
+    documents = SQLiteVectorStore(db_path)
+    files = FileSessionStore()
+
+    counts = {"sessions": 0, "rounds": 0, "documents": 0}
+    for summary in files.list_sessions(limit=sys.maxsize):
+        payload = files.load_session(summary["session_id"])
+        if payload is None:
+            continue
+        # Keep the file's age so time-window queries do not see every import as new.
+        sessions.save_session(summary["session_id"], payload, updated_at=summary["updated_at"])
+        counts["sessions"] += 1
+        counts["rounds"] += len(payload.get("rounds") or [])
+
+    if documents.count() == 0 or force_documents:
+        counts["documents"] = documents.insert(vector_store.iter_documents())
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Import {simple_store.STORE_DIR} into SQLite")
+    parser.add_argument("--db", default=None, help="SQLite file (default: STORAGE_SQLITE_PATH or <data dir>/store.db)")
+    parser.add_argument("--force-documents", action="store_true", help="Import documents even if some exist")
+    args = parser.parse_args()
+    print(json.dumps(migrate_data_dir(args.db, args.force_documents)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,84 @@
+import asyncio
 import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import weakref
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from backend.storage.base import SessionStore, SessionSummary
+from backend.storage.codec import decode_payload, encode_payload, frame_record, iter_records, payload_codec
 
 STORE_DIR = Path(__file__).resolve().parent / "data"
 STORE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Session layout: <id>.json is a small header (question, models, state,
+# final_report, ...) and <id>.rounds.jsonl an append-only log with one record
+# per round write. With SESSION_CODEC / SESSION_COMPRESSION set, new sessions
+# log length-prefixed binary records to <id>.rounds.bin instead (the header
+# stays JSON). Legacy files with an inline "rounds" list stay readable and are
+# migrated on their first append.
+_LOG_MARKER = "rounds_log"
+_ROUND_PREFIX = re.compile(r'^\{"round": (-?\d+)')
+
+# One lock per session serialises read-modify-write cycles (rounds appended by
+# run_iterations vs. follow-ups); threading locks because the work runs in
+# worker threads via the *_async wrappers as well as from the sync CLI.
+# Weak values: a session's lock is dropped once nobody holds or waits on it.
+_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
 
 def _session_path(session_id: str) -> Path:
     return STORE_DIR / f"{session_id}.json"
 
 
-def save_structured_session(session_id: str, payload: Dict[str, Any]) -> None:
-    _session_path(session_id).write_text(json.dumps(payload), encoding="utf-8")
+def _session_lock(session_id: str) -> Any:
+    with _locks_guard:
+        lock = _locks.get(session_id)
+        if lock is None:
+            lock = _locks[session_id] = threading.RLock()
+        return lock
+
+
+def _write_atomic(path: Path, data: Union[str, bytes]) -> None:
+    """Write to a temp file in the same directory and rename it over ``path``,
+    so readers never see a half-written session."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data.encode("utf-8") if isinstance(data, str) else data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
 
+def _log_codec(marker: Any) -> Optional[str]:
+    """Binary payload codec of a session's round log, None for JSON Lines.
+    The header marker is True for .rounds.jsonl or the codec name for .rounds.bin."""
+    return marker if isinstance(marker, str) and marker != "json" else None
 
-def load_structured_session(session_id: str) -> Optional[Dict[str, Any]]:
+
+def _new_log_marker() -> Union[bool, str]:
+    codec = payload_codec()
+    return True if codec == "json" else codec
+
+
+def _rounds_path(session_id: str, codec: Optional[str] = None) -> Path:
+    return STORE_DIR / f"{session_id}.rounds.{'bin' if codec else 'jsonl'}"
+
+
+def _read_header(session_id: str) -> Optional[Dict[str, Any]]:
     path = _session_path(session_id)
     if not path.exists():
         return None
@@ -24,26 +88,306 @@ def load_structured_session(session_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _write_header(session_id: str, header: Dict[str, Any]) -> None:
+    _write_atomic(_session_path(session_id), json.dumps(header))
+
+
+def _round_record(entry: Dict[str, Any], codec: Optional[str] = None) -> bytes:
+    if codec:
+        return frame_record(int(entry["round"]), encode_payload(entry, codec))
+    # "round" is written first so readers can select lines without parsing them.
+    return (json.dumps({"round": entry.get("round"), **entry}) + "\n").encode("utf-8")
+
+
+def _round_number(value: Any) -> int:
+    # Readers select records by an integer round prefix or header, so any
+    # other value would make the record unreadable.
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"Round number must be an int, got {value!r}")
+    return value
+
+
+def _write_log(session_id: str, rounds: List[Dict[str, Any]], codec: Optional[str]) -> None:
+    # Rounds without a number are numbered after the highest one before them.
+    last = 0
+    for entry in rounds:
+        if entry.get("round") is None:
+            entry["round"] = last + 1
+        last = max(last, _round_number(entry["round"]))
+    _write_atomic(_rounds_path(session_id, codec), b"".join(_round_record(r, codec) for r in rounds))
+    stale = _rounds_path(session_id, None if codec else "bin")
+    if stale.exists():
+        stale.unlink()
+
+
+def _read_rounds(
+    session_id: str,
+    codec: Optional[str] = None,
+    from_round: Optional[int] = None,
+    latest_only: bool = False,
+) -> List[Dict[str, Any]]:
+    """Rounds from the log, last record per round number winning, in round order.
+
+    Records are selected by their round number (the JSON line prefix or the
+    binary record header) and only the selected ones are decoded; a torn
+    trailing record (crash mid-append) is skipped.
+    """
+    path = _rounds_path(session_id, codec)
+    if not path.exists():
+        return []
+
+    def _select(records: Dict[int, Any]) -> List[int]:
+        numbers = sorted(records)
+        if from_round is not None:
+            numbers = [n for n in numbers if n >= from_round]
+        return numbers[-1:] if latest_only else numbers
+
+    rounds: List[Dict[str, Any]] = []
+    if codec:
+        if path.stat().st_size == 0:
+            return []
+        # Memory-map the log: records are located by their headers and only
+        # the selected payloads are read and decoded.
+        with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            latest: Dict[int, Any] = {}
+            try:
+                latest.update(iter_records(view))
+                for number in _select(latest):
+                    try:
+                        rounds.append(decode_payload(latest[number]))
+                    except ValueError:
+                        continue
+            finally:
+                for payload in latest.values():
+                    payload.release()
+                view.release()
+        return rounds
+    lines: Dict[int, str] = {}
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            match = _ROUND_PREFIX.match(line)
+            if match:
+                lines[int(match.group(1))] = line
+    for number in _select(lines):
+        try:
+            rounds.append(json.loads(lines[number]))
+        except json.JSONDecodeError:
+            continue
+    return rounds
+
+
+def _filter_rounds(rounds: List[Dict[str, Any]], from_round: Optional[int], latest_only: bool) -> List[Dict[str, Any]]:
+    if from_round is not None:
+        rounds = [r for r in rounds if int(r.get("round") or 0) >= from_round]
+    if latest_only:
+        rounds = rounds[-1:]
+    return rounds
+
+
+def _migrate_legacy(session_id: str, header: Dict[str, Any]) -> Dict[str, Any]:
+    """Move the inline rounds of a legacy session file into the round log.
+    The log is written first, so a crash in between leaves the legacy file
+    authoritative and the migration is simply redone."""
+    rounds = header.pop("rounds", None) or []
+    marker = _new_log_marker()
+    _write_log(session_id, rounds, _log_codec(marker))
+    header[_LOG_MARKER] = marker
+    _write_header(session_id, header)
+    return header
+
+
+def save_structured_session(session_id: str, payload: Dict[str, Any]) -> None:
+    """Replace the whole session; a ``rounds`` list goes to the round log."""
+    with _session_lock(session_id):
+        header = dict(payload)
+        if "rounds" in header:
+            marker = _new_log_marker()
+            _write_log(session_id, header.pop("rounds") or [], _log_codec(marker))
+            header[_LOG_MARKER] = marker
+        else:
+            for codec in (None, "bin"):
+                if _rounds_path(session_id, codec).exists():
+                    _rounds_path(session_id, codec).unlink()
+        _write_header(session_id, header)
+
+
+def load_structured_session(
+    session_id: str,
+    from_round: Optional[int] = None,
+    latest_only: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """Load a session; ``from_round`` / ``latest_only`` limit which rounds are
+    read (the header, state and final report are always included)."""
+    with _session_lock(session_id):
+        header = _read_header(session_id)
+        if header is None:
+            return None
+        marker = header.pop(_LOG_MARKER, None)
+        if "rounds" in header:  # legacy single-file session
+            header["rounds"] = _filter_rounds(header["rounds"] or [], from_round, latest_only)
+        elif marker:
+            header["rounds"] = _read_rounds(session_id, _log_codec(marker), from_round, latest_only)
+        return header
+
+
+def _update_header(session_id: str, mutate: Callable[[Dict[str, Any]], Any]) -> Any:
+    with _session_lock(session_id):
+        header = _read_header(session_id) or {}
+        result = mutate(header)
+        _write_header(session_id, header)
+        return result
+
+
 # Iteration sessions
 
 def save_iteration_session(session_id: str, payload: Dict[str, Any]) -> None:
-    _session_path(session_id).write_text(json.dumps(payload), encoding="utf-8")
+    save_structured_session(session_id, payload)
 
 
 def load_iteration_session(session_id: str) -> Optional[Dict[str, Any]]:
     return load_structured_session(session_id)
 
 
-def append_iteration_round(session_id: str, round_entry: Dict[str, Any]) -> None:
-    data = load_iteration_session(session_id) or {}
-    rounds: List[Dict[str, Any]] = data.get("rounds", [])
-    rounds.append(round_entry)
-    data["rounds"] = rounds
-    save_iteration_session(session_id, data)
+def append_iteration_round(session_id: str, round_entry: Dict[str, Any]) -> int:
+    """Append a round record to the session's log; for a given round number
+    the last record wins, so re-appending a round replaces it.
+
+    An entry without a round number gets the next free one; any other
+    non-int round raises ValueError. Returns the round number used.
+    """
+    if round_entry.get("round") is not None:
+        _round_number(round_entry["round"])
+    with _session_lock(session_id):
+        header = _read_header(session_id)
+        if header is None:
+            header = {_LOG_MARKER: _new_log_marker()}
+            _write_header(session_id, header)
+        elif "rounds" in header:
+            _migrate_legacy(session_id, header)
+        elif not header.get(_LOG_MARKER):
+            header[_LOG_MARKER] = _new_log_marker()
+            _write_header(session_id, header)
+        # A session keeps the log format it was created with.
+        codec = _log_codec(header[_LOG_MARKER])
+        if round_entry.get("round") is None:
+            latest = _read_rounds(session_id, codec, latest_only=True)
+            round_entry["round"] = max((int(r["round"]) for r in latest), default=0) + 1
+        with _rounds_path(session_id, codec).open("ab") as fh:
+            fh.write(_round_record(round_entry, codec))
+            fh.flush()
+            os.fsync(fh.fileno())
+        return int(round_entry["round"])
 
 
 def finalize_iteration_session(session_id: str, state: str, final_report: Dict[str, Any]) -> None:
-    data = load_iteration_session(session_id) or {}
-    data["state"] = state
-    data["final_report"] = final_report
-    save_iteration_session(session_id, data)
+    def _finalize(header: Dict[str, Any]) -> None:
+        header["state"] = state
+        header["final_report"] = final_report
+
+    # Only the small header is rewritten; a legacy file keeps its inline rounds.
+    _update_header(session_id, _finalize)
+
+
+# Async variants: the same operations offloaded to the default thread pool so
+# file I/O never runs on the event loop.
+
+async def save_structured_session_async(session_id: str, payload: Dict[str, Any]) -> None:
+    await asyncio.to_thread(save_structured_session, session_id, payload)
+
+
+async def load_structured_session_async(
+    session_id: str,
+    from_round: Optional[int] = None,
+    latest_only: bool = False,
+) -> Optional[Dict[str, Any]]:
+    return await asyncio.to_thread(load_structured_session, session_id, from_round, latest_only)
+
+
+async def save_iteration_session_async(session_id: str, payload: Dict[str, Any]) -> None:
+    await asyncio.to_thread(save_iteration_session, session_id, payload)
+
+
+async def load_iteration_session_async(session_id: str) -> Optional[Dict[str, Any]]:
+    return await asyncio.to_thread(load_iteration_session, session_id)
+
+
+async def append_iteration_round_async(session_id: str, round_entry: Dict[str, Any]) -> int:
+    return await asyncio.to_thread(append_iteration_round, session_id, round_entry)
+
+
+async def finalize_iteration_session_async(session_id: str, state: str, final_report: Dict[str, Any]) -> None:
+    await asyncio.to_thread(finalize_iteration_session, session_id, state, final_report)
+
+
+def _round_models(rounds: List[Dict[str, Any]]) -> List[str]:
+    models = []
+    for entry in rounds:
+        for resp in ((entry.get("multi") or {}).get("responses") or []):
+            if resp and resp.get("model_id") and resp["model_id"] not in models:
+                models.append(resp["model_id"])
+    return models
+
+
+class FileSessionStore(SessionStore):
+    """SessionStore over the JSON files in STORE_DIR (the functions above).
+
+    list_sessions scans the directory; use the SQLite store for indexed lookups.
+    """
+
+    _NOT_SESSIONS = {"vector_index.json", "vectors_meta.json"}
+
+    def save_session(self, session_id: str, payload: Dict[str, Any]) -> None:
+        save_structured_session(session_id, payload)
+
+    def load_session(
+        self,
+        session_id: str,
+        from_round: Optional[int] = None,
+        latest_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        return load_structured_session(session_id, from_round, latest_only)
+
+    def append_round(self, session_id: str, round_entry: Dict[str, Any]) -> int:
+        return append_iteration_round(session_id, round_entry)
+
+    def finalize_session(self, session_id: str, state: str, final_report: Dict[str, Any]) -> None:
+        finalize_iteration_session(session_id, state, final_report)
+
+    def list_sessions(
+        self,
+        state: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[SessionSummary]:
+        found: List[SessionSummary] = []
+        for path in STORE_DIR.glob("*.json"):
+            if path.name in self._NOT_SESSIONS or path.name.startswith("."):
+                continue
+            session_id = path.stem
+            log = next((p for p in (_rounds_path(session_id), _rounds_path(session_id, "bin")) if p.exists()), path)
+            try:
+                updated_at = max(path.stat().st_mtime, log.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+            if since is not None and updated_at < since:
+                continue
+            header = _read_header(session_id)
+            if header is None or (state is not None and header.get("state") != state):
+                continue
+            models = list(header.get("models") or [])
+            if model is not None and model not in models:
+                sess = load_structured_session(session_id) or {}
+                models = models + _round_models(sess.get("rounds") or [])
+                if model not in models:
+                    continue
+            found.append({
+                "session_id": header.get("session_id", session_id),
+                "question": header.get("question"),
+                "state": header.get("state"),
+                "models": models,
+                "updated_at": updated_at,
+            })
+        found.sort(key=lambda s: s["updated_at"], reverse=True)
+        return found[:limit]
@@ -0,0 +1,396 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services.embeddings import embed_texts
+from backend.storage.base import SessionStore, SessionSummary, VectorStore
+from backend.storage.codec import decode_payload, decode_vector, encode_payload, encode_vector, payload_codec, vector_dtype
+from backend.storage.vector_store import FILTER_FIELDS, _fit_dim, _normalize_rows
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    question   TEXT,
+    state      TEXT,
+    has_rounds INTEGER NOT NULL DEFAULT 0,
+    header     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_state ON sessions (state, updated_at);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS rounds (
+    session_id TEXT NOT NULL,
+    round      INTEGER NOT NULL,
+    entry      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, round)
+);
+
+CREATE TABLE IF NOT EXISTS responses (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    round      INTEGER NOT NULL,
+    model_id   TEXT NOT NULL,
+    parsed     INTEGER NOT NULL,
+    error      TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_round ON responses (session_id, round);
+CREATE INDEX IF NOT EXISTS responses_model ON responses (model_id, created_at);
+
+CREATE TABLE IF NOT EXISTS documents (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT,
+    text       TEXT NOT NULL,
+    role       TEXT,
+    model_id   TEXT,
+    round      INTEGER,
+    point_id   TEXT,
+    meta       TEXT NOT NULL,
+    dim        INTEGER NOT NULL,
+    vec        BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_session ON documents (session_id);
+CREATE INDEX IF NOT EXISTS documents_model ON documents (model_id, round);
+CREATE INDEX IF NOT EXISTS documents_role ON documents (role);
+"""
+
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_connections_lock = threading.Lock()
+# Per-thread read-only connections for long scans (see _read_connection).
+_readers = threading.local()
+
+
+def _connect(path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """One WAL-mode connection per database file, shared by the session and
+    vector stores and serialised with a lock."""
+    with _connections_lock:
+        entry = _connections.get(path)
+        if entry is None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            entry = _connections[path] = (db, threading.Lock())
+        return entry
+
+
+def _read_connection(path: str) -> sqlite3.Connection:
+    """This thread's own connection to ``path``, for reads that should not
+    wait on (or hold up) the shared connection."""
+    conns: Optional[Dict[str, sqlite3.Connection]] = getattr(_readers, "conns", None)
+    if conns is None:
+        conns = _readers.conns = {}
+    db = conns.get(path)
+    if db is None:
+        _connect(path)  # creates the file and schema
+        db = conns[path] = sqlite3.connect(path, isolation_level=None)
+    return db
+
+
+def _pack(obj: Any) -> Any:
+    # JSON text by default; a BLOB under SESSION_CODEC / SESSION_COMPRESSION.
+    # decode_payload reads either, so the setting can change at any time.
+    codec = payload_codec()
+    return json.dumps(obj) if codec == "json" else encode_payload(obj, codec)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in indexed tables: one row per session header, one per round
+    (same round number replaces), and one per model response so lookups by
+    state, model and time are index scans."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db, self._lock = _connect(path)
+
+    def _index_responses(self, session_id: str, number: int, entry: Dict[str, Any], now: float) -> None:
+        self._db.execute("DELETE FROM responses WHERE session_id = ? AND round = ?", (session_id, number))
+        rows = [
+            (session_id, number, resp["model_id"], 1 if resp.get("parsed") else 0, resp.get("error"), now)
+            for resp in ((entry.get("multi") or {}).get("responses") or [])
+            if resp and resp.get("model_id")
+        ]
+        self._db.executemany(
+            "INSERT INTO responses (session_id, round, model_id, parsed, error, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def _write_round(self, session_id: str, entry: Dict[str, Any], now: float) -> int:
+        number = entry.get("round")
+        if number is None:
+            row = self._db.execute(
+                "SELECT COALESCE(MAX(round), 0) + 1 FROM rounds WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            number = entry["round"] = int(row[0])
+        self._db.execute(
+            "INSERT OR REPLACE INTO rounds (session_id, round, entry, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, int(number), _pack(entry), now),
+        )
+        self._index_responses(session_id, int(number), entry, now)
+        return int(number)
+
+    def _upsert_header(self, session_id: str, header: Dict[str, Any], has_rounds: bool, now: float) -> None:
+        self._db.execute(
+            """
+            INSERT INTO sessions (session_id, question, state, has_rounds, header, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                question = excluded.question, state = excluded.state, has_rounds = excluded.has_rounds,
+                header = excluded.header, updated_at = excluded.updated_at
+            """,
+            (session_id, header.get("question"), header.get("state"), int(has_rounds), _pack(header), now, now),
+        )
+
+    def save_session(self, session_id: str, payload: Dict[str, Any], updated_at: Optional[float] = None) -> None:
+        """Replace the session. Rounds already stored keep their timestamps;
+        ``updated_at`` (default now, the source file's mtime when importing)
+        stamps the header and the rounds that are new."""
+        header = dict(payload)
+        rounds = header.pop("rounds", None)
+        now = time.time() if updated_at is None else updated_at
+        with self._lock, self._db:
+            stamped = dict(self._db.execute("SELECT round, created_at FROM rounds WHERE session_id = ?", (session_id,)))
+            self._upsert_header(session_id, header, rounds is not None, now)
+            self._db.execute("DELETE FROM rounds WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM responses WHERE session_id = ?", (session_id,))
+            for entry in rounds or []:
+                self._write_round(session_id, entry, stamped.get(entry.get("round"), now))
+
+    def load_session(
+        self,
+        session_id: str,
+        from_round: Optional[int] = None,
+        latest_only: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT header, has_rounds FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            session = decode_payload(row[0])
+            if not row[1]:
+                return session
+            sql = "SELECT entry FROM rounds WHERE session_id = ? AND round >= ?"
+            sql += " ORDER BY round DESC LIMIT 1" if latest_only else " ORDER BY round"
+            entries = self._db.execute(sql, (session_id, from_round if from_round is not None else -(2**62))).fetchall()
+        session["rounds"] = [decode_payload(entry) for (entry,) in entries]
+        return session
+
+    def append_round(self, session_id: str, round_entry: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock, self._db:
+            updated = self._db.execute(
+                "UPDATE sessions SET has_rounds = 1, updated_at = ? WHERE session_id = ?", (now, session_id)
+            ).rowcount
+            if not updated:
+                self._upsert_header(session_id, {}, True, now)
+            return self._write_round(session_id, round_entry, now)
+
+    def finalize_session(self, session_id: str, state: str, final_report: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT header, has_rounds FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            header = decode_payload(row[0]) if row else {}
+            header["state"] = state
+            header["final_report"] = final_report
+            self._upsert_header(session_id, header, bool(row[1]) if row else False, now)
+
+    def list_sessions(
+        self,
+        state: Optional[str] = None,
+        model: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[SessionSummary]:
+        where: List[str] = []
+        args: List[Any] = []
+        if state is not None:
+            where.append("s.state = ?")
+            args.append(state)
+        if model is not None:
+            where.append(
+                "s.session_id IN (SELECT session_id FROM responses WHERE model_id = ? AND created_at >= ?)"
+            )
+            args.extend([model, since if since is not None else 0.0])
+        elif since is not None:
+            where.append("s.updated_at >= ?")
+            args.append(since)
+        sql = "SELECT s.session_id, s.question, s.state, s.header, s.updated_at FROM sessions s"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.updated_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+            found = []
+            for session_id, question, row_state, header, updated_at in rows:
+                models = list(decode_payload(header).get("models") or [])
+                for (mid,) in self._db.execute(
+                    "SELECT DISTINCT model_id FROM responses WHERE session_id = ?", (session_id,)
+                ):
+                    if mid not in models:
+                        models.append(mid)
+                found.append({
+                    "session_id": session_id,
+                    "question": question,
+                    "state": row_state,
+                    "models": models,
+                    "updated_at": updated_at,
+                })
+        return found
+
+
+def _as_values(wanted: Any) -> List[Any]:
+    return list(wanted) if isinstance(wanted, (list, tuple, set, frozenset)) else [wanted]
+
+
+class SQLiteVectorStore(VectorStore):
+    """Documents with embedding BLOBs (float32, or VECTOR_DTYPE); filters are indexed WHERE
+    clauses and only the matching rows are scored (exact cosine)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db, self._lock = _connect(path)
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0])
+
+    def insert(self, items: Iterable[Tuple[Dict[str, Any], np.ndarray]]) -> int:
+        """Store (item, already-normalised vector) pairs; returns the count."""
+        dtype = vector_dtype()
+        rows = []
+        for item, vec in items:
+            meta = item.get("meta") or {}
+            round_no = meta.get("round")
+            rows.append((
+                item.get("session_id"),
+                item.get("text", ""),
+                meta.get("role"),
+                meta.get("model_id"),
+                round_no if isinstance(round_no, int) else None,
+                meta.get("point_id"),
+                json.dumps(meta),
+                int(vec.shape[0]),
+                encode_vector(vec, dtype),
+            ))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO documents (session_id, text, role, model_id, round, point_id, meta, dim, vec)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def add_documents(self, session_id: str, docs: List[Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        embeddings = embed_texts([d.get("text", "") for d in docs])
+        dim = max((len(e) for e in embeddings), default=0)
+        matrix = _normalize_rows(_fit_dim(embeddings, dim))
+        items = [{"session_id": session_id, "text": d.get("text", ""), "meta": d.get("meta", {})} for d in docs]
+        self.insert(zip(items, matrix))
+
+    def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Exact top-k over the filtered rows, scored SQLITE_SEARCH_CHUNK_ROWS
+        at a time; ``mode``/``nprobe`` are accepted for interface
+        compatibility (the filters already bound the scored rows)."""
+        where: List[str] = []
+        args: List[Any] = []
+        for field, wanted in (filters or {}).items():
+            if field == "round_min":
+                where.append("round >= ?")
+                args.append(wanted)
+            elif field == "round_max":
+                where.append("round <= ?")
+                args.append(wanted)
+            elif field in FILTER_FIELDS:
+                values = _as_values(wanted)
+                where.append(f"{field} IN ({','.join('?' * len(values))})")
+                args.extend(values)
+            else:
+                raise ValueError(f"Unsupported filter field: {field}")
+        if top_k <= 0:
+            return []
+        sql = "SELECT id, dim, vec FROM documents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        raw_query = embed_texts([query])[:1] or [[]]
+        query_by_dim: Dict[int, np.ndarray] = {}
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        chunk_rows = max(1, int(os.getenv("SQLITE_SEARCH_CHUNK_ROWS", "4096")))
+        # A reader connection of this thread: in WAL mode the scan neither
+        # holds the shared connection's lock nor blocks session writes. One
+        # read transaction keeps the scan and the row fetch on one snapshot.
+        db = _read_connection(self.path)
+        db.execute("BEGIN")
+        try:
+            cursor = db.execute(sql, args)
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+                # One (n, dim) matrix and one matmul per embedding width in the chunk.
+                by_dim: Dict[int, List[Tuple[int, bytes]]] = {}
+                for doc_id, dim, blob in chunk:
+                    by_dim.setdefault(dim, []).append((doc_id, blob))
+                for dim, docs in by_dim.items():
+                    ids = np.fromiter((doc_id for doc_id, _ in docs), dtype=np.int64, count=len(docs))
+                    if dim:
+                        qvec = query_by_dim.get(dim)
+                        if qvec is None:
+                            qvec = query_by_dim[dim] = _normalize_rows(_fit_dim(raw_query, dim))[0]
+                        matrix = np.stack([decode_vector(blob, dim) for _, blob in docs]).astype(np.float32, copy=False)
+                        scores = matrix @ qvec
+                    else:
+                        scores = np.zeros(len(docs), dtype=np.float32)
+                    best_ids = np.concatenate([best_ids, ids])
+                    best_scores = np.concatenate([best_scores, scores.astype(np.float32, copy=False)])
+                    if len(best_ids) > top_k:
+                        # Ties go to the lower id, so the result does not depend on chunking.
+                        keep = np.lexsort((best_ids, -best_scores))[:top_k]
+                        best_ids, best_scores = best_ids[keep], best_scores[keep]
+            if not len(best_ids):
+                return []
+            order = np.lexsort((best_ids, -best_scores))
+            best_ids, best_scores = best_ids[order], best_scores[order]
+            placeholders = ",".join("?" * len(best_ids))
+            rows = {
+                row[0]: row[1:]
+                for row in db.execute(
+                    f"SELECT id, session_id, text, meta, dim, vec FROM documents WHERE id IN ({placeholders})",
+                    [int(doc_id) for doc_id in best_ids],
+                )
+            }
+        finally:
+            db.execute("COMMIT")
+        results: List[Tuple[float, Dict[str, Any]]] = []
+        for doc_id, score in zip(best_ids, best_scores):
+            session_id, text, meta, dim, blob = rows[int(doc_id)]
+            item = {
+                "session_id": session_id,
+                "text": text,
+                "meta": json.loads(meta),
+                "embedding": decode_vector(blob, dim).tolist(),
+            }
+            results.append((float(score), item))
+        return results
@@ -1,62 +1,469 @@
 import json
-import math
+import os
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from backend.services.embeddings import embed_texts, Vector
+from backend.storage.ann_index import get_backend
+from backend.storage.base import VectorStore
+from backend.storage.codec import decode_matrix, decode_payload, encode_matrix, encode_payload, vector_dtype
 
 STORE_DIR = Path(__file__).resolve().parent / "data"
 STORE_DIR.mkdir(parents=True, exist_ok=True)
+# Legacy format: one JSON list of {session_id, text, embedding, meta}.
 VECTOR_PATH = STORE_DIR / "vector_index.json"
+# Single-matrix format: contiguous float32 matrix + JSON sidecar.
+MATRIX_PATH = STORE_DIR / "vectors.f32"
+META_PATH = STORE_DIR / "vectors_meta.json"
+# Current format: append-only log of immutable segments, each a float32 matrix
+# (<name>.f32, L2-normalised rows) plus its sidecar (<name>.json). A segment is
+# published by atomically renaming its sidecar into place, so readers never see
+# a half-written segment and concurrent writers never touch each other's files.
+# VECTOR_DTYPE=float16|int8 stores the matrix compactly (sidecar "dtype"; float32
+# when absent) and SESSION_CODEC/SESSION_COMPRESSION apply to the sidecar.
+SEGMENT_DIR = STORE_DIR / "vector_segments"
 
+COMPACT_MIN_SEGMENTS = int(os.getenv("VECTOR_COMPACT_MIN_SEGMENTS", "8"))
+SMALL_SEGMENT_ROWS = int(os.getenv("VECTOR_SMALL_SEGMENT_ROWS", "1024"))
+# "exact" scores every row; "ivf" only scores rows in the nprobe nearest lists.
+SEARCH_MODE = os.getenv("VECTOR_SEARCH_MODE", "exact")
+FILTER_EXACT_MAX_ROWS = int(os.getenv("VECTOR_FILTER_EXACT_MAX_ROWS", "50000"))
+_COMPACT_LOCK_STALE_S = 600.0
 
-def _load_index() -> List[Dict[str, Any]]:
-    if not VECTOR_PATH.exists():
-        return []
+Segment = Tuple[str, Dict[str, Any], np.ndarray]
+
+# Guards the legacy migration and every change to the caches and counter below.
+_lock = threading.Lock()
+_compaction_running = threading.Event()
+# Segments are immutable once published, so they can be cached by name.
+_cache: Dict[str, Tuple[Dict[str, Any], np.ndarray]] = {}
+# Live segments under SMALL_SEGMENT_ROWS, counted from one listing and then
+# kept current by add_documents and compaction; None until first needed.
+_small_segments: Optional[int] = None
+# Per-segment inverted posting lists: field -> value -> sorted row indices.
+_postings_cache: Dict[str, Dict[str, Dict[Any, np.ndarray]]] = {}
+
+FILTER_FIELDS = ("session_id", "role", "model_id", "round", "point_id")
+
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _fit_dim(vectors: Sequence[Vector], dim: int) -> np.ndarray:
+    # Embeddings from different backends can differ in width (stub vs. HF);
+    # zero-pad or truncate so they share the index dimension, which matches
+    # the zip() truncation the old pure-Python cosine applied.
+    mat = np.zeros((len(vectors), dim), dtype=np.float32)
+    for i, vec in enumerate(vectors):
+        row = np.asarray(vec, dtype=np.float32)[:dim]
+        mat[i, : row.shape[0]] = row
+    return mat
+
+
+def _new_segment_name() -> str:
+    # Zero-padded timestamp first so lexical order is publication order.
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+
+def _publish_segment(mat: np.ndarray, meta: Dict[str, Any], name: Optional[str] = None) -> str:
+    """Write a segment and make it visible with an atomic rename of its sidecar."""
+    SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+    name = name or _new_segment_name()
+    matrix_path = SEGMENT_DIR / f"{name}.f32"
+    tmp_matrix = SEGMENT_DIR / f"{name}.f32.tmp"
+    dtype = vector_dtype()
+    if dtype != "float32":
+        meta = {**meta, "dtype": dtype}
+    with open(tmp_matrix, "wb") as fh:
+        fh.write(encode_matrix(mat, dtype))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_matrix, matrix_path)
+    tmp_meta = SEGMENT_DIR / f"{name}.json.tmp"
+    with open(tmp_meta, "wb") as fh:
+        fh.write(encode_payload(meta))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_meta, SEGMENT_DIR / f"{name}.json")
+    return name
+
+
+def _migrate_legacy_index() -> None:
+    """One-shot import of the JSON index or the single-matrix index as the first segment."""
+    if SEGMENT_DIR.exists():
+        return
+    with _lock:
+        if SEGMENT_DIR.exists():
+            return
+        if META_PATH.exists():
+            # The single-matrix files already use the segment layout.
+            meta = json.loads(META_PATH.read_text(encoding="utf-8"))
+            name = _new_segment_name()
+            SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+            if MATRIX_PATH.exists():
+                os.replace(MATRIX_PATH, SEGMENT_DIR / f"{name}.f32")
+            else:
+                (SEGMENT_DIR / f"{name}.f32").write_bytes(b"")
+            # A matrix cut short by an interrupted write would fail to map with
+            # the sidecar's shape; keep only the rows it fully holds.
+            row_bytes = int(meta.get("dim", 0)) * np.dtype(np.float32).itemsize
+            size = (SEGMENT_DIR / f"{name}.f32").stat().st_size
+            rows = size // row_bytes if row_bytes else 0
+            if rows < int(meta.get("count", 0)):
+                meta["count"] = rows
+                meta["items"] = meta.get("items", [])[:rows]
+                (SEGMENT_DIR / f"{name}.json").write_text(json.dumps(meta), encoding="utf-8")
+                META_PATH.unlink()
+            else:
+                os.replace(META_PATH, SEGMENT_DIR / f"{name}.json")
+            return
+        if not VECTOR_PATH.exists():
+            return
+        try:
+            legacy = json.loads(VECTOR_PATH.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            legacy = []
+        embeddings = [item.get("embedding") or [] for item in legacy]
+        dim = max((len(e) for e in embeddings), default=0)
+        items = [
+            {"session_id": item.get("session_id"), "text": item.get("text", ""), "meta": item.get("meta", {})}
+            for item in legacy
+        ]
+        _publish_segment(
+            _normalize_rows(_fit_dim(embeddings, dim)),
+            {"dim": dim, "count": len(items), "items": items},
+        )
+
+
+def _open_segment(name: str) -> Optional[Tuple[Dict[str, Any], np.ndarray]]:
+    with _lock:
+        cached = _cache.get(name)
+    if cached is not None:
+        return cached
     try:
-        return json.loads(VECTOR_PATH.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
+        meta = decode_payload((SEGMENT_DIR / f"{name}.json").read_bytes())
+    except (FileNotFoundError, ValueError):
+        # Removed by a concurrent compaction between listing and opening.
+        return None
+    dim, count = int(meta["dim"]), int(meta["count"])
+    if count == 0 or dim == 0:
+        matrix = np.zeros((0, dim), dtype=np.float32)
+    else:
+        dtype = meta.get("dtype", "float32")
+        path = SEGMENT_DIR / f"{name}.f32"
+        if dtype == "int8":
+            # Quantised rows are dequantised once; float32/float16 stay memory-mapped.
+            matrix = decode_matrix(np.memmap(path, dtype=np.uint8, mode="r"), count, dim, dtype)
+        else:
+            matrix = np.memmap(path, dtype=np.float16 if dtype == "float16" else np.float32, mode="r", shape=(count, dim))
+    with _lock:
+        # Another thread may have opened it meanwhile; keep a single copy.
+        return _cache.setdefault(name, (meta, matrix))
+
+
+def _live_segments() -> List[Segment]:
+    _migrate_legacy_index()
+    if not SEGMENT_DIR.exists():
         return []
+    names = sorted(p.name[: -len(".json")] for p in SEGMENT_DIR.glob("*.json"))
+    opened: List[Segment] = []
+    replaced = set()
+    for name in names:
+        seg = _open_segment(name)
+        if seg is None:
+            continue
+        opened.append((name, seg[0], seg[1]))
+        replaced.update(seg[0].get("replaces", []))
+    with _lock:
+        for stale in set(_cache) - set(names):
+            _cache.pop(stale, None)
+            _postings_cache.pop(stale, None)
+    # A merged segment supersedes its sources even if they are not deleted yet.
+    return [seg for seg in opened if seg[0] not in replaced]
+
+
+def _postings(name: str, meta: Dict[str, Any]) -> Dict[str, Dict[Any, np.ndarray]]:
+    with _lock:
+        cached = _postings_cache.get(name)
+    if cached is not None:
+        return cached
+    lists: Dict[str, Dict[Any, List[int]]] = {field: {} for field in FILTER_FIELDS}
+    for row, item in enumerate(meta["items"]):
+        item_meta = item.get("meta") or {}
+        for field in FILTER_FIELDS:
+            value = item.get(field) if field == "session_id" else item_meta.get(field)
+            if value is None:
+                continue
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, sort_keys=True)
+            lists[field].setdefault(value, []).append(row)
+    postings = {
+        field: {value: np.asarray(rows, dtype=np.int64) for value, rows in by_value.items()}
+        for field, by_value in lists.items()
+    }
+    with _lock:
+        return _postings_cache.setdefault(name, postings)
+
+
+def _union(arrays: List[np.ndarray]) -> np.ndarray:
+    if not arrays:
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate(arrays))
 
 
-def _save_index(items: List[Dict[str, Any]]) -> None:
-    VECTOR_PATH.write_text(json.dumps(items), encoding="utf-8")
+def _filter_rows(name: str, meta: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """Rows matching every filter (None when unfiltered).
 
+    Each of FILTER_FIELDS takes a value or a list/set of accepted values;
+    round_min / round_max bound the round inclusively.
+    """
+    if not filters:
+        return None
+    postings = _postings(name, meta)
+    rows: Optional[np.ndarray] = None
 
-def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
-    if na == 0 or nb == 0:
-        return 0.0
-    return dot / (na * nb)
+    def _narrow(matched: np.ndarray) -> None:
+        nonlocal rows
+        rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+
+    for field, wanted in filters.items():
+        if field in ("round_min", "round_max"):
+            continue
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field: {field}")
+        values = wanted if isinstance(wanted, (list, tuple, set, frozenset)) else [wanted]
+        _narrow(_union([postings[field][v] for v in values if v in postings[field]]))
+    lo, hi = filters.get("round_min"), filters.get("round_max")
+    if lo is not None or hi is not None:
+        _narrow(_union([
+            r for value, r in postings["round"].items()
+            if isinstance(value, (int, float))
+            and (lo is None or value >= lo)
+            and (hi is None or value <= hi)
+        ]))
+    return rows
+
+
+def _ivf_dir() -> Path:
+    return SEGMENT_DIR / "ivf"
+
+
+def _notify_ann(event: str, *args: Any) -> None:
+    # Keep a persisted IVF index current even when the caller searches exactly.
+    if _ivf_dir().exists() or SEARCH_MODE.lower() == "ivf":
+        getattr(get_backend("ivf", _ivf_dir()), event)(*args)
+
+
+def _try_lock_compaction() -> Optional[Path]:
+    SEGMENT_DIR.mkdir(parents=True, exist_ok=True)
+    lock_path = SEGMENT_DIR / ".compact.lock"
+    try:
+        if time.time() - lock_path.stat().st_mtime > _COMPACT_LOCK_STALE_S:
+            lock_path.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    os.close(fd)
+    return lock_path
+
+
+def _remove_segment_files(name: str) -> None:
+    for suffix in (".json", ".f32"):
+        try:
+            (SEGMENT_DIR / f"{name}{suffix}").unlink()
+        except FileNotFoundError:
+            pass
+
+
+def compact_segments(max_rows: Optional[int] = None) -> int:
+    """Merge small segments (per embedding width) into one; returns segments merged."""
+    max_rows = SMALL_SEGMENT_ROWS if max_rows is None else max_rows
+    lock_path = _try_lock_compaction()
+    if lock_path is None:
+        return 0
+    merged_total = 0
+    try:
+        all_names = {p.name[: -len(".json")] for p in SEGMENT_DIR.glob("*.json")}
+        live = _live_segments()
+        # Finish cleanup of sources left behind by an interrupted compaction.
+        for name in all_names - {seg[0] for seg in live}:
+            _remove_segment_files(name)
+
+        by_dim: Dict[int, List[Segment]] = {}
+        for seg in live:
+            if int(seg[1]["count"]) < max_rows:
+                by_dim.setdefault(int(seg[1]["dim"]), []).append(seg)
+        for dim, group in by_dim.items():
+            if len(group) < 2:
+                continue
+            matrix = np.concatenate([np.asarray(seg[2], dtype=np.float32).reshape(-1, dim) for seg in group])
+            items = [item for seg in group for item in seg[1]["items"]]
+            sources = [seg[0] for seg in group]
+            merged = _publish_segment(matrix, {"dim": dim, "count": len(items), "items": items, "replaces": sources})
+            _notify_ann("on_compact", merged, sources)
+            for name in sources:
+                _remove_segment_files(name)
+            merged_total += len(sources)
+        live = _live_segments()
+        _set_small_segments(sum(1 for seg in live if int(seg[1]["count"]) < SMALL_SEGMENT_ROWS))
+        # Retrain here rather than on the next search, which would only start it.
+        _notify_ann("maybe_train", live, False)
+    finally:
+        lock_path.unlink(missing_ok=True)
+    return merged_total
+
+
+def _set_small_segments(count: int) -> None:
+    global _small_segments
+    with _lock:
+        _small_segments = count
+
+
+def _count_published(rows: int) -> int:
+    """Count a segment published by add_documents; returns the small-segment total."""
+    global _small_segments
+    if _small_segments is None:
+        # The listing already includes the new segment.
+        live = _live_segments()
+        _set_small_segments(sum(1 for seg in live if int(seg[1]["count"]) < SMALL_SEGMENT_ROWS))
+        return _small_segments or 0
+    with _lock:
+        if rows < SMALL_SEGMENT_ROWS:
+            _small_segments += 1
+        return _small_segments
+
+
+def _maybe_schedule_compaction(small: int) -> None:
+    if small < COMPACT_MIN_SEGMENTS or _compaction_running.is_set():
+        return
+    _compaction_running.set()
+
+    def _run() -> None:
+        try:
+            compact_segments()
+        except Exception:
+            pass
+        finally:
+            _compaction_running.clear()
+
+    threading.Thread(target=_run, name="vector-compaction", daemon=True).start()
 
 
 def add_documents(session_id: str, docs: List[Dict[str, Any]]) -> None:
     """docs: list of {text: str, meta: {...}}"""
+    if not docs:
+        return
+    _migrate_legacy_index()
     texts = [d.get("text", "") for d in docs]
     embeddings = embed_texts(texts)
-    items = _load_index()
-    for doc, emb in zip(docs, embeddings):
-        items.append({
-            "session_id": session_id,
-            "text": doc.get("text", ""),
-            "embedding": emb,
-            "meta": doc.get("meta", {}),
-        })
-    _save_index(items)
-
-
-def search_similar(query: str, top_k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
-    index = _load_index()
-    if not index:
+    dim = max((len(e) for e in embeddings), default=0)
+    items = [{"session_id": session_id, "text": d.get("text", ""), "meta": d.get("meta", {})} for d in docs]
+    matrix = _normalize_rows(_fit_dim(embeddings, dim))
+    name = _publish_segment(matrix, {"dim": dim, "count": len(items), "items": items})
+    _notify_ann("on_publish", name, matrix)
+    _maybe_schedule_compaction(_count_published(len(items)))
+
+
+def search_similar(
+    query: str,
+    top_k: int = 5,
+    mode: Optional[str] = None,
+    nprobe: Optional[int] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[float, Dict[str, Any]]]:
+    """Top-k cosine search; mode "exact" scores every row, "ivf" probes nprobe lists.
+
+    filters (see _filter_rows) are resolved through posting lists before any
+    scoring, e.g. {"model_id": "ollama", "session_id": {...}, "round_min": 2}.
+    """
+    live = [seg for seg in _live_segments() if seg[2].shape[0] > 0]
+    segments: List[Segment] = []
+    allowed: List[Optional[np.ndarray]] = []
+    for seg in live:
+        rows = _filter_rows(seg[0], seg[1], filters)
+        if rows is not None and rows.size == 0:
+            continue
+        segments.append(seg)
+        allowed.append(rows)
+    if not segments or top_k <= 0:
         return []
     query_vecs = embed_texts([query])
-    qvec = query_vecs[0] if query_vecs else []
-    scored: List[Tuple[float, Dict[str, Any]]] = []
-    for item in index:
-        emb = item.get("embedding") or []
-        score = _cosine(qvec, emb)
-        scored.append((score, item))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return scored[:top_k]
+    raw_query = query_vecs[:1] or [[]]
+    qdim = max(len(raw_query[0]), 1)
+    filtered_rows = sum(r.size for r in allowed if r is not None)
+    if filters and filtered_rows <= FILTER_EXACT_MAX_ROWS:
+        # A selective filter leaves few enough rows to score them all exactly.
+        candidates: List[Optional[np.ndarray]] = [None] * len(segments)
+    else:
+        backend = get_backend(mode or SEARCH_MODE, _ivf_dir())
+        # The backend sees every live segment so IVF training is not skewed by the filter.
+        by_name = dict(zip(
+            (seg[0] for seg in live),
+            backend.candidates(live, _normalize_rows(_fit_dim(raw_query, qdim))[0], nprobe=nprobe),
+        ))
+        candidates = [by_name[seg[0]] for seg in segments]
+
+    score_parts: List[np.ndarray] = []
+    row_parts: List[np.ndarray] = []
+    for (_, _, matrix), rows, keep in zip(segments, candidates, allowed):
+        if rows is None:
+            rows = keep if keep is not None else np.arange(matrix.shape[0])
+        elif keep is not None:
+            rows = np.intersect1d(rows, keep, assume_unique=True)
+        qvec = _normalize_rows(_fit_dim(raw_query, matrix.shape[1]))[0]
+        score_parts.append(np.asarray(matrix[rows]) @ qvec if rows.size else np.zeros(0, dtype=np.float32))
+        row_parts.append(rows)
+    scores = np.concatenate(score_parts)
+    if scores.shape[0] == 0:
+        return []
+    seg_of_hit = np.repeat(np.arange(len(segments)), [part.shape[0] for part in score_parts])
+    row_of_hit = np.concatenate(row_parts)
+
+    k = min(top_k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    results: List[Tuple[float, Dict[str, Any]]] = []
+    for idx in top:
+        _, meta, matrix = segments[int(seg_of_hit[idx])]
+        row = int(row_of_hit[idx])
+        item = dict(meta["items"][row])
+        item["embedding"] = matrix[row].tolist()
+        results.append((float(scores[idx]), item))
+    return results
+
+
+def iter_documents() -> List[Tuple[Dict[str, Any], np.ndarray]]:
+    """Every live (item, normalised vector) pair, e.g. for exporting to another store."""
+    return [
+        (item, np.asarray(matrix[row]))
+        for _, meta, matrix in _live_segments()
+        for row, item in enumerate(meta["items"][: matrix.shape[0]])
+    ]
+
+
+class FileVectorStore(VectorStore):
+    """VectorStore over the segment files in SEGMENT_DIR (the functions above)."""
+
+    def add_documents(self, session_id: str, docs: List[Dict[str, Any]]) -> None:
+        add_documents(session_id, docs)
+
+    def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        return search_similar(query, top_k=top_k, mode=mode, nprobe=nprobe, filters=filters)
@@ -1,6 +1,44 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.services.backend_health import reset_breakers  # noqa: E402
+from backend.services.retry import reset_retry_budgets  # noqa: E402
+from backend.storage import simple_store, vector_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_circuit_breakers():
+    # Breakers are process-wide; one test's simulated outage must not leak.
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_retry_budgets():
+    reset_retry_budgets()
+    yield
+    reset_retry_budgets()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_storage(tmp_path, monkeypatch):
+    # Keep sessions and vectors written by tests out of backend/storage/data.
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    monkeypatch.setattr(simple_store, "STORE_DIR", data_dir)
+    monkeypatch.setattr(vector_store, "STORE_DIR", data_dir)
+    monkeypatch.setattr(vector_store, "VECTOR_PATH", data_dir / "vector_index.json")
+    monkeypatch.setattr(vector_store, "MATRIX_PATH", data_dir / "vectors.f32")
+    monkeypatch.setattr(vector_store, "META_PATH", data_dir / "vectors_meta.json")
+    monkeypatch.setattr(vector_store, "SEGMENT_DIR", data_dir / "vector_segments")
+    monkeypatch.setattr(vector_store, "_cache", {})
+    monkeypatch.setattr(vector_store, "_postings_cache", {})
+    monkeypatch.setattr(vector_store, "_small_segments", None)
+    return data_dir
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.services import aggregator
+from backend.services.aggregation_executor import AggregationTimeout, executor_stats, run_job, shutdown_executors
+from backend.services.iteration_controller import run_iterations
+
+STRUCTURED = [
+    {"model_id": "m1", "parsed": {"summary_points": [{"id": "p1", "text": "Cats are mammals"}]}},
+    {"model_id": "m2", "parsed": {"summary_points": [{"id": "p1", "text": "Cats are mammals"}]}},
+]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pools():
+    yield
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+async def test_async_report_matches_sync_report(monkeypatch, kind):
+    monkeypatch.setenv("AGGREGATION_EXECUTOR", kind)
+    monkeypatch.setenv("AGGREGATION_WORKERS", "1")
+    report = await aggregator.aggregate_structured_responses_async(STRUCTURED, timeout_s=60)
+    assert report == aggregator.aggregate_structured_responses(STRUCTURED)
+    assert report["confirmed"][0]["models"] == ["m1", "m2"]
+    assert executor_stats()["completed"] >= 2
+
+
+def _slow_cluster(points):
+    time.sleep(0.3)
+    return [[p["id"] for p in points]]
+
+
+@pytest.mark.asyncio
+async def test_loop_stays_responsive_and_jobs_time_out(monkeypatch):
+    monkeypatch.setenv("AGGREGATION_EXECUTOR", "thread")
+    monkeypatch.setattr(aggregator, "_cluster", _slow_cluster)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.ensure_future(ticker())
+    await aggregator.aggregate_structured_responses_async(STRUCTURED)
+    task.cancel()
+    assert ticks >= 10
+
+    with pytest.raises(AggregationTimeout):
+        await run_job(time.sleep, 1, timeout_s=0.05)
+
+    monkeypatch.setenv("AGGREGATION_EXECUTOR", "inline")
+    with pytest.raises(AggregationTimeout):
+        await run_job(time.sleep, 0.1, timeout_s=0.05)
+    monkeypatch.setenv("AGGREGATION_EXECUTOR", "thread")
+
+    monkeypatch.setenv("AGGREGATION_TIMEOUT_S", "0.05")
+    result = await run_iterations("q", ["mock"], max_rounds=2)
+    assert result["state"] == "aggregation_timeout"
+    assert [r["report"] for r in result["rounds"]] == [None]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.services import embeddings
+from backend.services.backend_health import CircuitBreaker, CircuitOpenError, get_breaker, health_snapshot
+from backend.services.embedding_cache import EmbeddingCache
+
+
+def _boom():
+    raise RuntimeError("down")
+
+
+def test_breaker_opens_then_probes_after_cooldown(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("backend.services.backend_health.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("hf", failure_threshold=2, cooldown_s=10.0)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(_boom)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+    clock[0] += 10.0
+    assert breaker.state == "half_open"
+    with pytest.raises(RuntimeError):
+        breaker.call(_boom)  # failed probe re-opens immediately
+    assert breaker.state == "open"
+
+    clock[0] += 10.0
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.snapshot()["state"] == "closed"
+    assert breaker.snapshot()["short_circuited"] == 1
+
+
+def test_embedding_outage_costs_threshold_calls(monkeypatch):
+    monkeypatch.setenv("CB_FAILURE_THRESHOLD", "2")
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache())
+    calls = []
+
+    def failing_hf(texts):
+        calls.append(texts)
+        raise RuntimeError("timeout")
+
+    monkeypatch.setattr(embeddings, "_hf_embed", failing_hf)
+    for i in range(5):
+        assert len(embeddings.embed_texts([f"text {i}"])[0]) == 16
+    assert len(calls) == 2
+    assert get_breaker("hf_embed").state == "open"
+    assert health_snapshot()["hf_embed"]["short_circuited"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_probe_is_released(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("backend.services.backend_health.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("ollama", failure_threshold=1, cooldown_s=10.0)
+    with pytest.raises(RuntimeError):
+        breaker.call(_boom)
+    clock[0] += 10.0
+
+    async def hang():
+        await asyncio.sleep(5)
+
+    probe = asyncio.ensure_future(breaker.acall(hang))
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitOpenError):
+        await breaker.acall(hang)  # only one probe at a time
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    # The cancelled probe counted as neither outcome; the next call probes.
+    assert breaker.state == "half_open" and breaker.snapshot()["calls"] == 1
+
+    async def ok():
+        return "ok"
+
+    assert await breaker.acall(ok) == "ok"
+    assert breaker.state == "closed"
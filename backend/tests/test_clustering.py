@@ -35,3 +35,25 @@ def test_clustering_pairs_grouped():
     # Ensure all points are assigned
     flat_ids = {pid for cluster in clusters for pid in cluster}
     assert flat_ids == {p["id"] for p in points}
+
+
+def test_cluster_methods_group_similar_vectors():
+    points = [{"id": pid} for pid in ("a", "b", "c", "d")]
+    embeddings = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [0.1, 0.9]]
+
+    for method in ("average", "components"):
+        clusters = cluster_points(points, embeddings, threshold=0.9, method=method)
+        assert clusters == [["a", "b"], ["c", "d"]]
+
+        # Reordering the input must not change which points end up together.
+        reordered = cluster_points(points[::-1], embeddings[::-1], threshold=0.9, method=method)
+        assert sorted(sorted(c) for c in reordered) == [["a", "b"], ["c", "d"]]
+
+
+def test_average_linkage_does_not_chain_like_components():
+    points = [{"id": pid} for pid in ("a", "b", "c")]
+    # a~b and b~c are close, a and c are not.
+    embeddings = [[1.0, 0.0], [0.8, 0.6], [0.28, 0.96]]
+
+    assert cluster_points(points, embeddings, threshold=0.75, method="components") == [["a", "b", "c"]]
+    assert len(cluster_points(points, embeddings, threshold=0.75, method="average")) == 2
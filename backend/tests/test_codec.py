@@ -0,0 +1,89 @@
+import importlib.util
+import json
+
+import numpy as np
+import pytest
+
+from backend.storage import codec, simple_store, vector_store
+from backend.storage.sqlite_store import SQLiteSessionStore, SQLiteVectorStore
+
+PAYLOAD = {"round": 2, "multi": {"responses": [{"model_id": "mock", "raw": "é" * 50, "parsed": None}]}, "score": 0.5}
+
+
+def _installed(*modules):
+    return all(importlib.util.find_spec(m) is not None for m in modules)
+
+
+@pytest.mark.parametrize("name,modules", [
+    ("json", ()),
+    ("json+zstd", ("zstandard",)),
+    ("msgpack", ("msgpack",)),
+    ("msgpack+zstd", ("msgpack", "zstandard")),
+    ("cbor", ("cbor2",)),
+    ("cbor+zstd", ("cbor2", "zstandard")),
+])
+def test_payload_round_trip(name, modules):
+    if not _installed(*modules):
+        pytest.skip(f"{modules} not installed")
+    encoded = codec.encode_payload(PAYLOAD, name)
+    assert codec.decode_payload(encoded) == PAYLOAD
+    assert codec.decode_payload(memoryview(encoded)) == PAYLOAD
+
+
+def test_plain_json_is_read_transparently():
+    assert codec.decode_payload(json.dumps(PAYLOAD)) == PAYLOAD
+    assert codec.decode_payload(json.dumps(PAYLOAD).encode()) == PAYLOAD
+
+
+def test_float32_decode_is_zero_copy_and_quantised_dtypes_are_close():
+    rng = np.random.default_rng(0)
+    mat = rng.normal(size=(5, 384)).astype(np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+
+    raw = codec.encode_matrix(mat)
+    decoded = codec.decode_matrix(raw, 5, 384)
+    assert np.shares_memory(decoded, np.frombuffer(raw, dtype=np.uint8))
+    assert np.array_equal(decoded, mat)
+
+    for dtype, size, tol in (("float16", 5 * 384 * 2, 1e-3), ("int8", 5 * 4 + 5 * 384, 1e-2)):
+        blob = codec.encode_matrix(mat, dtype)
+        assert len(blob) == size
+        assert np.abs(codec.decode_matrix(blob, 5, 384, dtype) - mat).max() < tol
+        assert np.allclose(codec.decode_vector(codec.encode_vector(mat[0], dtype), 384), mat[0], atol=tol)
+    # Vectors stored before VECTOR_DTYPE existed are plain float32 BLOBs.
+    assert np.array_equal(codec.decode_vector(mat[0].tobytes(), 384), mat[0])
+
+
+@pytest.mark.skipif(not _installed("msgpack"), reason="msgpack not installed")
+def test_binary_round_log(monkeypatch):
+    monkeypatch.setenv("SESSION_CODEC", "msgpack")
+    simple_store.save_iteration_session("s", {"session_id": "s", "rounds": [{"round": 1, "report": None}]})
+    simple_store.append_iteration_round("s", {"round": 1, "report": {"ok": True}})
+    assert simple_store.append_iteration_round("s", {"round": None, "report": None}) == 2
+    assert (simple_store.STORE_DIR / "s.rounds.bin").exists()
+    assert not (simple_store.STORE_DIR / "s.rounds.jsonl").exists()
+
+    # The session keeps its format after the setting is turned off again.
+    monkeypatch.delenv("SESSION_CODEC")
+    simple_store.append_iteration_round("s", {"round": 3, "report": None})
+    data = simple_store.load_structured_session("s")
+    assert [(r["round"], r["report"]) for r in data["rounds"]] == [(1, {"ok": True}), (2, None), (3, None)]
+    assert [r["round"] for r in simple_store.load_structured_session("s", latest_only=True)["rounds"]] == [3]
+
+
+def test_compact_vector_segments_and_sqlite_rows(monkeypatch, _isolated_storage):
+    monkeypatch.setenv("VECTOR_DTYPE", "float16")
+    vector_store.add_documents("s", [{"text": "alpha beta"}, {"text": "gamma delta"}])
+    seg = vector_store._live_segments()[0]
+    assert seg[1]["dtype"] == "float16" and seg[2].dtype == np.float16
+    assert vector_store.search_similar("alpha beta", top_k=1)[0][1]["text"] == "alpha beta"
+
+    monkeypatch.setenv("VECTOR_DTYPE", "int8")
+    if _installed("msgpack"):
+        monkeypatch.setenv("SESSION_CODEC", "msgpack")
+    db = str(_isolated_storage / "store.db")
+    SQLiteSessionStore(db).save_session("s", {"question": "q", "rounds": [PAYLOAD]})
+    assert SQLiteSessionStore(db).load_session("s")["rounds"] == [PAYLOAD]
+    docs = SQLiteVectorStore(db)
+    docs.add_documents("s", [{"text": "alpha beta"}, {"text": "gamma delta"}])
+    assert docs.search_similar("alpha beta", top_k=1)[0][1]["text"] == "alpha beta"
@@ -0,0 +1,77 @@
+import json
+
+import httpx
+
+from backend.services import embeddings, http_pool
+from backend.services.backend_health import get_breaker
+from backend.services.embedding_cache import EmbeddingCache
+from backend.services.rate_limit import RateLimiter
+
+
+def test_embed_texts_only_sends_cache_misses(tmp_path, monkeypatch):
+    cache = EmbeddingCache(path=tmp_path / "emb.sqlite")
+    monkeypatch.setattr(embeddings, "embedding_cache", cache)
+    sent = []
+
+    def fake_hf(texts):
+        texts = list(texts)
+        sent.append(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    monkeypatch.setattr(embeddings, "_hf_embed", fake_hf)
+
+    assert embeddings.embed_texts(["a", "bb", "a"]) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert sent == [["a", "bb"]]
+    assert embeddings.embed_texts(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert sent[-1] == ["ccc"]
+
+    # A fresh process-level cache is served from the SQLite tier.
+    reopened = EmbeddingCache(path=tmp_path / "emb.sqlite")
+    monkeypatch.setattr(embeddings, "embedding_cache", reopened)
+    assert embeddings.embed_texts(["a", "ccc"]) == [[1.0, 1.0], [3.0, 1.0]]
+    assert len(sent) == 2
+    assert reopened.stats() == {"entries": 2, "hits": 0, "disk_hits": 2, "misses": 0}
+
+
+def test_remote_embeddings_go_through_the_pool_and_rate_limiter(monkeypatch):
+    pool = http_pool.HttpPool(http2=False)
+    monkeypatch.setattr(http_pool, "_pool", pool)
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache())
+    monkeypatch.setattr(embeddings, "rate_limiter", RateLimiter())
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "test")
+    sent = []
+
+    def handler(request):
+        texts = json.loads(request.content)
+        sent.append(texts)
+        return httpx.Response(200, json=[[float(len(t)), 0.5] for t in texts])
+
+    monkeypatch.setattr(http_pool.httpx, "HTTPTransport", lambda **kwargs: httpx.MockTransport(handler))
+    assert embeddings.embed_texts(["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+    assert sent == [["a", "bb"]]
+    assert embeddings.rate_limiter.snapshot()["hf"]["calls"] == 1
+    assert get_breaker("hf_embed").snapshot()["failures"] == 0
+
+
+def test_embed_texts_falls_back_to_stub_without_caching(monkeypatch):
+    cache = EmbeddingCache()
+    monkeypatch.setattr(embeddings, "embedding_cache", cache)
+    monkeypatch.delenv("HUGGINGFACE_API_KEY", raising=False)
+
+    vecs = embeddings.embed_texts(["cats chase mice"])
+    assert len(vecs[0]) == 16
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_stats_are_exposed_on_health_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from backend.app.api import app
+
+    monkeypatch.setattr(embeddings, "embedding_cache", EmbeddingCache())
+    monkeypatch.setattr(embeddings, "_hf_embed", lambda texts: [[1.0, 0.0] for _ in texts])
+    embeddings.embed_texts(["a", "b"])
+    embeddings.embed_texts(["a"])
+    with TestClient(app) as client:
+        stats = client.get("/v1/health/embeddings").json()["cache"]
+    assert stats == {"entries": 2, "hits": 1, "disk_hits": 0, "misses": 2}
@@ -9,3 +9,32 @@ async def test_end_to_end_iteration_converges_or_stops():
     assert result["state"] in {"converged", "max_rounds_reached"}
     assert result["rounds"], "Rounds should not be empty"
     assert len(result["rounds"]) <= 3
+
+
+@pytest.mark.asyncio
+async def test_seed_round_is_aggregated_not_regenerated(monkeypatch):
+    from backend.services import iteration_controller
+    from backend.services.orchestrator import multi_model_query
+    from backend.storage.simple_store import load_iteration_session, save_structured_session
+
+    seed = await multi_model_query("Is X true or false?", ["mock", "mock"], structured=True)
+    save_structured_session("seeded", {
+        "session_id": "seeded",
+        "state": "running",
+        "rounds": [{"round": 1, "multi": seed, "report": None, "contradictions": 0, "agreement_score": None}],
+        "final_report": None,
+    })
+    calls = []
+
+    async def counting_query(*args, **kwargs):
+        calls.append(args)
+        return await multi_model_query(*args, **kwargs)
+
+    monkeypatch.setattr(iteration_controller, "multi_model_query", counting_query)
+    result = await run_iterations("Is X true or false?", ["mock", "mock"], max_rounds=2, session_id="seeded")
+
+    rounds = load_iteration_session("seeded")["rounds"]
+    assert [r["round"] for r in rounds] == list(range(1, len(rounds) + 1))
+    assert rounds[0]["multi"] == seed and rounds[0]["report"] is not None
+    assert len(calls) == len(rounds) - 1
+    assert result["state"] in {"converged", "max_rounds_reached"}
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.api import app
+from backend.services import events
+from backend.services.iteration_controller import run_iterations
+
+
+@pytest.mark.asyncio
+async def test_subscriber_gets_replay_then_live_events_until_finalized():
+    bus = events.EventBus()
+    bus.publish("s1", events.ROUND_STARTED, {"round": 1})
+    received = []
+
+    async def consume():
+        async for event in bus.subscribe("s1"):
+            received.append(event["type"])
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    bus.publish("s1", events.ROUND_AGGREGATED, {"round": 1})
+    bus.publish("s1", events.FINALIZED, {"state": "converged"})
+    await asyncio.wait_for(task, timeout=1)
+    assert received == [events.ROUND_STARTED, events.ROUND_AGGREGATED, events.FINALIZED]
+
+
+@pytest.mark.asyncio
+async def test_run_iterations_publishes_progress(monkeypatch):
+    bus = events.EventBus()
+    monkeypatch.setattr("backend.services.iteration_controller.event_bus", bus)
+    monkeypatch.setattr("backend.services.orchestrator.event_bus", bus)
+
+    result = await run_iterations("Is X true or false?", ["mock", "mock"], max_rounds=1)
+    types = [e["type"] for e in bus.history(result["session_id"])]
+    assert types[0] == events.ROUND_STARTED
+    assert types.count(events.MODEL_RESPONSE) == 2
+    assert types[-2:] == [events.ROUND_AGGREGATED, events.FINALIZED]
+
+
+def test_sse_endpoint_streams_session_events(monkeypatch):
+    bus = events.EventBus()
+    monkeypatch.setattr("backend.app.api.event_bus", bus)
+    bus.publish("s-sse", events.ROUND_STARTED, {"round": 1})
+    bus.publish("s-sse", events.FINALIZED, {"state": "converged", "final_report": {}})
+
+    client = TestClient(app)
+    resp = client.get("/v1/session/s-sse/events", headers={"Last-Event-ID": "1"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert "event: finalized" in resp.text
+    assert "event: round_started" not in resp.text
+
+    assert client.get("/v1/session/unknown/events").status_code == 404
+
+
+def test_event_ids_keep_increasing_after_history_eviction():
+    bus = events.EventBus(max_sessions=1)
+    bus.publish("a", events.ROUND_STARTED, {"round": 1})
+    bus.publish("a", events.ROUND_STARTED, {"round": 2})
+    last_seen = bus.history("a")[-1]["id"]
+    bus.publish("b", events.ROUND_STARTED, {"round": 1})  # evicts "a"
+    assert bus.history("a") == []
+
+    bus.publish("a", events.FINALIZED, {"state": "converged"})
+    # A client reconnecting with its Last-Event-ID still gets the new event.
+    assert [e["type"] for e in bus.history("a", after_id=last_seen)] == [events.FINALIZED]
@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.services import http_pool
+from backend.services.http_retry import post_json
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused_per_host_and_counted(monkeypatch):
+    pool = http_pool.HttpPool(http2=False)
+    monkeypatch.setattr(http_pool, "_pool", pool)
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, json={"ok": True})
+
+    mock = httpx.MockTransport(handler)
+    monkeypatch.setattr(http_pool.httpx, "AsyncHTTPTransport", lambda **kwargs: mock)
+
+    for _ in range(3):
+        resp = await post_json("http://llm.local:11434/api/generate", {"x": 1})
+        assert resp.json() == {"ok": True}
+    assert pool.async_client("http://llm.local:11434/other") is pool.async_client("http://llm.local:11434/api")
+
+    stats = pool.stats()["hosts"]["http://llm.local:11434"]
+    assert stats["requests"] == 3
+    assert stats["clients_created"] == 1
+    assert stats["in_flight"] == 0
+    await pool.aclose()
+
+
+def test_async_clients_are_kept_per_event_loop(monkeypatch):
+    pool = http_pool.HttpPool(http2=False)
+    mock = httpx.MockTransport(lambda request: httpx.Response(200))
+    monkeypatch.setattr(http_pool.httpx, "AsyncHTTPTransport", lambda **kwargs: mock)
+
+    async def client():
+        return pool.async_client("http://llm.local:11434/api")
+
+    loop_a, loop_b = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        client_a = loop_a.run_until_complete(client())
+        client_b = loop_b.run_until_complete(client())
+        assert client_a is not client_b
+        assert loop_a.run_until_complete(client()) is client_a
+
+        loop_b.run_until_complete(pool.aclose())
+        assert client_b.is_closed
+        assert not client_a.is_closed
+        assert loop_a.run_until_complete(client()) is client_a
+
+        loop_a.run_until_complete(pool.aclose())
+        assert client_a.is_closed
+    finally:
+        loop_a.close()
+        loop_b.close()
+    assert pool.stats()["hosts"]["http://llm.local:11434"]["clients_created"] == 2
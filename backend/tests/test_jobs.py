@@ -0,0 +1,167 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.services import jobs
+from backend.services.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobRunner, QueueFull
+from backend.storage import simple_store
+
+
+def test_queue_transitions_and_recovery(_isolated_storage):
+    queue = JobQueue(str(_isolated_storage / "jobs.db"), max_queued=2)
+    first = queue.enqueue("s1", {"question": "q"})
+    queue.enqueue("s2", {"question": "q"})
+    with pytest.raises(QueueFull):
+        queue.enqueue("s3", {})
+
+    job = queue.claim()
+    assert (job["job_id"], job["state"], job["attempts"], job["payload"]) == (first, RUNNING, 1, {"question": "q"})
+    queue.release(first)
+    assert queue.get(first)["state"] == QUEUED and queue.get(first)["attempts"] == 0
+
+    # A process that dies leaves the job running; the next one requeues it
+    # until it has been tried max_attempts times.
+    queue.claim()
+    assert queue.recover(max_attempts=2) == []
+    assert queue.get(first)["state"] == QUEUED
+    queue.claim()
+    assert [j["job_id"] for j in queue.recover(max_attempts=2)] == [first]
+    assert queue.get(first)["state"] == FAILED
+    assert queue.counts() == {QUEUED: 1, FAILED: 1}
+
+
+@pytest.mark.asyncio
+async def test_runner_bounds_concurrency_and_requeues_on_stop():
+    running = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def handler(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await release.wait()
+        finally:
+            running -= 1
+
+    runner = JobRunner(handler)
+    await runner.start(workers=2)
+    ids = [await runner.submit(f"s{i}", {}) for i in range(3)]
+    await asyncio.sleep(0.1)
+    assert peak == 2 and runner.queue.counts() == {RUNNING: 2, QUEUED: 1}
+
+    await runner.stop()
+    assert runner.queue.counts() == {QUEUED: 3}
+
+    release.set()
+    await runner.start(workers=2)
+    for _ in range(100):
+        if runner.queue.counts() == {DONE: 3}:
+            break
+        await asyncio.sleep(0.02)
+    await runner.stop()
+    assert all(runner.queue.get(job_id)["attempts"] == 1 for job_id in ids)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_session_resumes_from_persisted_round(monkeypatch):
+    calls = []
+
+    async def no_models(*args, **kwargs):
+        calls.append(args)
+        raise AssertionError("round 1 is already persisted")
+
+    monkeypatch.setattr("backend.services.iteration_controller.multi_model_query", no_models)
+    round_one = {"responses": [{"model_id": "mock", "parsed": {"summary_points": [{"id": "p1", "text": "x"}]}}]}
+    simple_store.save_iteration_session("s", {
+        "session_id": "s", "question": "q", "state": "running",
+        "rounds": [{"round": 1, "multi": round_one, "report": None}],
+    })
+    runner = JobRunner()
+    job_id = runner.queue.enqueue("s", {"question": "q", "models": ["mock"], "max_rounds": 1})
+    runner.queue.claim()  # left running by a crashed process
+
+    await runner.start(workers=1)
+    for _ in range(100):
+        if runner.queue.get(job_id)["state"] not in (QUEUED, RUNNING):
+            break
+        await asyncio.sleep(0.02)
+    await runner.stop()
+    assert runner.queue.get(job_id)["state"] == DONE and not calls
+    session = simple_store.load_structured_session("s")
+    assert session["state"] == "max_rounds_reached" and session["rounds"][0]["report"] is not None
+
+
+def test_query_endpoint_enqueues_iterations(monkeypatch):
+    from backend.app.api import app
+
+    monkeypatch.setattr(jobs, "job_runner", JobRunner())
+    monkeypatch.setattr("backend.app.api.job_runner", jobs.job_runner)
+    with TestClient(app) as client:
+        body = client.post("/v1/query", json={"question": "q", "models": ["mock"], "max_rounds": 1}).json()
+        deadline = time.time() + 5
+        while client.get(f"/v1/jobs/{body['job_id']}").json()["state"] != DONE and time.time() < deadline:
+            time.sleep(0.02)
+        assert client.get(f"/v1/jobs/{body['job_id']}").json()["state"] == DONE
+        assert client.get("/v1/jobs").json()["counts"] == {DONE: 1}
+        assert client.get(f"/v1/session/{body['session_id']}").json()["state"] == "max_rounds_reached"
+
+
+def test_query_fails_session_when_enqueue_is_rejected(monkeypatch):
+    from backend.app.api import app
+
+    runner = JobRunner()
+    monkeypatch.setattr("backend.app.api.job_runner", runner)
+    saved = {}
+
+    async def full(session_id, payload):
+        saved["session_id"] = session_id
+        raise QueueFull("filled by a concurrent request")
+
+    monkeypatch.setattr(runner, "submit", full)
+    with TestClient(app) as client:
+        resp = client.post("/v1/query", json={"question": "q", "models": ["mock"], "max_rounds": 1})
+        assert resp.status_code == 503
+        assert client.get(f"/v1/session/{saved['session_id']}").json()["state"] == FAILED
+
+
+def test_processes_sharing_the_queue_never_claim_a_job_twice(_isolated_storage):
+    path = str(_isolated_storage / "jobs.db")
+    queues = [JobQueue(path, max_queued=1000) for _ in range(4)]
+    ids = {queues[0].enqueue(f"s{i}", {}) for i in range(200)}
+    claimed = []
+
+    def drain(queue):
+        while (job := queue.claim()) is not None:
+            claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=drain, args=(q,)) for q in queues]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_recover_leaves_jobs_of_live_processes_running(_isolated_storage):
+    queue = JobQueue(str(_isolated_storage / "jobs.db"))
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    owners = {"live": os.getppid(), "dead": dead.pid}
+    for name, pid in owners.items():
+        job_id = queue.enqueue(name, {})
+        queue.claim()
+        with queue._db:
+            queue._db.execute("UPDATE jobs SET owner = ? WHERE job_id = ?", (f"{socket.gethostname()}:{pid}", job_id))
+        owners[name] = job_id
+    assert queue.recover(max_attempts=3) == []
+    assert queue.get(owners["live"])["state"] == RUNNING
+    assert queue.get(owners["dead"])["state"] == QUEUED
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from backend.llm.registry import ModelRegistry
+
+
+def test_adapters_are_built_once_per_configuration():
+    registry = ModelRegistry()
+    assert registry.get("mock") is registry.get("mock-2")
+    assert registry.warm_up(["mock", ""]) == {"mock": "ready"}
+    mock_state = next(m for m in registry.snapshot() if m["id"] == "mock")
+    assert mock_state["status"] == "available"
+    assert mock_state["instances"] == ["mock"]
+
+
+@pytest.mark.asyncio
+async def test_slot_bounds_backend_concurrency(monkeypatch):
+    monkeypatch.setenv("MODEL_CONCURRENCY_MOCK", "2")
+    registry = ModelRegistry()
+    peak = 0
+    observed_queue = []
+
+    async def call():
+        nonlocal peak
+        async with registry.slot("mock"):
+            state = next(m for m in registry.snapshot() if m["id"] == "mock")
+            peak = max(peak, state["in_flight"])
+            observed_queue.append(state["queue_depth"])
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(call() for _ in range(5)))
+    assert peak == 2
+    assert max(observed_queue) >= 1
+    final = next(m for m in registry.snapshot() if m["id"] == "mock")
+    assert final["in_flight"] == 0 and final["queue_depth"] == 0 and final["calls"] == 5
@@ -0,0 +1,91 @@
+import pytest
+
+from backend.services import nli
+from backend.services.aggregator import aggregate_structured_responses
+from backend.services.judgement_cache import JudgementCache, pair_key
+
+
+def test_pair_judged_once_per_aggregation(monkeypatch):
+    monkeypatch.setattr(nli, "judgement_cache", JudgementCache())
+    calls = []
+
+    def fake_hf(a, b):
+        calls.append((a, b))
+        return "entailment"
+
+    monkeypatch.setattr(nli, "_hf_nli", fake_hf)
+    structured = [
+        {"model_id": "m1", "parsed": {"summary_points": [{"id": "p1", "text": "Cats are mammals"}]}},
+        {"model_id": "m2", "parsed": {"summary_points": [{"id": "p1", "text": "Cats are mammals"}]}},
+    ]
+
+    report = aggregate_structured_responses(structured)
+    assert report["nli"] and report["cross_eval"]
+    assert len(calls) == 1
+
+    aggregate_structured_responses(structured)
+    assert len(calls) == 1
+
+
+def test_disk_tier_only_keeps_persisted_judgements(tmp_path):
+    path = tmp_path / "nli.sqlite"
+    cache = JudgementCache(max_entries=1, path=path)
+    remote, heuristic = pair_key("a", "b"), pair_key("b", "a")
+    cache.put(remote, "contradiction", persist=True)
+    cache.put(heuristic, "neutral", persist=False)
+
+    reopened = JudgementCache(path=path)
+    assert reopened.get(remote) == "contradiction"
+    assert reopened.get(heuristic) is None
+    assert reopened.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_nli_batch_sends_batches_and_falls_back_per_failed_batch(monkeypatch):
+    monkeypatch.setattr(nli, "judgement_cache", JudgementCache())
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "test")
+    monkeypatch.setenv("NLI_BATCH_SIZE", "4")
+    batches = []
+
+    async def fake_batch(client, pairs):
+        batches.append(list(pairs))
+        if any(a == "fail" for a, _ in pairs):
+            raise RuntimeError("boom")
+        return ["entailment"] * len(pairs)
+
+    monkeypatch.setattr(nli, "_hf_nli_batch", fake_batch)
+    pairs = [(f"a{i}", f"b{i}") for i in range(8)] + [("a0", "b0"), ("fail", "not fail")]
+
+    labels = await nli.nli_batch(pairs)
+    assert len(batches) == 3  # 9 unique pairs in batches of 4
+    assert labels[:9] == ["entailment"] * 9
+    assert labels[9] == "contradiction"  # heuristic fallback for the failed batch
+    assert nli.simple_nli("a3", "b3") == "entailment"
+    assert len(batches) == 3
+
+
+def test_heuristic_fallback_expires_and_remote_is_asked_again(monkeypatch):
+    monkeypatch.setattr(nli, "judgement_cache", JudgementCache())
+    monkeypatch.setenv("NLI_FALLBACK_TTL_S", "10")
+    clock = [100.0]
+    monkeypatch.setattr("backend.services.judgement_cache.time.monotonic", lambda: clock[0])
+    calls = []
+
+    def flaky_hf(a, b):
+        calls.append((a, b))
+        if len(calls) == 1:
+            raise RuntimeError("down")
+        return "neutral"
+
+    monkeypatch.setattr(nli, "_hf_nli", flaky_hf)
+    assert nli.simple_nli("it is up", "it is down") == "contradiction"  # heuristic
+    assert nli.simple_nli("it is up", "it is down") == "contradiction"
+    assert len(calls) == 1
+
+    clock[0] += 10
+    assert nli.simple_nli("it is up", "it is down") == "neutral"
+    assert len(calls) == 2
+    nli.remember_judgements([("it is up", "it is down")], ["neutral"])
+    clock[0] += 10
+    assert nli.simple_nli("it is up", "it is down") == "neutral"
+    assert len(calls) == 2
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from backend.prompt.registry import CompiledPrompt, PromptRegistry
+from backend.services import orchestrator
+
+YAML = """\
+- id: answerer_v1
+  version: v1
+  template: |
+    Q: <USER_QUESTION>. Context: <CONTEXT_HISTORY>. Keep <OTHER>.
+"""
+
+
+def test_loads_once_and_reloads_on_mtime_change(tmp_path):
+    path = tmp_path / "prompt_registry.yaml"
+    path.write_text(YAML, encoding="utf-8")
+    registry = PromptRegistry(path)
+    for _ in range(5):
+        assert registry.get("answerer_v1", "v1") is not None
+    assert registry.loads == 1
+    assert registry.get("answerer_v1", "v2") is None
+
+    path.write_text(YAML.replace("Q:", "Question:"), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert registry.get("answerer_v1").template.startswith("Question:")
+    assert registry.loads == 2
+
+    path.unlink()
+    assert registry.get("answerer_v1") is None
+
+
+def test_render_is_single_pass_with_precomputed_hash():
+    template = "Q: <USER_QUESTION>. Context: <CONTEXT_HISTORY>. Keep <OTHER>.\n"
+    compiled = CompiledPrompt("answerer_v1", "v1", template)
+    assert compiled.placeholders == ["USER_QUESTION", "CONTEXT_HISTORY", "OTHER"]
+    assert compiled.sha256 == hashlib.sha256(template.encode()).hexdigest()
+    # A question that itself contains a placeholder is not substituted again.
+    rendered = compiled.render(USER_QUESTION="why <CONTEXT_HISTORY>?", CONTEXT_HISTORY="")
+    assert rendered == "Q: why <CONTEXT_HISTORY>?. Context: . Keep <OTHER>.\n"
+
+
+def test_orchestrator_renders_from_registry():
+    rendered, prompt_hash = orchestrator._render_prompt("answerer_v1", "v1", "What is 2+2?")
+    assert "What is 2+2?" in rendered and "<USER_QUESTION>" not in rendered
+    assert prompt_hash is not None
+    assert orchestrator._render_prompt("missing", "v1", "q") == ("q", None)
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.services.rate_limit import Limiter, RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_calls_after_the_burst():
+    limiter = Limiter("hf", rate=50, burst=2)
+    t0 = time.monotonic()
+    for _ in range(6):
+        await limiter.acquire()
+        limiter.release()
+    # Two calls ride the burst, the other four wait 20 ms each.
+    assert time.monotonic() - t0 >= 0.07
+    snap = limiter.snapshot()
+    assert snap["calls"] == 6 and snap["max_wait_s"] > 0 and snap["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_in_flight_cap_is_shared_by_threads_and_coroutines():
+    limiter = Limiter("hf", max_in_flight=2)
+    peak = 0
+    active = 0
+    lock = threading.Lock()
+
+    def enter():
+        nonlocal peak, active
+        with lock:
+            active += 1
+            peak = max(peak, active)
+
+    def leave():
+        nonlocal active
+        with lock:
+            active -= 1
+
+    def sync_call():
+        limiter.acquire_sync()
+        enter()
+        time.sleep(0.02)
+        leave()
+        limiter.release()
+
+    async def async_call():
+        await limiter.acquire()
+        enter()
+        await asyncio.sleep(0.02)
+        leave()
+        limiter.release()
+
+    await asyncio.gather(*(async_call() for _ in range(4)), *(asyncio.to_thread(sync_call) for _ in range(4)))
+    assert peak == 2
+    assert limiter.snapshot()["calls"] == 8 and limiter.snapshot()["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_passes_its_slot_on():
+    limiter = Limiter("ollama", max_in_flight=1)
+    await limiter.acquire()
+    first = asyncio.ensure_future(limiter.acquire())
+    second = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()  # wakes ``first`` ...
+    first.cancel()  # ... which leaves before running
+    await asyncio.wait_for(second, timeout=1)
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_backend_and_model_limits_from_env(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_HF_MAX_IN_FLIGHT", "3")
+    monkeypatch.setenv("RATE_LIMIT_HF_FACEBOOK_BART_LARGE_MNLI_MAX_IN_FLIGHT", "1")
+    limits = RateLimiter()
+    async with limits.limit("hf", "facebook/bart-large-mnli"):
+        snap = limits.snapshot()
+        assert snap["hf"]["in_flight"] == 1 and snap["hf"]["max_in_flight"] == 3
+        assert snap["hf:facebook/bart-large-mnli"]["max_in_flight"] == 1
+        with limits.limit_sync("hf", "other-model"):
+            assert limits.snapshot()["hf"]["in_flight"] == 2
+    assert "hf:other-model" not in limits.snapshot()
+    assert limits.snapshot()["hf"]["in_flight"] == 0
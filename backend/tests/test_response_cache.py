@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from backend.llm.client import LLMClient
+from backend.services import orchestrator
+from backend.services.orchestrator import multi_model_query
+from backend.services.response_cache import ResponseCache, response_key
+
+ANSWER = json.dumps({
+    "summary_points": [{"id": "p1", "text": "cached", "confidence": "high"}],
+    "detailed_explanation": "x",
+    "evidence": [],
+    "reproducible_example": "",
+})
+
+
+class _SlowAdapter(LLMClient):
+    model_id = "slow-model"
+
+    def __init__(self, output=ANSWER):
+        self.calls = 0
+        self.output = output
+
+    async def generate(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.output
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_RESPONSE_CACHE", "1")
+    cache = ResponseCache(max_entries=8, ttl_s=60, path=tmp_path / "responses.db")
+    monkeypatch.setattr(orchestrator, "response_cache", cache)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_backend_call(monkeypatch, cache):
+    adapter = _SlowAdapter()
+    monkeypatch.setattr(orchestrator, "_build_client", lambda model_id: adapter)
+
+    result = await multi_model_query("q", ["mock", "mock", "mock"], structured=True)
+    assert adapter.calls == 1
+    assert sorted(r["meta"]["cache"] for r in result["responses"]) == ["coalesced", "coalesced", "miss"]
+    assert all(r["parsed"] for r in result["responses"])
+
+    again = await multi_model_query("q", ["mock"], structured=True)
+    assert again["responses"][0]["meta"]["cache"] == "hit" and adapter.calls == 1
+
+    bypassed = await multi_model_query("q", ["mock"], structured=True, cache=False)
+    assert "cache" not in bypassed["responses"][0]["meta"] and adapter.calls == 2
+
+    await multi_model_query("another question", ["mock"], structured=True)
+    assert adapter.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_error_payloads_are_not_cached(monkeypatch, cache):
+    error = json.dumps({"summary_points": [{"id": "error", "text": "Error: down", "confidence": "low"}]})
+    adapter = _SlowAdapter(error)
+    monkeypatch.setattr(orchestrator, "_build_client", lambda model_id: adapter)
+    await multi_model_query("q", ["mock"], structured=True)
+    await multi_model_query("q", ["mock"], structured=True)
+    assert adapter.calls == 2
+
+
+def test_ttl_lru_and_disk_tier(tmp_path, monkeypatch):
+    path = tmp_path / "responses.db"
+    cache = ResponseCache(max_entries=2, ttl_s=60, path=path)
+    keys = [response_key("m", "h", f"prompt {i}") for i in range(3)]
+    assert len(set(keys)) == 3 and response_key("m", "h", "p", {"t": 1}) != response_key("m", "h", "p")
+    for i, key in enumerate(keys):
+        cache.put(key, {"raw": str(i)})
+    assert cache.stats()["entries"] == 2
+    # Evicted from memory, still on disk; a fresh process reads it back.
+    assert ResponseCache(path=path).get(keys[0]) == {"raw": "0"}
+    assert cache.get(keys[0]) == {"raw": "0"} and cache.disk_hits == 1
+
+    now = [1000.0]
+    monkeypatch.setattr("backend.services.response_cache.time.time", lambda: now[0])
+    cache.put(keys[1], {"raw": "1"})
+    now[0] += 61
+    assert cache.get(keys[1]) is None
+    assert ResponseCache(path=path).get(keys[1]) is None
+
+
+@pytest.mark.asyncio
+async def test_shared_call_is_cancelled_only_when_every_waiter_leaves():
+    cache = ResponseCache()
+    started = asyncio.Event()
+    cancelled = []
+
+    async def call():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return {"raw": "never"}
+
+    first = asyncio.ensure_future(cache.get_or_call("k", call))
+    await started.wait()
+    second = asyncio.ensure_future(cache.get_or_call("k", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled and cache.stats()["in_flight"] == 1
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled == [True] and cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_used_off_the_event_loop(tmp_path):
+    cache = ResponseCache(path=tmp_path / "responses.sqlite")
+    loop_thread = threading.get_ident()
+    disk_threads = []
+    for name in ("_disk_lookup", "_disk_put"):
+        real = getattr(cache, name)
+
+        def traced(*args, _real=real):
+            disk_threads.append(threading.get_ident())
+            return _real(*args)
+
+        setattr(cache, name, traced)
+
+    async def call():
+        return {"text": "x"}
+
+    assert await cache.get_or_call("k", call) == ({"text": "x"}, "miss")
+    cache._mem.clear()  # as in a new process: only the disk tier has it
+    assert await cache.get_or_call("k", call) == ({"text": "x"}, "disk")
+    # Lookup + store for the miss, lookup for the disk hit; none on the loop.
+    assert len(disk_threads) == 3 and loop_thread not in disk_threads
@@ -0,0 +1,83 @@
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from backend.services import http_pool
+from backend.services.http_retry import post_json
+from backend.services.retry import decorrelated_jitter, deadline_after, get_retry_budget, parse_retry_after
+
+URL = "http://llm.local:11434/api/generate"
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """Queue of responses served in order; the last one repeats."""
+    pool = http_pool.HttpPool(http2=False)
+    monkeypatch.setattr(http_pool, "_pool", pool)
+    queue = []
+    seen = []
+
+    def handler(request):
+        seen.append(request.extensions["timeout"]["read"])
+        status, headers = queue.pop(0) if len(queue) > 1 else queue[0]
+        return httpx.Response(status, headers=headers, json={"ok": status == 200})
+
+    monkeypatch.setattr(http_pool.httpx, "AsyncHTTPTransport", lambda **kwargs: httpx.MockTransport(handler))
+    yield queue, seen
+
+
+def test_retry_after_parsing_and_jitter_bounds():
+    assert parse_retry_after("2") == 2.0
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after("soon") is None and parse_retry_after(None) is None
+    for _ in range(100):
+        assert 0.5 <= decorrelated_jitter(1.0, 0.5, 2.0) <= 2.0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured(responses):
+    queue, seen = responses
+    queue.extend([(429, {"Retry-After": "0.2"}), (200, {})])
+    t0 = time.monotonic()
+    resp = await post_json(URL, {}, backoff=0.01, backend="ollama")
+    assert resp.status_code == 200 and len(seen) == 2
+    assert time.monotonic() - t0 >= 0.2
+    assert get_retry_budget("ollama").snapshot()["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_retries_and_client_errors_are_not_retried(responses, monkeypatch):
+    queue, seen = responses
+    monkeypatch.setenv("RETRY_BUDGET_RESERVE", "1")
+    queue.append((503, {}))
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await post_json(URL, {}, retries=3, backoff=0.001, backend="hf")
+    # One token in reserve: the first call retries once, the second not at all.
+    assert len(seen) == 3
+    assert get_retry_budget("hf").snapshot()["denied"] == 2
+
+    queue[:] = [(400, {})]
+    with pytest.raises(httpx.HTTPStatusError):
+        await post_json(URL, {}, backoff=0.001, backend="other")
+    assert len(seen) == 4
+
+
+@pytest.mark.asyncio
+async def test_attempt_timeouts_follow_the_callers_deadline(responses):
+    queue, seen = responses
+    queue.append((503, {"Retry-After": "1"}))
+    t0 = time.monotonic()
+    with deadline_after(0.5):
+        with pytest.raises(httpx.HTTPStatusError):
+            await post_json(URL, {}, timeout=120.0)
+    # The server asks for a wait that would overrun the deadline: no retry.
+    assert len(seen) == 1 and seen[0] <= 0.5
+    assert time.monotonic() - t0 < 0.5
+
+    with deadline_after(0):
+        with pytest.raises(httpx.TimeoutException):
+            await post_json(URL, {})
+    assert len(seen) == 1
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.storage import simple_store
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_are_not_lost():
+    await simple_store.save_iteration_session_async("s", {"session_id": "s", "rounds": []})
+    numbers = await asyncio.gather(*[
+        simple_store.append_iteration_round_async("s", {"round": None, "report": None, "multi": {"i": i}})
+        for i in range(20)
+    ])
+    rounds = (await simple_store.load_iteration_session_async("s"))["rounds"]
+    assert sorted(numbers) == list(range(1, 21))
+    assert sorted(r["round"] for r in rounds) == list(range(1, 21))
+
+
+@pytest.mark.asyncio
+async def test_finalize_keeps_rounds_appended_concurrently():
+    simple_store.save_iteration_session("s", {"session_id": "s", "rounds": []})
+    await asyncio.gather(
+        simple_store.append_iteration_round_async("s", {"round": 1, "report": {"ok": True}}),
+        simple_store.finalize_iteration_session_async("s", "converged", {"ok": True}),
+        simple_store.append_iteration_round_async("s", {"round": 2, "report": None}),
+    )
+    data = simple_store.load_iteration_session("s")
+    assert data["state"] == "converged"
+    assert [r["round"] for r in sorted(data["rounds"], key=lambda r: r["round"])] == [1, 2]
+
+
+def test_writes_are_atomic_and_leave_no_temp_files():
+    simple_store.save_structured_session("s", {"rounds": [{"round": 1}]})
+    simple_store.save_structured_session("s", {"rounds": [{"round": 1}, {"round": 2}]})
+    assert simple_store.load_structured_session("s") == {"rounds": [{"round": 1}, {"round": 2}]}
+    assert sorted(p.name for p in simple_store.STORE_DIR.iterdir()) == ["s.json", "s.rounds.jsonl"]
+
+
+def test_rounds_are_appended_to_the_log_not_rewritten():
+    simple_store.save_iteration_session("s", {"session_id": "s", "question": "q", "rounds": []})
+    header_before = (simple_store.STORE_DIR / "s.json").read_text()
+    simple_store.append_iteration_round("s", {"round": 1, "report": None})
+    simple_store.append_iteration_round("s", {"round": 1, "report": {"r": 1}})
+    simple_store.append_iteration_round("s", {"round": 2, "report": {"r": 2}})
+    assert (simple_store.STORE_DIR / "s.json").read_text() == header_before
+    assert len((simple_store.STORE_DIR / "s.rounds.jsonl").read_text().splitlines()) == 3
+
+    data = simple_store.load_structured_session("s")
+    assert [(r["round"], r["report"]) for r in data["rounds"]] == [(1, {"r": 1}), (2, {"r": 2})]
+    assert [r["round"] for r in simple_store.load_structured_session("s", from_round=2)["rounds"]] == [2]
+    latest = simple_store.load_structured_session("s", latest_only=True)
+    assert [r["round"] for r in latest["rounds"]] == [2]
+    assert latest["question"] == "q"
+
+
+def test_legacy_session_is_readable_and_migrated_on_append():
+    legacy = {"session_id": "old", "state": "running", "rounds": [{"round": 1, "report": None}]}
+    (simple_store.STORE_DIR / "old.json").write_text(json.dumps(legacy))
+    assert simple_store.load_structured_session("old") == legacy
+    assert simple_store.append_iteration_round("old", {"round": None, "report": None}) == 2
+    simple_store.finalize_iteration_session("old", "converged", {})
+    data = simple_store.load_structured_session("old")
+    assert [r["round"] for r in data["rounds"]] == [1, 2]
+    assert data["state"] == "converged"
+    assert "rounds" not in json.loads((simple_store.STORE_DIR / "old.json").read_text())
+
+
+def test_get_session_pages_through_rounds():
+    from fastapi.testclient import TestClient
+
+    from backend.app.api import app
+
+    simple_store.save_iteration_session("s", {"session_id": "s", "state": "converged", "final_report": {"ok": 1}, "rounds": [
+        {"round": n, "report": {"n": n}} for n in (1, 2, 3)
+    ]})
+    with TestClient(app) as client:
+        paged = client.get("/v1/session/s", params={"from_round": 2}).json()
+        latest = client.get("/v1/session/s", params={"latest": "true"}).json()
+    assert [r["round"] for r in paged["rounds"]] == [2, 3]
+    assert [r["round"] for r in latest["rounds"]] == [3]
+    assert latest["final_report"] == {"ok": 1}
+
+
+def test_rounds_without_an_int_number_are_numbered_or_rejected():
+    simple_store.save_structured_session("s", {"rounds": [{"round": 1}, {"round": None}, {"round": None}]})
+    assert [r["round"] for r in simple_store.load_structured_session("s", from_round=2)["rounds"]] == [2, 3]
+    with pytest.raises(ValueError):
+        simple_store.append_iteration_round("s", {"round": "4"})
+    with pytest.raises(ValueError):
+        simple_store.save_structured_session("t", {"rounds": [{"round": 1.5}]})
+    assert simple_store.append_iteration_round("s", {"round": None}) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+async def test_followup_during_iteration_keeps_its_round(monkeypatch, _isolated_storage, backend):
+    from backend.app.api import FollowupRequest, post_followup
+    from backend.services.iteration_controller import run_iterations
+
+    monkeypatch.setenv("STORAGE_BACKEND", backend)
+    monkeypatch.setenv("STORAGE_SQLITE_PATH", str(_isolated_storage / "store.db"))
+    followup_saved = asyncio.Event()
+
+    def _multi(tag):
+        return {"responses": [{"model_id": "mock", "parsed": {"summary_points": [{"id": "p1", "text": tag}]}}]}
+
+    async def iteration_query(*args, **kwargs):
+        await followup_saved.wait()  # the follow-up lands while this round is in flight
+        return _multi("iteration")
+
+    async def followup_query(*args, **kwargs):
+        return _multi("followup")
+
+    monkeypatch.setattr("backend.services.iteration_controller.multi_model_query", iteration_query)
+    monkeypatch.setattr("backend.app.api.multi_model_query", followup_query)
+    from backend.storage.base import get_session_store
+
+    await get_session_store().save_session_async("s", {"session_id": "s", "question": "q", "rounds": []})
+
+    async def followup():
+        await asyncio.sleep(0.01)
+        result = await post_followup(FollowupRequest(session_id="s", followup_question="f", models=["mock"]))
+        followup_saved.set()
+        return result
+
+    result, follow = await asyncio.gather(run_iterations("q", ["mock"], max_rounds=1, session_id="s"), followup())
+    rounds = {r["round"]: r for r in result["rounds"]}
+    assert follow["round"] == 1 and set(rounds) == {1, 2}
+    assert rounds[1]["multi"]["responses"][0]["parsed"]["summary_points"][0]["text"] == "followup"
+    assert rounds[2]["report"] is not None
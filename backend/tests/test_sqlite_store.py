@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.storage import base, simple_store, vector_store
+from backend.storage.migrate import migrate_data_dir
+from backend.storage.simple_store import FileSessionStore
+from backend.storage.sqlite_store import SQLiteSessionStore, SQLiteVectorStore
+
+
+def _round(number, models, report=None):
+    return {
+        "round": number,
+        "multi": {"responses": [{"model_id": m, "parsed": {"summary_points": []}} for m in models]},
+        "report": report,
+    }
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, _isolated_storage):
+    if request.param == "file":
+        return FileSessionStore()
+    return SQLiteSessionStore(str(_isolated_storage / "store.db"))
+
+
+def test_session_store_contract(store):
+    store.save_session("a", {"session_id": "a", "question": "q", "state": "running", "rounds": [_round(1, ["mock"])]})
+    store.append_round("a", _round(1, ["mock"], report={"ok": 1}))
+    assert store.append_round("a", _round(None, ["ollama"])) == 2
+    store.finalize_session("a", "converged", {"ok": 1})
+
+    data = store.load_session("a")
+    assert data["state"] == "converged" and data["question"] == "q"
+    assert [(r["round"], r["report"]) for r in data["rounds"]] == [(1, {"ok": 1}), (2, None)]
+    assert [r["round"] for r in store.load_session("a", latest_only=True)["rounds"]] == [2]
+    assert [r["round"] for r in store.load_session("a", from_round=2)["rounds"]] == [2]
+    assert store.load_session("missing") is None
+
+    store.save_session("b", {"session_id": "b", "state": "running", "rounds": [_round(1, ["mock"])]})
+    assert [s["session_id"] for s in store.list_sessions(state="running")] == ["b"]
+    assert [s["session_id"] for s in store.list_sessions(model="ollama")] == ["a"]
+    assert store.list_sessions(since=time.time() + 60) == []
+
+
+def test_sqlite_lookups_use_indexes(_isolated_storage):
+    store = SQLiteSessionStore(str(_isolated_storage / "store.db"))
+    plans = [
+        store._db.execute("EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE state = ?", ("running",)).fetchall(),
+        store._db.execute(
+            "EXPLAIN QUERY PLAN SELECT session_id FROM responses WHERE model_id = ? AND created_at >= ?", ("m", 0)
+        ).fetchall(),
+    ]
+    for plan in plans:
+        assert any("USING INDEX" in str(row) or "USING COVERING INDEX" in str(row) for row in plan), plan
+
+
+def test_sqlite_vector_store_filters_and_ranks(_isolated_storage):
+    store = SQLiteVectorStore(str(_isolated_storage / "store.db"))
+    store.add_documents("s1", [
+        {"text": "alpha beta", "meta": {"role": "summary_point", "model_id": "mock", "round": 1}},
+        {"text": "gamma delta", "meta": {"role": "summary_point", "model_id": "ollama", "round": 2}},
+    ])
+    hits = store.search_similar("alpha beta", top_k=2)
+    assert hits[0][1]["text"] == "alpha beta"
+    assert hits[0][0] == pytest.approx(1.0, abs=1e-5)
+    filtered = store.search_similar("alpha beta", filters={"model_id": "ollama", "round_min": 2})
+    assert [h[1]["text"] for h in filtered] == ["gamma delta"]
+
+
+
+def test_sqlite_vector_search_merges_chunks(monkeypatch, _isolated_storage):
+    store = SQLiteVectorStore(str(_isolated_storage / "store.db"))
+    # Fixed vectors with ties: rows 0/5/10 and 1/6 share a score.
+    angles = [0.1 * (i % 5) for i in range(11)]
+    vectors = np.array([[np.cos(a), np.sin(a)] for a in angles], dtype=np.float32)
+    store.insert(({"session_id": "s1", "text": f"doc {i}", "meta": {}}, vec) for i, vec in enumerate(vectors))
+    monkeypatch.setattr("backend.storage.sqlite_store.embed_texts", lambda texts: [[1.0, 0.0]])
+
+    whole = store.search_similar("q", top_k=4)
+    assert [h[1]["text"] for h in whole] == ["doc 0", "doc 5", "doc 10", "doc 1"]
+    for chunk_rows in ("1", "3", "4"):
+        monkeypatch.setenv("SQLITE_SEARCH_CHUNK_ROWS", chunk_rows)
+        chunked = store.search_similar("q", top_k=4)
+        assert [(round(s, 6), h["text"]) for s, h in chunked] == [(round(s, 6), h["text"]) for s, h in whole]
+
+
+def test_sqlite_vector_search_does_not_take_the_write_lock(_isolated_storage):
+    store = SQLiteVectorStore(str(_isolated_storage / "store.db"))
+    store.add_documents("s1", [{"text": "alpha beta", "meta": {}}])
+    hits = []
+    with store._lock:  # e.g. a session write in progress on the shared connection
+        worker = threading.Thread(target=lambda: hits.extend(store.search_similar("alpha beta", top_k=1)))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+    assert hits[0][1]["text"] == "alpha beta"
+
+
+def test_migration_imports_sessions_and_vectors(_isolated_storage):
+    simple_store.save_iteration_session("s1", {"session_id": "s1", "question": "q", "rounds": [_round(1, ["mock"])]})
+    vector_store.add_documents("s1", [{"text": "hello world", "meta": {"role": "question", "round": 1}}])
+    db = str(_isolated_storage / "store.db")
+
+    counts = migrate_data_dir(db)
+    assert counts == {"sessions": 1, "rounds": 1, "documents": 1}
+    assert SQLiteSessionStore(db).load_session("s1")["rounds"][0]["round"] == 1
+    assert SQLiteVectorStore(db).search_similar("hello world", top_k=1)[0][1]["session_id"] == "s1"
+    assert migrate_data_dir(db)["documents"] == 0  # not duplicated on re-run
+
+
+def test_migration_and_resaves_keep_original_timestamps(_isolated_storage):
+    simple_store.save_iteration_session("old", {"session_id": "old", "question": "q", "rounds": [_round(1, ["mock"])]})
+    hour_ago = time.time() - 3600
+    for path in simple_store.STORE_DIR.glob("old.*"):
+        os.utime(path, (hour_ago, hour_ago))
+    db = str(_isolated_storage / "store.db")
+    migrate_data_dir(db)
+    store = SQLiteSessionStore(db)
+    recent = time.time() - 60
+    assert store.list_sessions(model="mock", since=recent) == []
+    assert store.list_sessions(since=recent) == []
+    assert [s["session_id"] for s in store.list_sessions(model="mock")] == ["old"]
+
+    # A later save keeps the stored round's timestamp and stamps only new rounds.
+    store.save_session("old", {"session_id": "old", "rounds": [_round(1, ["mock"]), _round(2, ["ollama"])]})
+    assert store.list_sessions(model="mock", since=recent) == []
+    assert [s["session_id"] for s in store.list_sessions(model="ollama", since=recent)] == ["old"]
+
+
+def test_backend_is_selected_from_env(monkeypatch, _isolated_storage):
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    monkeypatch.setenv("STORAGE_SQLITE_PATH", str(_isolated_storage / "env.db"))
+    assert isinstance(base.get_session_store(), SQLiteSessionStore)
+    monkeypatch.setenv("STORAGE_BACKEND", "file")
+    assert isinstance(base.get_session_store(), FileSessionStore)
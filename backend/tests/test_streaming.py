@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from backend.llm.client import LLMClient
+from backend.services import orchestrator
+from backend.services.orchestrator import iter_multi_model_query, multi_model_query
+from backend.services.stream_json import IncrementalJSONChecker
+
+
+def test_checker_accepts_valid_json_split_anywhere():
+    text = json.dumps({"a": [1, -2.5e3, True, None, "x\\\"yé"], "b": {"c": "}"}})
+    checker = IncrementalJSONChecker()
+    for ch in text:
+        assert checker.feed(ch), checker.error
+    assert checker.complete
+
+
+@pytest.mark.parametrize("text", ["Sure! {", "```json\n{", '{"a" 1}', '{"a": tru', '{"a": 1}}', "[1]"])
+def test_checker_rejects_invalid_prefixes(text):
+    checker = IncrementalJSONChecker()
+    ok = checker.feed(text)
+    # "tru" is only a prefix; the other inputs must fail immediately.
+    if text.endswith("tru"):
+        assert ok and not checker.feed("x")
+    else:
+        assert not ok
+    assert checker.error
+
+
+@pytest.mark.asyncio
+async def test_streaming_mode_yields_chunks_then_result():
+    events = [e async for e in iter_multi_model_query("q", ["mock"], structured=True)]
+    chunks = [e["delta"] for e in events if e["type"] == "model_chunk"]
+    assert len(chunks) > 1
+    assert events[-2]["type"] == "model_response"
+    result = events[-1]["result"]
+    response = result["responses"][0]
+    assert "".join(chunks) == response["raw"]
+    assert response["parsed"]["summary_points"]
+    assert response["meta"]["streamed"] is True
+
+
+class _ChattyAdapter(LLMClient):
+    def __init__(self):
+        self.sent = 0
+
+    async def generate(self, prompt, **kwargs):
+        return "Here is the JSON you asked for: {}"
+
+    async def generate_stream(self, prompt, **kwargs):
+        for chunk in ["Here ", "is ", "the ", "JSON"]:
+            self.sent += 1
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_structured_stream_aborts_on_first_invalid_chunk(monkeypatch):
+    adapter = _ChattyAdapter()
+    monkeypatch.setattr(orchestrator, "_build_client", lambda model_id: adapter)
+    result = await multi_model_query("q", ["mock"], structured=True, stream=True)
+    response = result["responses"][0]
+    assert adapter.sent == 1
+    assert response["meta"]["stream_aborted"] is True
+    assert response["parse_error"].startswith("Aborted stream")
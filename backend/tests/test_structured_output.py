@@ -1,5 +1,9 @@
+import asyncio
+from collections import deque
+
 import pytest
 
+from backend.services import orchestrator
 from backend.services.orchestrator import multi_model_query
 
 
@@ -13,4 +17,66 @@ async def test_mock_structured_parse_success_rate():
         resp = result["responses"][0]
         if "parsed" in resp and not resp.get("parse_error"):
             successes += 1
-    assert successes >= int(0.9 * runs), f"parse success {successes}/{runs} below threshold"
\ No newline at end of file
+    assert successes >= int(0.9 * runs), f"parse success {successes}/{runs} below threshold"
+
+def _fake_call_model(delays, calls=None):
+    async def fake(model_id, question, structured, prompt_id, prompt_version, **kwargs):
+        if calls is not None:
+            calls.append(model_id)
+        delay = delays[model_id]
+        if isinstance(delay, list):
+            delay = delay.pop(0)
+        await asyncio.sleep(delay)
+        return {"model_id": model_id, "parsed": {"summary_points": []}, "meta": {"latency_s": delay}}
+
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_quorum_cancels_remaining_models(monkeypatch):
+    monkeypatch.setattr(orchestrator, "_call_model", _fake_call_model({"a": 0.0, "b": 0.01, "slow": 5.0}))
+    result = await multi_model_query("q", ["a", "slow", "b"], structured=True, quorum=2)
+    assert [r["model_id"] for r in result["responses"]] == ["a", "slow", "b"]
+    assert result["responses"][1]["meta"]["cancelled"] is True
+    assert result["execution"]["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_results(monkeypatch):
+    monkeypatch.setattr(orchestrator, "_call_model", _fake_call_model({"a": 0.0, "slow": 5.0}))
+    result = await multi_model_query("q", ["a", "slow"], structured=True, deadline_s=0.05)
+    assert "parsed" in result["responses"][0]
+    assert result["responses"][1]["meta"]["cancelled"] is True
+    assert "deadline" in result["execution"]["stop_reason"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_beats_slow_primary(monkeypatch):
+    monkeypatch.setattr(orchestrator, "_LATENCIES", {"m": deque([0.01] * 10)})
+    calls = []
+    monkeypatch.setattr(orchestrator, "_call_model", _fake_call_model({"m": [5.0, 0.0]}, calls))
+    result = await asyncio.wait_for(multi_model_query("q", ["m"], structured=True, hedge=True), timeout=2)
+    assert calls == ["m", "m"]
+    assert result["responses"][0]["meta"]["hedged"] is True
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_cancels_model_calls(monkeypatch):
+    monkeypatch.setattr(orchestrator, "_LATENCIES", {"m": deque([0.01] * 10)})
+    cancelled = []
+
+    async def slow(model_id, question, structured, prompt_id, prompt_version, **kwargs):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(model_id)
+            raise
+
+    monkeypatch.setattr(orchestrator, "_call_model", slow)
+    task = asyncio.ensure_future(multi_model_query("q", ["a", "m"], structured=True, hedge=True))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Both the plain call and the hedged primary and backup are cancelled.
+    assert sorted(cancelled) == ["a", "m", "m"]
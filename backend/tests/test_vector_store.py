@@ -0,0 +1,160 @@
+import json
+
+import numpy as np
+
+import pytest
+
+import threading
+
+from backend.storage import vector_store
+from backend.storage.ann_index import IVFIndex, get_backend
+
+
+@pytest.fixture
+def store_dir(_isolated_storage, monkeypatch):
+    monkeypatch.delenv("HUGGINGFACE_API_KEY", raising=False)
+    return _isolated_storage
+
+
+def test_search_returns_closest_document(store_dir):
+    vector_store.add_documents("s1", [
+        {"text": "Cats chase mice", "meta": {"model_id": "m1", "round": 1}},
+        {"text": "Bananas are yellow", "meta": {"model_id": "m2", "round": 1}},
+    ])
+    vector_store.add_documents("s2", [{"text": "Apple is a fruit", "meta": {"role": "question", "round": 1}}])
+
+    hits = vector_store.search_similar("Felines hunt rodents", top_k=2)
+    assert len(hits) == 2
+    score, item = hits[0]
+    assert item["text"] == "Cats chase mice"
+    assert item["session_id"] == "s1"
+    assert item["meta"] == {"model_id": "m1", "round": 1}
+    assert score == pytest.approx(1.0, abs=1e-5)
+    assert hits[0][0] >= hits[1][0]
+
+
+def test_legacy_json_index_is_migrated(store_dir):
+    legacy = [
+        {"session_id": "old", "text": "a", "embedding": [1.0, 0.0, 0.0], "meta": {"round": 1}},
+        {"session_id": "old", "text": "b", "embedding": [0.0, 2.0, 0.0], "meta": {"round": 2}},
+    ]
+    (store_dir / "vector_index.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+    segments = vector_store._live_segments()
+    assert len(segments) == 1
+    _, meta, matrix = segments[0]
+    assert meta["count"] == 2
+    assert matrix.shape == (2, 3)
+    assert matrix[1].tolist() == pytest.approx([0.0, 1.0, 0.0])
+
+
+def test_truncated_single_matrix_index_keeps_complete_rows(store_dir):
+    items = [{"session_id": "old", "text": t, "meta": {}} for t in ("a", "b", "c")]
+    (store_dir / "vectors_meta.json").write_text(json.dumps({"dim": 2, "count": 3, "items": items}), encoding="utf-8")
+    # Two full float32 rows plus half of the third.
+    (store_dir / "vectors.f32").write_bytes(np.array([1, 0, 0, 1, 1], dtype=np.float32).tobytes())
+
+    segments = vector_store._live_segments()
+    assert len(segments) == 1
+    _, meta, matrix = segments[0]
+    assert meta["count"] == 2
+    assert [item["text"] for item in meta["items"]] == ["a", "b"]
+    assert matrix.tolist() == [[1.0, 0.0], [0.0, 1.0]]
+    assert not (store_dir / "vectors_meta.json").exists()
+
+
+def test_add_documents_appends_segments_and_compaction_merges(store_dir):
+    for i in range(3):
+        vector_store.add_documents(f"s{i}", [{"text": f"doc {i}", "meta": {"round": i}}])
+    assert len(vector_store._live_segments()) == 3
+
+    assert vector_store.compact_segments() == 3
+    segments = vector_store._live_segments()
+    assert len(segments) == 1
+    assert [item["session_id"] for item in segments[0][1]["items"]] == ["s0", "s1", "s2"]
+    assert len(list((store_dir / "vector_segments").glob("*.json"))) == 1
+    assert vector_store.search_similar("doc 1", top_k=3)
+
+
+def test_publish_counts_segments_without_listing_the_directory(store_dir, monkeypatch):
+    listings = []
+    real_live = vector_store._live_segments
+    monkeypatch.setattr(vector_store, "_live_segments", lambda: listings.append(1) or real_live())
+    monkeypatch.setattr(vector_store, "COMPACT_MIN_SEGMENTS", 100)
+    for i in range(4):
+        vector_store.add_documents(f"s{i}", [{"text": f"doc {i}", "meta": {}}])
+    assert len(listings) == 1  # only to seed the counter
+    assert vector_store._small_segments == 4
+
+    monkeypatch.setattr(vector_store, "_live_segments", real_live)
+    vector_store.compact_segments()
+    assert vector_store._small_segments == 1
+
+
+def test_ivf_search_matches_exact_when_probing_all_lists(store_dir, monkeypatch):
+    monkeypatch.setenv("IVF_MIN_TRAIN_ROWS", "8")
+    monkeypatch.setenv("IVF_NLIST", "4")
+    words = ["apple", "banana", "cat", "mouse", "hunt", "yellow", "peel", "fruit"]
+    docs = [{"text": f"{a} {b}", "meta": {"round": 1}} for a in words for b in words]
+    vector_store.add_documents("s1", docs)
+
+    exact = vector_store.search_similar("cat hunt", top_k=5, mode="exact")
+    # The first IVF search starts training in the background and searches exactly meanwhile.
+    untrained = vector_store.search_similar("cat hunt", top_k=5, mode="ivf", nprobe=4)
+    assert [round(s, 5) for s, _ in untrained] == [round(s, 5) for s, _ in exact]
+    get_backend("ivf", vector_store._ivf_dir()).wait_for_training(timeout=10)
+    assert list((store_dir / "vector_segments" / "ivf").glob("centroids-*.json"))
+    approx = vector_store.search_similar("cat hunt", top_k=5, mode="ivf", nprobe=4)
+    assert [round(s, 5) for s, _ in approx] == [round(s, 5) for s, _ in exact]
+
+    # New batches are assigned to lists on publish.
+    vector_store.add_documents("s2", [{"text": "cat hunt", "meta": {"round": 2}}])
+    top = vector_store.search_similar("cat hunt", top_k=1, mode="ivf", nprobe=4)
+    assert top[0][0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_ivf_training_is_single_flight_and_off_the_query_path(store_dir, monkeypatch):
+    monkeypatch.setenv("IVF_MIN_TRAIN_ROWS", "8")
+    vector_store.add_documents("s1", [{"text": f"doc {i}", "meta": {}} for i in range(16)])
+    index = IVFIndex(store_dir / "ivf")
+    release = threading.Event()
+    trained = []
+    real_train = index.train
+
+    def slow_train(dim, segments):
+        trained.append(dim)
+        release.wait(5)
+        return real_train(dim, segments)
+
+    monkeypatch.setattr(index, "train", slow_train)
+    segments = vector_store._live_segments()
+    qvec = segments[0][2][0]
+    for _ in range(3):
+        assert index.candidates(segments, qvec) == [None]  # exact until trained
+    release.set()
+    index.wait_for_training(timeout=5)
+    assert len(trained) == 1
+    assert index.candidates(segments, qvec)[0] is not None
+
+
+def test_search_filters_narrow_candidates(store_dir):
+    vector_store.add_documents("s1", [
+        {"text": "Cats chase mice", "meta": {"role": "question", "round": 1}},
+        {"text": "Cats chase mice", "meta": {"role": "summary_point", "model_id": "ollama", "round": 2}},
+    ])
+    vector_store.add_documents("s2", [
+        {"text": "Cats chase mice", "meta": {"role": "summary_point", "model_id": "hf", "round": 3}},
+    ])
+
+    hits = vector_store.search_similar("Cats chase mice", top_k=5, filters={"model_id": "ollama"})
+    assert [h[1]["meta"]["round"] for h in hits] == [2]
+
+    hits = vector_store.search_similar("Cats chase mice", top_k=5, filters={"role": "summary_point", "round_min": 3})
+    assert [h[1]["session_id"] for h in hits] == ["s2"]
+
+    hits = vector_store.search_similar("Cats chase mice", top_k=5, filters={"session_id": {"s1", "s2"}, "round_max": 2})
+    assert sorted(h[1]["meta"]["round"] for h in hits) == [1, 2]
+
+    assert vector_store.search_similar("Cats chase mice", filters={"session_id": "missing"}) == []
+    with pytest.raises(ValueError):
+        vector_store.search_similar("Cats chase mice", filters={"colour": "red"})
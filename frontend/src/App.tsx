@@ -1,7 +1,7 @@
 // frontend/src/App.tsx
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Layout, Typography, Divider, Spin, message } from "antd";
-import { runQuery } from "./api/llm";
+import { runQuery, subscribeSession } from "./api/llm";
 import QuestionPanel from "./components/QuestionPanel";
 import ResultsGrid from "./components/ResultsGrid";
 import AggregatorPanel from "./components/AggregatorPanel";
@@ -12,6 +12,20 @@ const { Title } = Typography;
 export default function App() {
   const [loading, setLoading] = useState(false);
   const [sessionResult, setSessionResult] = useState<any | null>(null);
+  const sessionId: string | null = sessionResult?.session_id ?? null;
+
+  // 后端每轮聚合完成时推送报告，面板随之更新
+  useEffect(() => {
+    if (!sessionId) return;
+    return subscribeSession(sessionId, (event) => {
+      const report =
+        event.type === "round_aggregated" ? event.data.report :
+        event.type === "finalized" ? event.data.final_report : null;
+      if (report) {
+        setSessionResult((prev: any) => (prev ? { ...prev, aggregator: report } : prev));
+      }
+    });
+  }, [sessionId]);
 
   const handleSubmit = async (question: string, models: string[] = ["mock"]) => {
     if (!question.trim()) {
@@ -12,9 +12,39 @@ export interface QueryRequest {
   prompt_id?: string;
   prompt_version?: string;
   max_rounds?: number;
+  quorum?: number;
+  deadline_s?: number;
+  hedge?: boolean;
+  stream?: boolean;
+  bypass_cache?: boolean;
 }
 
 export async function runQuery(payload: QueryRequest) {
   const res = await api.post('/v1/query', payload);
   return res.data;
 }
+
+export type SessionEventType = 'model_chunk' | 'model_response' | 'round_started' | 'round_aggregated' | 'finalized';
+
+export interface SessionEvent {
+  id: number;
+  type: SessionEventType;
+  session_id: string;
+  data: any;
+}
+
+// 订阅会话进度（SSE），替代轮询 GET /v1/session/{id}；返回取消订阅函数
+export function subscribeSession(sessionId: string, onEvent: (event: SessionEvent) => void): () => void {
+  const source = new EventSource(`/v1/session/${sessionId}/events`);
+  const types: SessionEventType[] = ['model_chunk', 'model_response', 'round_started', 'round_aggregated', 'finalized'];
+  types.forEach((type) => {
+    source.addEventListener(type, (msg) => {
+      const event: SessionEvent = JSON.parse((msg as MessageEvent).data);
+      onEvent(event);
+      if (type === 'finalized') {
+        source.close();
+      }
+    });
+  });
+  return () => source.close();
+}